@@ -0,0 +1,11 @@
+"""MCDRpost 的性能测试
+
+不会被打包进插件，在仓库根目录下以模块方式运行，如::
+
+    python -m benchmark.bench_id_allocator
+
+导入 ``mcdrpost`` 时插件会立即实例化，所以这里先装上假的服务器接口
+"""
+from benchmark import fake_server
+
+fake_server.install()
@@ -0,0 +1,124 @@
+"""订单 ID 分配的性能测试
+
+在已有 n 个订单（其中 1% 的 ID 被释放过）的中转站上，测量连续寄出订单时每个订单的耗时：
+
+- ``add_order``: ``OrderManager.add_order``，分配 ID、更新索引和存储后端
+- ``post``: ``PostManager.post``，从调用到收到回复为止，包括查询副手（模拟的 RCON 没有延迟）
+
+并把分配器换成原先每次都收集所有订单 ID 再从 1 开始线性扫描的做法对比，
+使用分配器时每个订单的耗时应该不随订单数增长，如::
+
+    python -m benchmark.bench_id_allocator --sizes 1000,10000,100000
+"""
+import argparse
+import random
+import shutil
+import tempfile
+import time
+
+from benchmark.bench_post_manager import OFFHAND_ITEM, REPLY_TIMEOUT, write_data
+from benchmark.fake_server import FakeServer, FakeSource
+from mcdrpost.manager.order_manager import OrderManager
+from mcdrpost.manager.post_manager import PostManager
+
+SIZES = [1_000, 10_000, 100_000, 1_000_000]
+LINEAR_SCAN_MAX_SIZE = 100_000
+POSTS = 1_000
+
+
+class LinearScanAllocator:
+    """原先 ``OrderManager.get_next_id`` 的做法，每次分配都收集所有订单 ID 再从 1 开始找空位"""
+
+    def __init__(self, order_manager: OrderManager) -> None:
+        self._orders = order_manager._orders
+
+    def peek(self) -> int:
+        order_id = 1
+        id_set = set(self._orders)
+        while order_id in id_set:
+            order_id += 1
+        return order_id
+
+    def allocate(self) -> int:
+        return self.peek()
+
+    def release(self, order_id: int) -> None:
+        pass
+
+
+def bench_add_order(manager: PostManager, players: list[str], posts: int) -> float:
+    order_manager = manager.order_manager
+    start = time.perf_counter()
+    for _ in range(posts):
+        sender, receiver = random.sample(players, 2)
+        order_manager.add_order({
+            'time': time.time(), 'sender': sender, 'receiver': receiver,
+            'item': 'minecraft:stone 1', 'comment': 'no_comment',
+        })
+    return (time.perf_counter() - start) / posts
+
+
+def bench_post(manager: PostManager, players: list[str], posts: int) -> float:
+    start = time.perf_counter()
+    for _ in range(posts):
+        sender, receiver = random.sample(players, 2)
+        src = FakeSource(sender)
+        manager.post(src, receiver)
+        if not src.replied.wait(REPLY_TIMEOUT):
+            raise TimeoutError(f'post from {sender} timed out')
+    return (time.perf_counter() - start) / posts
+
+
+def bench_size(size: int, posts: int, linear_scan: bool) -> dict[str, float]:
+    folder = tempfile.mkdtemp(prefix=f'mcdrpost-bench-{size}-')
+    try:
+        write_data(folder, size, 'json')
+        server = FakeServer(folder, rcon_latency=0, record=False)
+        server.offhand_item = OFFHAND_ITEM
+        manager = PostManager(server)
+        manager.on_load(server, None)
+        order_manager = manager.order_manager
+        order_manager.wait_until_ready()
+        players = order_manager.get_players()
+
+        random.seed(size)
+        for order_id in random.sample(range(1, size + 1), size // 100):
+            order_manager.remove_order(order_id)
+        # 日志压缩会在后台重写整个快照，与 ID 分配无关，测量前先保存，测量期间不触发
+        manager.save()
+        manager.config_manager.configuration.journal_compact_threshold = 1 << 62
+
+        results = {
+            'add_order': bench_add_order(manager, players, posts),
+            'post': bench_post(manager, players, posts),
+        }
+        if linear_scan:
+            order_manager._id_allocator = LinearScanAllocator(order_manager)
+            results['add_order (linear scan)'] = bench_add_order(manager, players, posts)
+            results['post (linear scan)'] = bench_post(manager, players, posts)
+        manager.on_unload(server)
+        return results
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=lambda text: [int(x) for x in text.split(',')], default=SIZES)
+    parser.add_argument('--posts', type=int, default=POSTS, help='每项寄出的订单数')
+    parser.add_argument(
+        '--linear-scan-max-size', type=int, default=LINEAR_SCAN_MAX_SIZE, help='订单数不超过这个值时才测线性扫描'
+    )
+    args = parser.parse_args()
+
+    columns = ['add_order', 'post', 'add_order (linear scan)', 'post (linear scan)']
+    print(f'{"orders":>10} | ' + ' | '.join(f'{column + " (us)":>28}' for column in columns))
+    for size in args.sizes:
+        results = bench_size(size, args.posts, size <= args.linear_scan_max_size)
+        print(f'{size:>10} | ' + ' | '.join(
+            f'{results[column] * 1e6:>28.1f}' if column in results else f'{"-":>28}' for column in columns
+        ))
+
+
+if __name__ == '__main__':
+    main()
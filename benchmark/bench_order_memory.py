@@ -0,0 +1,114 @@
+"""订单内存占用的测试
+
+用 tracemalloc 分别测量加载 n 个订单之后两种表示方式占用的内存：
+
+- 原先的做法：``dict[str, Order]``，``Order`` 是 ``Serializable``，每个订单的字符串都是从 JSON 中读出来的独立对象
+- 现在的做法：``dict[int, OrderRecord]``，``OrderRecord`` 使用 ``__slots__``，字符串从 ``StringPool`` 中获取，
+  物品转存到 ``ItemBlobStore`` 中，内存里只有每个订单在文件中的偏移
+
+两者都从同一份 JSON 文本开始加载，只统计加载完成、丢掉 JSON 解析结果之后仍然保留的内存
+
+订单数据模拟一个有 500 名玩家、200 种常见物品的服务器，80% 的订单没有备注。
+加上 ``--unique-items`` 时每个订单的物品都不相同（比如耐久、附魔各不相同），字符串池对物品不再有效
+
+可以用 ``--sizes`` 指定订单数，如::
+
+    python -m benchmark.bench_order_memory --sizes 100000 --unique-items
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable
+
+from mcdrpost.order_data import Order
+from mcdrpost.order_record import OrderRecord, StringPool
+from mcdrpost.storage.item_store import ItemBlobStore
+
+SIZES = [100_000, 1_000_000]
+PLAYERS = 500
+ITEMS = 200
+NO_COMMENT = 'no_comment'
+
+
+def make_orders_json(size: int, unique_items: bool = False) -> str:
+    random.seed(size)
+    players = [f'Player_{i:03d}' for i in range(PLAYERS)]
+    items = [
+        f'minecraft:diamond_sword{{Damage:{i},Enchantments:[{{id:"minecraft:sharpness",lvl:5s}}],'
+        f'display:{{Name:\'{{"text":"Reward #{i}"}}\'}}}} 1'
+        for i in range(ITEMS)
+    ]
+    now = time.time()
+    return json.dumps([
+        {
+            'id': order_id,
+            'time': now - random.random() * 86400 * 30,
+            'sender': random.choice(players),
+            'receiver': random.choice(players),
+            'item': random.choice(items).replace('Damage:', f'Damage:{order_id}', 1) if unique_items
+            else random.choice(items),
+            'comment': NO_COMMENT if random.random() < 0.8 else f'gift #{order_id}',
+            'returned': False,
+        }
+        for order_id in range(1, size + 1)
+    ])
+
+
+def load_orders(raw_orders: list[dict[str, Any]]) -> dict[str, Order]:
+    """原先 ``OrderData.orders`` 的加载结果
+
+    ``Order(**raw)`` 得到的对象与 ``Order.deserialize(raw)`` 相同，只是快得多
+    """
+    return {str(raw['id']): Order(**raw) for raw in raw_orders}
+
+
+def load_records(raw_orders: list[dict[str, Any]]) -> tuple[dict[int, OrderRecord], StringPool, ItemBlobStore]:
+    """现在 ``OrderManager`` 和 ``JsonOrderStorage`` 中的表示"""
+    pool = StringPool()
+    items = ItemBlobStore(os.path.join(tempfile.gettempdir(), f'mcdrpost-bench-{os.getpid()}.items'))
+    items.reset()
+    records = {}
+    for raw in raw_orders:
+        records[raw['id']] = OrderRecord(
+            raw['id'], raw['time'],
+            pool.acquire(raw['sender']), pool.acquire(raw['receiver']), pool.acquire(raw['comment']),
+            raw['returned'],
+        )
+        items.put(raw['id'], raw['item'])
+    return records, pool, items
+
+
+def measure(loader: Callable[[list[dict[str, Any]]], Any], text: str) -> float:
+    """从 JSON 文本加载订单，返回加载结果占用的内存，单位为 MiB"""
+    tracemalloc.start()
+    raw_orders = json.loads(text)
+    result = loader(raw_orders)
+    del raw_orders
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    if isinstance(result, tuple) and isinstance(result[-1], ItemBlobStore):
+        result[-1].close()
+    del result
+    return current / 1024 / 1024
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=lambda text: [int(x) for x in text.split(',')], default=SIZES)
+    parser.add_argument('--unique-items', action='store_true')
+    args = parser.parse_args()
+
+    print(f'{"orders":>10} | {"Order (MiB)":>12} | {"OrderRecord (MiB)":>18} | {"saved":>6}')
+    for size in args.sizes:
+        text = make_orders_json(size, args.unique_items)
+        old = measure(load_orders, text)
+        new = measure(load_records, text)
+        print(f'{size:>10} | {old:>12.1f} | {new:>18.1f} | {1 - new / old:>6.0%}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,279 @@
+"""PostManager 的端到端性能测试
+
+在进程内的假服务器接口上，对已有 n 个订单的中转站依次测量：
+
+- ``load``: 冷启动，从创建 ``PostManager`` 到订单加载完成
+- ``post`` / ``receive``: 多个玩家同时寄出、接收订单，从调用到收到回复为止，包括模拟的 RCON 查询
+- ``list_receive`` / ``list_all``: 玩家的待收订单列表、管理员查看所有订单的中间一页
+- ``save`` / ``reload``: 写入一个改动后保存、重新加载
+
+每项都给出吞吐量和 p50/p99 延迟。RCON 查询走 MCDR 自带的 RCON 连接（``rcon_pool_size: 0``），
+每次查询等待 ``--rcon-latency`` 毫秒；游戏命令不合并、不限速
+
+数据文件写在临时目录中，订单数据直接生成 ``orders.json``，其他存储后端第一次加载时会从中迁移
+
+``--output`` 把结果写成 JSON，``--compare`` 与之前保存的结果对比，
+p50 延迟变慢或者吞吐量下降超过 ``--tolerance`` 时列出退步的项目并以状态码 1 退出，如::
+
+    python -m benchmark.bench_post_manager --sizes 1000,10000 --output base.json
+    python -m benchmark.bench_post_manager --sizes 1000,10000 --compare base.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from benchmark.fake_server import FakeServer, FakeSource
+from mcdrpost import constants
+from mcdrpost.config.configuration import Configuration
+from mcdrpost.manager.post_manager import PostManager
+
+SIZES = [1_000, 10_000, 100_000, 1_000_000]
+PLAYERS = 500
+ITEMS = 200
+OPERATIONS = 1_000
+CONCURRENCY = 8
+LIST_ROUNDS = 200
+ROUNDS = 3
+# 单次收寄等待回复的最长时间，单位为秒
+REPLY_TIMEOUT = 30
+
+OFFHAND_ITEM = '{Slot:-106b,id:"minecraft:diamond_sword",Count:1b,tag:{Damage:3}}'
+
+
+def write_data(folder: str, size: int, storage: str) -> None:
+    """生成配置文件和有 ``size`` 个订单的 ``orders.json``"""
+    random.seed(size)
+    players = [f'Player_{i:03d}' for i in range(PLAYERS)]
+    items = [f'minecraft:diamond_sword{{Damage:{i}}} 1' for i in range(ITEMS)]
+    now = time.time()
+    orders = {}
+    for order_id in range(1, size + 1):
+        sender, receiver = random.sample(players, 2)
+        orders[str(order_id)] = {
+            'time': now - random.random() * 86400,
+            'sender': sender,
+            'receiver': receiver,
+            'item': random.choice(items),
+            'comment': 'no_comment',
+            'returned': False,
+            'id': order_id,
+        }
+    with open(os.path.join(folder, constants.ORDERS_DATA_FILE_NAME), 'w', encoding='utf8') as f:
+        json.dump({'players': players, 'orders': orders}, f)
+
+    config = Configuration.get_default()
+    config.storage = storage
+    config.max_storage = -1
+    config.rcon_pool_size = 0
+    config.command_batch_window = 0
+    config.command_rate_limit = 0
+    FakeServer(folder).save_config_simple(config, constants.CONFIG_FILE_NAME, file_format=constants.CONFIG_FILE_TYPE)
+
+
+def percentile(samples: list[float], p: float) -> float:
+    """最近秩法的百分位数"""
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, max(0, round(p / 100 * len(ordered)) - 1))]
+
+
+def summarize(size: int, operation: str, latencies: list[float], wall: float, failed: int = 0) -> dict[str, Any]:
+    return {
+        'size': size,
+        'operation': operation,
+        'count': len(latencies),
+        'failed': failed,
+        'throughput': len(latencies) / wall if wall > 0 else 0.0,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+    }
+
+
+def measure_sync(action: Callable[[], None], rounds: int) -> tuple[list[float], float]:
+    """依次执行 ``rounds`` 次，返回每次的耗时和总耗时"""
+    latencies = []
+    started_at = time.perf_counter()
+    for _ in range(rounds):
+        start = time.perf_counter()
+        action()
+        latencies.append(time.perf_counter() - start)
+    return latencies, time.perf_counter() - started_at
+
+
+def measure_async(
+        calls: list[tuple[str, Callable[[FakeSource], None]]],
+        concurrency: int,
+) -> tuple[list[float], float, int]:
+    """由 ``concurrency`` 个玩家同时发起操作，每个操作等到收到回复为止
+
+    Args:
+        calls: (玩家名, 操作)
+
+    Returns:
+        每次的耗时、总耗时和超时的次数
+    """
+
+    def run(call: tuple[str, Callable[[FakeSource], None]]) -> float | None:
+        player, action = call
+        src = FakeSource(player)
+        start = time.perf_counter()
+        action(src)
+        if not src.replied.wait(REPLY_TIMEOUT):
+            return None
+        return time.perf_counter() - start
+
+    started_at = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='benchmark-client') as pool:
+        results = list(pool.map(run, calls))
+    wall = time.perf_counter() - started_at
+    latencies = [latency for latency in results if latency is not None]
+    return latencies, wall, len(results) - len(latencies)
+
+
+def bench_size(size: int, args: argparse.Namespace) -> list[dict[str, Any]]:
+    folder = tempfile.mkdtemp(prefix=f'mcdrpost-bench-{size}-')
+    results = []
+    try:
+        write_data(folder, size, args.storage)
+        server = FakeServer(folder, rcon_latency=args.rcon_latency / 1000, record=False)
+
+        # 冷启动
+        start = time.perf_counter()
+        manager = PostManager(server)
+        manager.on_load(server, None)
+        manager.order_manager.wait_until_ready()
+        results.append(summarize(size, 'load', [time.perf_counter() - start], time.perf_counter() - start))
+
+        order_manager = manager.order_manager
+        players = order_manager.get_players()
+        random.seed(size)
+
+        # 寄出
+        server.offhand_item = OFFHAND_ITEM
+        calls = []
+        for _ in range(args.operations):
+            sender, receiver = random.sample(players, 2)
+            calls.append((sender, lambda src, r=receiver: manager.post(src, r)))
+        latencies, wall, failed = measure_async(calls, args.concurrency)
+        results.append(summarize(size, 'post', latencies, wall, failed))
+
+        # 接收
+        server.offhand_item = None
+        orders = order_manager.get_orders_page(0, args.operations)
+        calls = [(order.receiver, lambda src, i=order.id: manager.receive(src, i)) for order in orders]
+        latencies, wall, failed = measure_async(calls, args.concurrency)
+        results.append(summarize(size, 'receive', latencies, wall, failed))
+
+        # 列表
+        command_manager = manager.command_manager
+        latencies, wall = measure_sync(
+            lambda: command_manager.output_receive_list(FakeSource(random.choice(players))),
+            LIST_ROUNDS,
+        )
+        results.append(summarize(size, 'list_receive', latencies, wall))
+        middle_page = max(1, order_manager.count_orders() // manager.config_manager.configuration.list_page_size // 2)
+        latencies, wall = measure_sync(
+            lambda: command_manager.output_all_orders(FakeSource('admin'), middle_page),
+            LIST_ROUNDS,
+        )
+        results.append(summarize(size, 'list_all', latencies, wall))
+
+        # 保存和重载
+        def save() -> None:
+            sender, receiver = random.sample(players, 2)
+            order_manager.add_order({
+                'time': time.time(), 'sender': sender, 'receiver': receiver,
+                'item': 'minecraft:stone 1', 'comment': 'no_comment',
+            })
+            manager.save()
+
+        latencies, wall = measure_sync(save, args.rounds)
+        results.append(summarize(size, 'save', latencies, wall))
+        latencies, wall = measure_sync(manager.reload, args.rounds)
+        results.append(summarize(size, 'reload', latencies, wall))
+
+        manager.on_unload(server)
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+    return results
+
+
+def compare(results: list[dict[str, Any]], baseline: dict[str, Any], tolerance: float) -> list[str]:
+    """与之前的结果对比，返回退步的项目"""
+    base = {(r['size'], r['operation']): r for r in baseline['results']}
+    regressions = []
+    for result in results:
+        old = base.get((result['size'], result['operation']))
+        if old is None:
+            continue
+        name = f'{result["operation"]}@{result["size"]}'
+        if result['p50_ms'] > old['p50_ms'] * (1 + tolerance):
+            regressions.append(f'{name}: p50 {old["p50_ms"]:.3f} -> {result["p50_ms"]:.3f} ms')
+        if result['throughput'] < old['throughput'] * (1 - tolerance):
+            regressions.append(f'{name}: throughput {old["throughput"]:.1f} -> {result["throughput"]:.1f} op/s')
+    return regressions
+
+
+def plugin_version() -> str:
+    metadata = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'mcdreforged.plugin.json')
+    with open(metadata, encoding='utf8') as f:
+        return json.load(f)['version']
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=lambda text: [int(x) for x in text.split(',')], default=SIZES)
+    parser.add_argument('--storage', choices=['json', 'sqlite', 'sharded'], default='json')
+    parser.add_argument('--rcon-latency', type=float, default=5, help='模拟的 RCON 延迟，单位为毫秒')
+    parser.add_argument('--operations', type=int, default=OPERATIONS, help='每种收寄操作的次数')
+    parser.add_argument('--concurrency', type=int, default=CONCURRENCY, help='同时收寄的玩家数')
+    parser.add_argument('--rounds', type=int, default=ROUNDS, help='保存和重载的次数')
+    parser.add_argument('--output', help='把结果写入这个 JSON 文件')
+    parser.add_argument('--compare', help='与这个 JSON 文件中的结果对比')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='允许的退步比例')
+    args = parser.parse_args()
+
+    print(f'{"orders":>10} | {"operation":>12} | {"count":>6} | {"op/s":>10} | {"p50 (ms)":>10} | {"p99 (ms)":>10}')
+    results = []
+    for size in args.sizes:
+        for result in bench_size(size, args):
+            results.append(result)
+            print(
+                f'{result["size"]:>10} | {result["operation"]:>12} | {result["count"]:>6} | '
+                f'{result["throughput"]:>10.1f} | {result["p50_ms"]:>10.3f} | {result["p99_ms"]:>10.3f}'
+                + (f'  ({result["failed"]} timed out)' if result['failed'] else '')
+            )
+
+    report = {
+        'version': plugin_version(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'storage': args.storage,
+        'rcon_latency_ms': args.rcon_latency,
+        'operations': args.operations,
+        'concurrency': args.concurrency,
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf8') as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding='utf8') as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print('Regressions:')
+            print('\n'.join(f'  {line}' for line in regressions))
+            sys.exit(1)
+        print('No regressions')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""物品格式化的性能测试
+
+使用装满附魔物品的潜影盒和写满的成书这类 NBT 很大的物品，分别测量：
+
+- 原先的做法：对 ``tag`` 做 ``json.dumps``（得到的并不是合法的 SNBT）
+- 不使用缓存的 SNBT 解码 + 编码
+- 使用 ``ItemFormatter`` 缓存之后的格式化
+"""
+import json
+import time
+
+from mcdrpost.utils import snbt
+
+ROUNDS = 200
+
+
+def enchanted_sword(slot: int, components: bool) -> dict:
+    enchantments = {
+        'minecraft:sharpness': 5, 'minecraft:looting': 3, 'minecraft:unbreaking': 3, 'minecraft:mending': 1,
+    }
+    name = json.dumps({'text': f'Sword #{slot}', 'color': 'gold', 'italic': False})
+    lore = [json.dumps({'text': f'Lore line {i} of sword {slot}', 'color': 'gray'}) for i in range(5)]
+    if components:
+        return {
+            'slot': snbt.Byte(slot), 'item': {
+                'id': 'minecraft:netherite_sword', 'count': 1, 'components': {
+                    'minecraft:enchantments': {'levels': enchantments},
+                    'minecraft:custom_name': name,
+                    'minecraft:lore': lore,
+                    'minecraft:damage': 17,
+                },
+            },
+        }
+    return {
+        'Slot': snbt.Byte(slot), 'id': 'minecraft:netherite_sword', 'Count': snbt.Byte(1), 'tag': {
+            'Damage': 17,
+            'Enchantments': [{'id': k, 'lvl': snbt.Short(v)} for k, v in enchantments.items()],
+            'display': {'Name': name, 'Lore': lore},
+        },
+    }
+
+
+def shulker_box(components: bool) -> dict:
+    if components:
+        return {
+            'Slot': snbt.Byte(-106), 'id': 'minecraft:shulker_box', 'count': 1, 'components': {
+                'minecraft:container': [enchanted_sword(i, True) for i in range(27)],
+            },
+        }
+    return {
+        'Slot': snbt.Byte(-106), 'id': 'minecraft:shulker_box', 'Count': snbt.Byte(1), 'tag': {
+            'BlockEntityTag': {'id': 'minecraft:shulker_box', 'Items': [enchanted_sword(i, False) for i in range(27)]},
+        },
+    }
+
+
+def written_book(components: bool) -> dict:
+    pages = [json.dumps({'text': f'Page {i}: ' + 'The quick brown fox jumps over the lazy dog. ' * 5}) for i in range(50)]
+    if components:
+        return {
+            'Slot': snbt.Byte(-106), 'id': 'minecraft:written_book', 'count': 1, 'components': {
+                'minecraft:written_book_content': {
+                    'title': {'raw': 'Benchmark'}, 'author': 'MCDRpost', 'generation': 0,
+                    'pages': [{'raw': p} for p in pages],
+                },
+            },
+        }
+    return {
+        'Slot': snbt.Byte(-106), 'id': 'minecraft:written_book', 'Count': snbt.Byte(1), 'tag': {
+            'title': 'Benchmark', 'author': 'MCDRpost', 'generation': 0, 'pages': pages,
+        },
+    }
+
+
+def timeit(func, *args) -> float:
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        func(*args)
+    return (time.perf_counter() - start) / ROUNDS
+
+
+def old_format(item: dict) -> str:
+    """原先 ``get_formatted_item`` 的做法"""
+    return f"{item['id']}" + json.dumps(item.get('tag', ''), ensure_ascii=False) + f"{item.get('Count', '')}"
+
+
+def main() -> None:
+    print(f'{"item":>24} | {"size (KiB)":>10} | {"json.dumps (us)":>15} | {"snbt (us)":>10} | {"cached (us)":>11}')
+    for name, factory in (('shulker box', shulker_box), ('written book', written_book)):
+        for components in (False, True):
+            item = factory(components)
+            payload = snbt.encode(item)
+            formatter = snbt.ItemFormatter()
+            formatter.format(payload)
+            label = f'{name} ({"components" if components else "tag"})'
+            print(
+                f'{label:>24} | {len(payload) / 1024:>10.1f} | {timeit(old_format, item) * 1e6:>15.1f} | '
+                f'{timeit(lambda: snbt.format_item(snbt.decode(payload))) * 1e6:>10.1f} | '
+                f'{timeit(formatter.format, payload) * 1e6:>11.1f}'
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,265 @@
+"""进程内的假 PluginServerInterface
+
+让 MCDRpost 可以脱离 MCDR 和 Minecraft 服务器运行，数据文件写在临时目录中
+
+``rcon_latency`` 不为 None 时模拟开启了 RCON 的服务端：每次 ``rcon_query`` 先等待这么长时间，
+``data get entity`` 返回 ``offhand_item`` 或 ``inventory`` 中的数据
+
+需要测试 MCDRpost 自己的 RCON 连接池时，可以用 ``FakeRconServer`` 在本地监听一个真正的 RCON 端口
+"""
+import logging
+import os
+import re
+import socket
+import struct
+import tempfile
+import threading
+import time
+from typing import Any, Callable, IO
+
+from mcdreforged.api.types import ServerInformation, ServerInterface
+from mcdreforged.api.utils import Serializable
+from mcdreforged.plugin.si._simple_config_handler import SimpleConfigHandler
+from ruamel.yaml import YAML
+
+LANG_FOLDER = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'lang')
+
+
+def _load_translations(language: str) -> dict[str, str]:
+    with open(os.path.join(LANG_FOLDER, f'{language}.yml'), encoding='utf8') as f:
+        data = YAML(typ='safe').load(f)
+
+    translations: dict[str, str] = {}
+
+    def flatten(prefix: str, value: Any) -> None:
+        if isinstance(value, dict):
+            for k, v in value.items():
+                flatten(f'{prefix}.{k}' if prefix else k, v)
+        else:
+            translations[prefix] = value
+
+    flatten('', data)
+    return translations
+
+
+_DATA_GET = re.compile(r'data get entity (\S+) (.+)')
+# 与 mcdrpost.constants 中的相同，这里不能导入 mcdrpost，否则插件会在装上假的服务器接口之前实例化
+_ENTITY_DATA_SEPARATOR = ' has the following entity data: '
+_INVENTORY_CODE = 'Inventory'
+
+
+class FakeSource:
+    """只实现了 MCDRpost 用到的那部分 InfoCommandSource，第一次回复时标记完成"""
+
+    is_player = True
+
+    def __init__(self, player: str) -> None:
+        self.player: str = player
+        self.replies: list[Any] = []
+        self.replied = threading.Event()
+
+    def get_info(self) -> 'FakeSource':
+        return self
+
+    def has_permission(self, _level: int) -> bool:
+        return True
+
+    def reply(self, message: Any) -> None:
+        self.replies.append(message)
+        self.replied.set()
+
+
+class FakeRconServer:
+    """本地的 RCON 服务端，每个连接一个线程，收到的命令交给 ``handler`` 处理
+
+    只实现了登录和执行命令，不检查密码
+
+    Args:
+        handler (Callable[[str], str]): 处理命令，返回命令的结果
+        latency (float): 每条命令的延迟，单位为秒
+    """
+
+    _LOGIN = 3
+    _COMMAND = 2
+    _RESPONSE = 0
+
+    def __init__(self, handler: Callable[[str], str], latency: float = 0) -> None:
+        self._handler: Callable[[str], str] = handler
+        self._latency: float = latency
+        self._socket = socket.create_server(('127.0.0.1', 0))
+        self.port: int = self._socket.getsockname()[1]
+        threading.Thread(target=self._accept, name='fake-rcon', daemon=True).start()
+
+    def _accept(self) -> None:
+        while True:
+            try:
+                connection, _ = self._socket.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._serve, args=(connection,), name='fake-rcon-client', daemon=True).start()
+
+    @staticmethod
+    def _recv_exactly(connection: socket.socket, size: int) -> bytes:
+        data = b''
+        while len(data) < size:
+            chunk = connection.recv(size - len(data))
+            if not chunk:
+                raise EOFError
+            data += chunk
+        return data
+
+    def _serve(self, connection: socket.socket) -> None:
+        with connection:
+            try:
+                while True:
+                    length, = struct.unpack('<i', self._recv_exactly(connection, 4))
+                    packet = self._recv_exactly(connection, length)
+                    request_id, packet_type = struct.unpack('<ii', packet[:8])
+                    if packet_type == self._LOGIN:
+                        result, response_type = '', self._COMMAND
+                    else:
+                        time.sleep(self._latency)
+                        result, response_type = self._handler(packet[8:-2].decode('utf8')), self._RESPONSE
+                    body = struct.pack('<ii', request_id, response_type) + result.encode('utf8') + b'\0\0'
+                    connection.sendall(struct.pack('<i', len(body)) + body)
+            except (EOFError, OSError):
+                pass
+
+    def close(self) -> None:
+        self._socket.close()
+
+
+class FakeServer:
+    """只实现了 MCDRpost 用到的那部分 PluginServerInterface
+
+    Attributes:
+        executed (list[str]): 执行过的服务端命令，``record`` 为 False 时不记录
+        told (list[tuple[str, str]]): 发送给玩家的消息，``record`` 为 False 时不记录
+        execute_count (int): 执行过的服务端命令数
+        tell_count (int): 发送给玩家的消息数
+        rcon_latency (float | None): 模拟的 RCON 延迟，单位为秒，None 表示没有开启 RCON
+        offhand_item (str | None): 查询任意玩家副手时返回的物品 SNBT，None 表示副手为空
+        inventory (str): 查询任意玩家物品栏时返回的 SNBT
+        rcon_port (int | None): MCDR 配置中的 RCON 端口，MCDRpost 的 RCON 连接池会连接这个端口
+        server_version (str | None): 服务端版本，None 表示服务端还没有启动
+    """
+
+    def __init__(
+            self,
+            data_folder: str | None = None,
+            language: str = 'en_us',
+            *,
+            rcon_latency: float | None = None,
+            record: bool = True,
+    ) -> None:
+        self.logger: logging.Logger = logging.getLogger('MCDRpost-benchmark')
+        self._data_folder: str = data_folder or tempfile.mkdtemp(prefix='mcdrpost-')
+        self._language: str = language
+        self._translations: dict[str, str] = _load_translations(language)
+        self._record: bool = record
+        self.executed: list[str] = []
+        self.told: list[tuple[str, str]] = []
+        self.execute_count: int = 0
+        self.tell_count: int = 0
+        self.rcon_latency: float | None = rcon_latency
+        self.offhand_item: str | None = None
+        self.inventory: str = '[]'
+        self.rcon_port: int | None = None
+        self.server_version: str | None = '1.20.1'
+        self.online: list[str] = []
+
+    def as_plugin_server_interface(self) -> 'FakeServer':
+        return self
+
+    def get_data_folder(self) -> str:
+        os.makedirs(self._data_folder, exist_ok=True)
+        return self._data_folder
+
+    def load_config_simple(self, file_name: str, default_config: Any = None, *, target_class: type = None,
+                           file_format: str = None, **_kwargs) -> Any:
+        handler = SimpleConfigHandler(file_name, file_format, self.get_data_folder())
+        try:
+            data = handler.load(encoding='utf8')
+        except (OSError, ValueError):
+            data = None
+        if target_class is None:
+            return default_config if data is None else data
+        if data is None:
+            config = target_class.get_default()
+            self.save_config_simple(config, file_name, file_format=file_format)
+            return config
+        return target_class.deserialize(data)
+
+    def save_config_simple(self, config: Any, file_name: str, *, file_format: str = None, **_kwargs) -> None:
+        data = config.serialize() if isinstance(config, Serializable) else config
+        SimpleConfigHandler(file_name, file_format, self.get_data_folder()).save(data, encoding='utf8')
+
+    def tr(self, translation_key: str, *args, **_kwargs) -> str:
+        return self._translations.get(translation_key, translation_key).format(*args)
+
+    def open_bundled_file(self, relative_file_path: str) -> IO[bytes]:
+        return open(os.path.join(os.path.dirname(LANG_FOLDER), relative_file_path), 'rb')
+
+    def get_plugin_file_path(self, _plugin_id: str) -> str:
+        return os.path.dirname(LANG_FOLDER)
+
+    def get_mcdr_language(self) -> str:
+        return self._language
+
+    def register_help_message(self, *_args, **_kwargs) -> None:
+        pass
+
+    def register_command(self, *_args, **_kwargs) -> None:
+        pass
+
+    def execute(self, text: str, **_kwargs) -> None:
+        self.execute_count += 1
+        if self._record:
+            self.executed.append(text)
+
+    def tell(self, player: str, text: Any, **_kwargs) -> None:
+        self.tell_count += 1
+        if self._record:
+            self.told.append((player, str(text)))
+
+    def is_server_startup(self) -> bool:
+        return self.server_version is not None
+
+    def get_server_information(self) -> ServerInformation:
+        information = ServerInformation()
+        information.version = self.server_version
+        return information
+
+    def get_mcdr_config(self) -> dict[str, Any]:
+        return {'rcon': {'address': '127.0.0.1', 'port': self.rcon_port, 'password': ''}}
+
+    def is_rcon_running(self) -> bool:
+        return self.rcon_latency is not None
+
+    def rcon_query(self, command: str) -> str | None:
+        if self.rcon_latency is None:
+            return None
+        time.sleep(self.rcon_latency)
+        if command == 'list':
+            return f'There are {len(self.online)} of a max of 20 players online: {", ".join(self.online)}'
+        match = _DATA_GET.fullmatch(command)
+        if match is None:
+            return ''
+        player, path = match.groups()
+        data = self.inventory if path == _INVENTORY_CODE else self.offhand_item
+        if data is None:
+            return f'Found no elements matching {path}'
+        return f'{player}{_ENTITY_DATA_SEPARATOR}{data}'
+
+
+def install(server: FakeServer | None = None) -> FakeServer:
+    """让 ``ServerInterface.get_instance()`` 返回假的服务器接口
+
+    需要在导入 ``mcdrpost`` 之前调用
+    """
+    server = server or FakeServer()
+    ServerInterface.get_instance = classmethod(lambda cls: server)
+    return server
+
+
+__all__ = ['FakeSource', 'FakeRconServer', 'FakeServer', 'install']
@@ -0,0 +1,212 @@
+"""收寄事务的多线程压力测试
+
+模拟一个只有副手的游戏世界：每名玩家一开始副手里都有一个编号不同的物品，
+多个线程同时让随机的玩家寄出、接收、取消订单，玩家少、线程多，同一个玩家的操作经常同时发生
+
+查询和游戏命令都通过 MCDRpost 自己的 RCON 连接池发往本地的 ``FakeRconServer``，
+替换物品的命令真正执行时才会改变世界中的副手，和真实的服务端一样
+
+结束后检查：
+
+- 物品守恒：所有玩家副手中和所有订单中的物品编号合起来，恰好是一开始的那些，每个只出现一次
+- 没有覆盖：替换物品时副手总是空的（寄出时清空副手除外）
+- 索引一致：每个订单都在寄件人和收件人的索引中，索引中没有多余的订单，收件箱计数与索引一致
+- 重新加载之后订单不变
+
+有问题时列出并以状态码 1 退出，如::
+
+    python -m benchmark.stress_transactions --threads 32 --operations 5000
+"""
+import argparse
+import json
+import os
+import random
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmark.fake_server import FakeRconServer, FakeServer, FakeSource
+from mcdrpost import constants
+from mcdrpost.config.configuration import Configuration
+from mcdrpost.manager.post_manager import PostManager
+
+PLAYERS = 8
+THREADS = 16
+OPERATIONS = 2_000
+RCON_LATENCY = 1
+# 单次收寄等待回复的最长时间，单位为秒
+REPLY_TIMEOUT = 30
+
+_DATA_GET = re.compile(r'data get entity (\S+) (.+)')
+_REPLACE = re.compile(r'(?:item replace entity (\S+) (\S+) with|replaceitem entity (\S+) (\S+)) (.+)')
+_SERIAL = re.compile(r'Serial:(\d+)')
+
+
+class World:
+    """游戏世界，只记录每名玩家副手中物品的编号，None 表示副手为空"""
+
+    def __init__(self, players: list[str]) -> None:
+        self._lock = threading.Lock()
+        self.offhand: dict[str, int | None] = {player: serial for serial, player in enumerate(players)}
+        self.overwritten: list[str] = []
+
+    def handle(self, command: str) -> str:
+        with self._lock:
+            if match := _DATA_GET.fullmatch(command):
+                player, path = match.groups()
+                serial = self.offhand[player]
+                if serial is None:
+                    return f'Found no elements matching {path}'
+                return (
+                    f'{player} has the following entity data: '
+                    f'{{Slot:-106b,id:"minecraft:stone",Count:1b,tag:{{Serial:{serial}}}}}'
+                )
+            if match := _REPLACE.fullmatch(command):
+                player = match.group(1) or match.group(3)
+                item = match.group(5)
+                serial = None if item == constants.AIR else int(_SERIAL.search(item).group(1))
+                if serial is not None and self.offhand[player] is not None:
+                    self.overwritten.append(f'{player}: {self.offhand[player]} replaced by {serial}')
+                self.offhand[player] = serial
+            return ''
+
+
+def write_data(folder: str, players: list[str], storage: str) -> None:
+    with open(os.path.join(folder, constants.ORDERS_DATA_FILE_NAME), 'w', encoding='utf8') as f:
+        json.dump({'players': players, 'orders': {}}, f)
+
+    config = Configuration.get_default()
+    config.storage = storage
+    config.max_storage = -1
+    config.rcon_pool_size = 8
+    config.command_batch_window = 0.005
+    config.command_rate_limit = 0
+    config.save_delay = 0.05
+    FakeServer(folder).save_config_simple(config, constants.CONFIG_FILE_NAME, file_format=constants.CONFIG_FILE_TYPE)
+
+
+def run_operation(manager: PostManager, players: list[str], rng: random.Random) -> bool:
+    """随机的一名玩家做一次随机的操作，返回是否在超时前收到回复"""
+    order_manager = manager.order_manager
+    player = rng.choice(players)
+    src = FakeSource(player)
+    kind = rng.random()
+    if kind < 0.4:
+        manager.post(src, rng.choice([p for p in players if p != player]))
+    elif kind < 0.8:
+        order_ids = order_manager.get_orderid_by_receiver(player)
+        manager.receive(src, rng.choice(order_ids) if order_ids else 0)
+    else:
+        order_ids = order_manager.get_orderid_by_sender(player)
+        manager.cancel(src, rng.choice(order_ids) if order_ids else 0)
+    return src.replied.wait(REPLY_TIMEOUT)
+
+
+def check(manager: PostManager, world: World, players: list[str]) -> list[str]:
+    """检查物品守恒和索引一致，返回发现的问题"""
+    problems = list(world.overwritten)
+    order_manager = manager.order_manager
+    orders = order_manager.get_orders()
+
+    serials = Counter(serial for serial in world.offhand.values() if serial is not None)
+    for order in orders:
+        serials[int(_SERIAL.search(order_manager.get_order(order.id).item).group(1))] += 1
+    for serial in range(len(players)):
+        if serials[serial] != 1:
+            problems.append(f'item {serial} exists {serials[serial]} time(s)')
+    for serial in serials.keys() - set(range(len(players))):
+        problems.append(f'unknown item {serial}')
+
+    order_ids = {order.id for order in orders}
+    for player in players:
+        sent = set(order_manager.get_orderid_by_sender(player))
+        received = set(order_manager.get_orderid_by_receiver(player))
+        expected_sent = {order.id for order in orders if order.sender == player}
+        expected_received = {order.id for order in orders if order.receiver == player}
+        if sent != expected_sent:
+            problems.append(f'sender index of {player}: {sorted(sent)} != {sorted(expected_sent)}')
+        if received != expected_received:
+            problems.append(f'receiver index of {player}: {sorted(received)} != {sorted(expected_received)}')
+        inbox = order_manager.get_player_info(player).inbox
+        if inbox != len(expected_received):
+            problems.append(f'inbox of {player}: {inbox} != {len(expected_received)}')
+    if order_manager.get_next_id() in order_ids:
+        problems.append(f'next id {order_manager.get_next_id()} is already used')
+    return problems
+
+
+def snapshot(manager: PostManager) -> set[tuple]:
+    order_manager = manager.order_manager
+    return {
+        (order.id, order.sender, order.receiver, order_manager.get_order(order.id).item)
+        for order in order_manager.get_orders()
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--players', type=int, default=PLAYERS)
+    parser.add_argument('--threads', type=int, default=THREADS)
+    parser.add_argument('--operations', type=int, default=OPERATIONS)
+    parser.add_argument('--storage', choices=['json', 'sqlite', 'sharded'], default='json')
+    parser.add_argument('--rcon-latency', type=float, default=RCON_LATENCY, help='模拟的 RCON 延迟，单位为毫秒')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    players = [f'Player_{i:02d}' for i in range(args.players)]
+    world = World(players)
+    rcon = FakeRconServer(world.handle, latency=args.rcon_latency / 1000)
+    folder = tempfile.mkdtemp(prefix='mcdrpost-stress-')
+    try:
+        write_data(folder, players, args.storage)
+        server = FakeServer(folder, rcon_latency=args.rcon_latency / 1000, record=False)
+        server.rcon_port = rcon.port
+        manager = PostManager(server)
+        manager.on_load(server, None)
+        manager.order_manager.wait_until_ready()
+
+        rngs = [random.Random(args.seed * 1000 + i) for i in range(args.operations)]
+        started_at = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.threads, thread_name_prefix='stress-client') as pool:
+            replied = list(pool.map(lambda rng: run_operation(manager, players, rng), rngs))
+        wall = time.perf_counter() - started_at
+        # 等最后的替换物品命令发出
+        manager.command_pipeline.shutdown()
+
+        problems = check(manager, world, players)
+        timed_out = replied.count(False)
+        if timed_out:
+            problems.append(f'{timed_out} operation(s) timed out')
+        before = snapshot(manager)
+        manager.reload()
+        if snapshot(manager) != before:
+            problems.append('orders changed after reload')
+        manager.on_unload(server)
+
+        counters = {
+            name: sum(counter.value for counter in manager.metrics.counters(f'mcdrpost_{name}_total').values())
+            for name in ('posts', 'receives', 'cancels', 'failures')
+        }
+        print(
+            f'{args.operations} operations by {args.threads} threads on {args.players} players in {wall:.2f} s: '
+            + ', '.join(f'{value} {name}' for name, value in counters.items())
+            + f', {len(before)} order(s) left'
+        )
+    finally:
+        rcon.close()
+        shutil.rmtree(folder, ignore_errors=True)
+
+    if problems:
+        print('Problems:')
+        print('\n'.join(f'  {problem}' for problem in problems))
+        sys.exit(1)
+    print('OK')
+
+
+if __name__ == '__main__':
+    main()
@@ -28,3 +28,7 @@ def on_server_stop(server: PluginServerInterface, server_return_code: int):
 
 def on_player_joined(server, player, info):
     manager.on_player_joined(server, player, info)
+
+
+def on_player_left(server, player):
+    manager.on_player_left(server, player)
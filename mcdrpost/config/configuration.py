@@ -1,5 +1,9 @@
+from typing import Literal
+
 from mcdreforged.api.utils import Serializable
 
+from mcdrpost import constants
+
 
 class CommandPermission(Serializable):
     """命令权限配置
@@ -18,6 +22,9 @@ class CommandPermission(Serializable):
         player (int): 玩家命令权限等级
         save (int): 保存命令权限等级
         reload (int): 重载命令权限等级
+        stats (int): 查看运行状态命令权限等级
+        broadcast (int): 群发命令（``post @all`` 或者 ``post a,b,c``）权限等级
+        expiry (int): 查看即将过期的订单命令权限等级
     """
     root: int = 0
     post: int = 0
@@ -28,17 +35,39 @@ class CommandPermission(Serializable):
     player: int = 3
     save: int = 3
     reload: int = 3
+    stats: int = 3
+    broadcast: int = 3
+    expiry: int = 3
 
 
 class Configuration(Serializable):
     """插件配置
 
+    命令前缀、命令权限、存储后端、保存、查询、命令队列和运行指标相关的配置项只在插件加载时读取，
+    修改后需要重载插件，其他配置项 ``!!po reload config`` 之后就会生效
+
     Attributes:
         max_storage (int): 每个人发送的订单的最大存储量，-1不限制
         allow_alias (bool): 是否允许命令别名，如果为 False,则只会注册 !!po
         command_prefixes (list[str]): MCDR 命令前缀，可以注册多个作为别名，只需要放在一个列表内即可, !!po 一定会生效
         auto_fix (bool): 是否自动修复无效订单
         receive_tip_delay (float): 登录之后收件箱提示的延迟时间，单位为秒
+        storage (str): 订单存储后端，``json`` 使用 ``orders.json``，``sqlite`` 使用 ``orders.db``，
+            ``sharded`` 按收件人分片保存在 ``orders/`` 文件夹中
+        shard_count (int): 分片数，仅 ``sharded`` 后端在第一次创建分片时使用
+        journal_compact_threshold (int): 订单日志的记录数超过该值后会在后台压缩为快照，仅 ``json`` 后端使用
+        save_delay (float): 订单改动最多延迟多久写入磁盘，单位为秒，不大于 0 时每次改动都立即写入
+        save_max_pending (int): 未写入的订单改动达到该数量时立即写入
+        rcon_pool_size (int): 查询玩家数据时使用的 RCON 连接数，也是能同时进行的查询数，0 表示使用 MCDR 自带的 RCON 连接
+        query_timeout (float): 单次查询玩家数据的超时时间，单位为秒
+        list_page_size (int): 订单列表默认每页显示的订单数，加载时会修正到 1 到 ``MAX_LIST_PAGE_SIZE`` 之间
+        command_batch_window (float): 合并发送游戏命令的时间窗口，单位为秒，默认为一个游戏刻
+        command_rate_limit (int): 每秒最多向服务端发送的游戏命令数，不大于 0 时不限速
+        order_expire_days (float): 订单的有效期，单位为天，超过有效期还未被接收的订单会被处理，不大于 0 时订单不会过期
+        expire_action (str): 订单过期后的处理方式，``return`` 退回给寄件人（退回的订单再次过期会被删除），``purge`` 直接删除
+        metrics_file (str): 定期以 Prometheus 文本格式写出运行指标的文件，相对路径以插件的数据文件夹为准，
+            留空时不写出
+        metrics_interval (float): 写出运行指标的间隔，单位为秒
         command_permission (CommandPermission): 命令权限配置
     """
     max_storage: int = 5
@@ -46,7 +75,25 @@ class Configuration(Serializable):
     command_prefixes: list[str] = ['!!po', "!!post"]
     auto_fix: bool = False
     receive_tip_delay: float = 3
+    storage: Literal['json', 'sqlite', 'sharded'] = 'json'
+    shard_count: int = 16
+    journal_compact_threshold: int = 1000
+    save_delay: float = 5
+    save_max_pending: int = 100
+    rcon_pool_size: int = 4
+    query_timeout: float = 3
+    list_page_size: int = 10
+    command_batch_window: float = 0.05
+    command_rate_limit: int = 100
+    order_expire_days: float = 0
+    expire_action: Literal['return', 'purge'] = 'return'
+    metrics_file: str = ''
+    metrics_interval: float = 15
     command_permission: CommandPermission = CommandPermission()
 
+    def on_deserialization(self, **kwargs) -> None:
+        # 每页数量不大于 0 时无法分页，超出上限的也会在输出时被截断，不因为这一项重新生成整个配置文件
+        self.list_page_size = max(1, min(self.list_page_size, constants.MAX_LIST_PAGE_SIZE))
+
 
 __all__ = ['Configuration']
@@ -1,27 +1,98 @@
+import re
+from typing import Callable
+
 from mcdreforged.api.types import PluginServerInterface
 
 from mcdrpost.utils import tr
 from mcdrpost.utils.translation_tags import Tags
 
+Version = tuple[int, ...]
+
+_VERSION_PATTERN = re.compile(r'(\d+)\.(\d+)(?:\.(\d+))?')
+
+
+def parse_version(version: str | None) -> Version | None:
+    """把 ``1.20.1``、``1.21-pre1`` 这样的版本号解析为可以比较的整数元组
+
+    字符串比较会把 ``1.9`` 当成比 ``1.17`` 新，元组比较不会
+
+    Args:
+        version (str | None): 服务端版本
+
+    Returns:
+        Version | None: 如 ``(1, 20, 1)``，快照版本（如 ``23w31a``）等无法解析的版本为 None
+    """
+    if not version:
+        return None
+    match = _VERSION_PATTERN.match(version.strip())
+    if match is None:
+        return None
+    return tuple(int(part) for part in match.groups() if part is not None)
+
+
+class CommandTable:
+    """按服务端版本选好的游戏命令模板
+
+    版本只在创建时判断一次，之后生成命令都只是一次 ``str.format``
+
+    版本未知时（快照或者服务端还没启动）按最新版本处理
+
+    Args:
+        version (Version | None): 服务端版本
+
+    Attributes:
+        version (Version | None): 服务端版本
+        item_command (bool): ``item`` 命令是否可用，Minecraft 1.17 之后 ``replaceitem`` 被 ``item replace`` 代替
+        replace_item (Callable[..., str]): 替换物品，参数为 ``player``、``slot``、``item``
+        data_get (Callable[..., str]): 读取玩家数据，参数为 ``player``、``path``
+        playsound (Callable[..., str]): 在玩家的位置给玩家播放音效，参数为 ``player``、``sound``，
+            Minecraft 1.13 之前的 ``execute`` 命令没有 ``at`` 和 ``run``
+    """
+
+    def __init__(self, version: Version | None) -> None:
+        self.version: Version | None = version
+        self.item_command: bool = version is None or version >= (1, 17)
+        new_execute = version is None or version >= (1, 13)
+
+        self.replace_item: Callable[..., str] = (
+            'item replace entity {player} {slot} with {item}' if self.item_command
+            else 'replaceitem entity {player} {slot} {item}'
+        ).format
+        self.data_get: Callable[..., str] = 'data get entity {player} {path}'.format
+        self.playsound: Callable[..., str] = (
+            'execute at {player} run playsound {sound} player {player}' if new_execute
+            else 'execute {player} ~ ~ ~ playsound {sound} player {player}'
+        ).format
+
 
 class Environment:
+    """服务端环境，主要是 MC 版本
+
+    Attributes:
+        commands (CommandTable): 当前服务端版本的命令模板，调用 :meth:`probe` 之前按最新版本处理
+    """
+
     def __init__(self, server: PluginServerInterface) -> None:
         self._server = server
+        self.commands: CommandTable = CommandTable(None)
 
     @property
     def server_version(self) -> str | None:
         return self._server.get_server_information().version
 
-    def item_command(self) -> bool:
-        """``item`` 命令是否可用
+    def probe(self) -> CommandTable:
+        """读取服务端版本并重新生成命令模板，在服务端启动之后调用
 
-        在 Minecraft 1.17 之后，``replaceitem`` 命令被 ``item replace``代替
-        这会影响到插件替换手中物品时执行的 Minecraft 命令
+        Returns:
+            CommandTable: 新的命令模板
         """
-        if self.server_version is None:
+        server_version = self.server_version
+        if server_version is None:
             self._server.logger.warning(tr(Tags.env.server_no_start))
-            return True
-        return self.server_version >= "1.17"
+        else:
+            self._server.logger.info(tr(Tags.env.version, server_version))
+        self.commands = CommandTable(parse_version(server_version))
+        return self.commands
 
 
-__all__ = ['Environment']
+__all__ = ['CommandTable', 'Environment', 'parse_version']
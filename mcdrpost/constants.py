@@ -5,9 +5,43 @@ CONFIG_FILE_NAME: Literal['config.yml'] = 'config.yml'
 CONFIG_FILE_TYPE: Literal["yaml"] = "yaml"
 ORDERS_DATA_FILE_NAME: Literal["orders.json"] = 'orders.json'
 ORDERS_DATA_FILE_TYPE: Literal["json"] = "json"
+ORDERS_JOURNAL_FILE_NAME: Literal["orders.journal"] = 'orders.journal'
+ORDERS_DATABASE_FILE_NAME: Literal["orders.db"] = 'orders.db'
+ORDERS_ITEMS_FILE_NAME: Literal["orders.items"] = 'orders.items'
+ORDERS_SHARDS_FOLDER: Literal["orders"] = 'orders'
+SHARD_MANIFEST_FILE_NAME: Literal["manifest.json"] = 'manifest.json'
+# 并行读取分片的线程数
+SHARD_LOAD_WORKERS = 8
+
+LANG_FOLDER = 'lang'
 
 OFFHAND_CODE = 'Inventory[{Slot:-106b}]'
+INVENTORY_CODE = 'Inventory'
+# 快捷栏 0-8 和背包 9-35
+INVENTORY_SLOTS = range(36)
+ENTITY_DATA_SEPARATOR = ' has the following entity data: '
+ITEM_FORMAT_CACHE_SIZE = 256
 
 AIR = 'minecraft:air'
+OFFHAND_SLOT = 'weapon.offhand'
+
+BROADCAST_ALL = '@all'
 
 END_LINE = '\n'
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+MAX_LIST_PAGE_SIZE = 100
+# 补全玩家名、订单 ID 时最多返回的候选数
+MAX_SUGGESTIONS = 20
+
+# 到期堆中失效的条目比有效订单多出这么多时重新建堆
+EXPIRY_COMPACT_SLACK = 64
+
+# 处理到期订单的延迟任务的键，与登录提示等以玩家名为键的任务区分开
+EXPIRY_TASK_KEY = ('expiry',)
+
+# 收寄事务按玩家分段加锁的锁数
+PLAYER_LOCK_STRIPES = 64
+
+# 收寄事务的替换物品命令迟迟没有发出时，最多锁住玩家的时间，单位为秒
+TRANSACTION_TIMEOUT = 30
@@ -1,12 +1,16 @@
-from typing import Literal as LiteralType, TYPE_CHECKING
+import inspect
+from typing import Any, Callable, Literal as LiteralType, TYPE_CHECKING
 
-from mcdreforged.api.command import GreedyText, Integer, Literal, RequirementNotMet, Text
+from mcdreforged.api.command import CommandContext, GreedyText, Integer, Literal, RequirementNotMet, Text
 from mcdreforged.api.rtext import RAction, RColor, RText, RTextList
 from mcdreforged.api.types import CommandSource, InfoCommandSource, PluginServerInterface
 
-from mcdrpost.config.configuration import CommandPermission
+from mcdrpost import constants
+from mcdrpost.config.configuration import CommandPermission, Configuration
 from mcdrpost.constants import END_LINE
-from mcdrpost.utils import tr
+from mcdrpost.order_data import Order
+from mcdrpost.utils import get_formatted_time, tr, translation_cache
+from mcdrpost.utils.metrics import Histogram, Metrics
 from mcdrpost.utils.translation_tags import Tags
 
 if TYPE_CHECKING:
@@ -14,13 +18,45 @@ if TYPE_CHECKING:
 
 
 class CommandManager:
-    """命令管理器"""
+    """命令管理器
+
+    每个命令的处理耗时按命令记录在 ``mcdrpost_command_seconds`` 中，
+    收寄命令在查询线程中完成，由 :meth:`PostManager._transaction` 记录整个事务的耗时
+    """
 
     def __init__(self, post_manager: "PostManager") -> None:
         self._post_manager: "PostManager" = post_manager
         self._server: PluginServerInterface = post_manager.server
         self._prefixes: list[str] = post_manager.config_manager.configuration.command_prefixes
         self._perm: CommandPermission = post_manager.config_manager.configuration.command_permission
+        self._metrics: Metrics = post_manager.metrics
+        # (命令前缀, 语言, 权限档位) -> 帮助信息
+        self._help_messages: dict[tuple[str, str, int], RTextList] = {}
+        post_manager.config_manager.add_reload_callback(self.clear_help_cache)
+
+    @property
+    def _config(self) -> Configuration:
+        return self._post_manager.config_manager.configuration
+
+    def _timed(self, command: str, callback: Callable[..., Any]) -> Callable[[CommandSource, CommandContext], None]:
+        """辅助函数：包装命令的回调，记录处理耗时
+
+        MCDR 按回调的参数个数传参，包装后的回调总是接收 (src, ctx)，再按原回调的参数个数转发
+
+        Args:
+            command (str): 命令名，作为指标的 ``command`` 标签
+            callback (Callable[..., Any]): 原回调
+        """
+        histogram: Histogram = self._metrics.histogram(
+            'mcdrpost_command_seconds', 'Time spent in command handlers', command=command
+        )
+        arg_count = min(2, len(inspect.signature(callback).parameters))
+
+        def run(src: CommandSource, ctx: CommandContext) -> None:
+            with histogram.time():
+                callback(*(src, ctx)[:arg_count])
+
+        return run
 
     def register(self) -> None:
         """注册命令树
@@ -36,11 +72,40 @@ class CommandManager:
                 self.generate_command_node(prefix)
             )
 
+    def clear_help_cache(self) -> None:
+        """清空帮助信息缓存，配置重载时调用"""
+        self._help_messages.clear()
+
+    @staticmethod
+    def _help_tier(source: CommandSource) -> int:
+        """帮助信息的权限档位：0 普通玩家，1 helper，2 admin 及以上"""
+        if source.has_permission(3):
+            return 2
+        if source.has_permission(2):
+            return 1
+        return 0
+
     def output_help_message(self, source: CommandSource, prefix: str) -> None:
-        """辅助函数：打印帮助信息"""
+        """辅助函数：打印帮助信息
+
+        帮助信息按 (命令前缀, 语言, 权限档位) 缓存，只有第一次需要构建
+        """
+        key = (prefix, self._server.get_mcdr_language(), self._help_tier(source))
+        message = self._help_messages.get(key)
+        if message is None:
+            message = self._help_messages[key] = self._build_help_message(prefix, key[2])
+        source.reply(message)
+
+    def _build_help_message(self, prefix: str, tier: int) -> RTextList:
+        """构建帮助信息
+
+        Args:
+            prefix (str): 命令前缀
+            tier (int): 权限档位，见 :meth:`_help_tier`
+        """
         msgs_on_helper = RText('')
         msgs_on_admin = RText('')
-        if source.has_permission(2):
+        if tier >= 1:
             # helper以上权限的添加信息
             msgs_on_helper = RTextList(
                 RText(prefix + ' list orders', RColor.gray)
@@ -49,7 +114,7 @@ class CommandManager:
 
                 RText(tr(Tags.help.hint_ls_orders) + END_LINE),
             )
-        if source.has_permission(3):
+        if tier >= 2:
             # admin以上权限的添加信息
             msgs_on_admin = RTextList(
                 RText(prefix + tr(Tags.help.player_add), RColor.gray)
@@ -59,113 +124,261 @@ class CommandManager:
                 RText(prefix + tr(Tags.help.player_remove), RColor.gray)
                 .c(RAction.suggest_command, f"{prefix} player remove ")
                 .h(tr('hover')), RText(f'{tr("help.hint_player_remove")}\n'),
-            )
 
-        source.reply(
-            RTextList(
-                RText('--------- §3MCDRpost §r---------\n'),
-                RText(tr(Tags.desc) + END_LINE),
-                RText(tr(Tags.help.title) + END_LINE),
-                RText(prefix, RColor.gray).c(RAction.suggest_command, prefix).h(tr('hover')),
-                RText(f' | {tr(Tags.help.hint_help)}\n'),
-                RText(prefix + tr(Tags.help.p), RColor.gray).c(RAction.suggest_command, f"{prefix} post").h(
-                    tr(Tags.hover)),
-                RText(f'{tr(Tags.help.hint_p)}\n'),
-                RText(prefix + ' rl', RColor.gray).c(RAction.suggest_command, f"{prefix} receive_list").h(tr('hover')),
-                RText(f'{tr(Tags.help.hint_rl)}\n'),
-                RText(prefix + tr('help.r'), RColor.gray).c(RAction.suggest_command, f"{prefix} receive").h(
-                    tr('hover')),
-                RText(f'{tr(Tags.help.hint_r)}\n'),
-                RText(prefix + ' pl', RColor.gray)
-                .c(RAction.suggest_command, f"{prefix} post_list").h(tr('hover')),
-                RText(f'{tr(Tags.help.hint_pl)}\n'),
-                RText(prefix + tr(Tags.help.c), RColor.gray)
-                .c(RAction.suggest_command, f"{prefix} cancel").h(tr('hover')),
-                RText(f'{tr(Tags.help.hint_c)}\n'),
-                RText(prefix + ' ls players', RColor.gray)
-                .c(RAction.suggest_command, f"{prefix} list players").h(tr('hover')),
-                RText(f'{tr(Tags.help.hint_ls_players)}\n'),
-                msgs_on_helper,
-                msgs_on_admin,
-                RText("§a『别名 Alias』§r\n"),
-                RText("    list -> ls 或 l\n", RColor.gray),
-                RText("    receive -> r\n", RColor.gray),
-                RText("    post -> p\n", RColor.gray),
-                RText("    cancel -> c\n", RColor.gray),
-                RText(f'根指令: {", ".join(self._prefixes)}\n'),
-                RText('-----------------------'),
+                RText(prefix + tr(Tags.help.broadcast), RColor.gray)
+                .c(RAction.suggest_command, f"{prefix} post @all")
+                .h(tr(Tags.hover)), RText(tr(Tags.help.hint_broadcast) + END_LINE),
+
+                RText(prefix + ' expiry', RColor.gray)
+                .c(RAction.suggest_command, f"{prefix} expiry")
+                .h(tr(Tags.hover)), RText(tr(Tags.help.hint_expiry) + END_LINE),
+
+                RText(prefix + ' stats', RColor.gray)
+                .c(RAction.suggest_command, f"{prefix} stats")
+                .h(tr(Tags.hover)), RText(tr(Tags.help.hint_stats) + END_LINE),
             )
+
+        return RTextList(
+            RText('--------- §3MCDRpost §r---------\n'),
+            RText(tr(Tags.desc) + END_LINE),
+            RText(tr(Tags.help.title) + END_LINE),
+            RText(prefix, RColor.gray).c(RAction.suggest_command, prefix).h(tr('hover')),
+            RText(f' | {tr(Tags.help.hint_help)}\n'),
+            RText(prefix + tr(Tags.help.p), RColor.gray).c(RAction.suggest_command, f"{prefix} post").h(
+                tr(Tags.hover)),
+            RText(f'{tr(Tags.help.hint_p)}\n'),
+            RText(prefix + ' rl', RColor.gray).c(RAction.suggest_command, f"{prefix} receive_list").h(tr('hover')),
+            RText(f'{tr(Tags.help.hint_rl)}\n'),
+            RText(prefix + tr('help.r'), RColor.gray).c(RAction.suggest_command, f"{prefix} receive").h(
+                tr('hover')),
+            RText(f'{tr(Tags.help.hint_r)}\n'),
+            RText(prefix + ' receive all', RColor.gray)
+            .c(RAction.suggest_command, f"{prefix} receive all").h(tr(Tags.hover)),
+            RText(tr(Tags.help.hint_r_all) + END_LINE),
+            RText(prefix + ' pl', RColor.gray)
+            .c(RAction.suggest_command, f"{prefix} post_list").h(tr('hover')),
+            RText(f'{tr(Tags.help.hint_pl)}\n'),
+            RText(prefix + tr(Tags.help.c), RColor.gray)
+            .c(RAction.suggest_command, f"{prefix} cancel").h(tr('hover')),
+            RText(f'{tr(Tags.help.hint_c)}\n'),
+            RText(prefix + ' ls players', RColor.gray)
+            .c(RAction.suggest_command, f"{prefix} list players").h(tr('hover')),
+            RText(f'{tr(Tags.help.hint_ls_players)}\n'),
+            msgs_on_helper,
+            msgs_on_admin,
+            RText("§a『别名 Alias』§r\n"),
+            RText("    list -> ls 或 l\n", RColor.gray),
+            RText("    receive -> r\n", RColor.gray),
+            RText("    post -> p\n", RColor.gray),
+            RText("    cancel -> c\n", RColor.gray),
+            RText(f'根指令: {", ".join(self._prefixes)}\n'),
+            RText('-----------------------'),
         )
 
-    def output_post_list(self, src: InfoCommandSource) -> None:
-        """辅助函数：输出玩家发送的订单列表"""
-        post_list = self._post_manager.order_manager.get_orders_by_sender(
-            src.get_info().player
+    def _page_controls(self, command: str, page: int, pages: int, page_size: int, total: int) -> RTextList:
+        """辅助函数：生成翻页按钮，点击后执行 ``command`` 的上一页/下一页"""
+
+        def button(text: str, target: int) -> RText:
+            if target < 1 or target > pages:
+                return RText(text, RColor.dark_gray)
+            target_command = f'{command} {target} {page_size}'
+            return RText(text, RColor.aqua).c(RAction.run_command, target_command).h(target_command)
+
+        return RTextList(
+            button(tr(Tags.page.prev), page - 1),
+            RText('  '),
+            RText(tr(Tags.page.info, page, pages, total)),
+            RText('  '),
+            button(tr(Tags.page.next), page + 1),
         )
 
-        if not post_list:
+    def _output_order_page(
+            self,
+            src: CommandSource,
+            page: int,
+            page_size: int,
+            *,
+            total: int,
+            fetch: Callable[[int, int], list[Order]],
+            row: Callable[[Order], str],
+            title: str,
+            hint: str | None,
+            command: str,
+    ) -> None:
+        """辅助函数：输出一页订单
+
+        只会取出并渲染当前页的订单，超出范围的页码会被修正为最后一页
+
+        Args:
+            src (CommandSource): 命令源
+            page (int): 页码，从 1 开始
+            page_size (int): 每页的订单数
+            total (int): 订单总数
+            fetch (Callable[[int, int], list[Order]]): 按 (offset, limit) 取出一页订单
+            row (Callable[[Order], str]): 把订单渲染为一行
+            title (str): 表头
+            hint (str | None): 表尾的提示信息
+            command (str): 翻页时执行的命令（不含页码）
+        """
+        page_size = max(1, min(page_size, constants.MAX_LIST_PAGE_SIZE))
+        pages = (total + page_size - 1) // page_size
+        page = max(1, min(page, pages))
+        rows = END_LINE.join(row(order) for order in fetch((page - 1) * page_size, page_size))
+
+        src.reply(RTextList(
+            RText('===========================================\n'),
+            RText(title + END_LINE),
+            RText(rows + END_LINE),
+            RText('-------------------------------------------\n' + hint + END_LINE if hint else ''),
+            self._page_controls(command, page, pages, page_size, total),
+            RText('\n==========================================='),
+        ))
+
+    def output_post_list(self, src: InfoCommandSource, page: int = 1, page_size: int | None = None) -> None:
+        """辅助函数：分页输出玩家发送的订单列表"""
+        player = src.get_info().player
+        order_manager = self._post_manager.order_manager
+        total = order_manager.count_orders_by_sender(player)
+        if not total:
             src.reply(tr(Tags.no_post_orders))
             return
 
-        msg = ""
+        self._output_order_page(
+            src, page, page_size or self._config.list_page_size,
+            total=total,
+            fetch=lambda offset, limit: order_manager.get_orders_page_by_sender(player, offset, limit),
+            row=lambda order: f"{order.id}  | {order.receiver}  | {get_formatted_time(order.time)}  | {order.comment}",
+            title=tr(Tags.list_post_orders_title),
+            hint=tr(Tags.hint_cancel),
+            command=f'{self._prefixes[0]} post_list',
+        )
 
-        for order in post_list:
-            msg += f"{order.id}  | {order.receiver}  | {order.time}  | {order.comment}\n"
+    def output_receive_list(self, src: InfoCommandSource, page: int = 1, page_size: int | None = None) -> None:
+        """辅助函数：分页输出玩家待接收的邮件列表"""
+        player = src.get_info().player
+        order_manager = self._post_manager.order_manager
+        total = order_manager.count_orders_by_receiver(player)
+        if not total:
+            src.reply(tr(Tags.no_receive_orders))
+            return
 
-        src.reply(
-            '===========================================\n'
-            '{0}\n'
-            '{1}'
-            '-------------------------------------------\n'
-            '{2}'
-            '===========================================\n'
-            .format(tr(Tags.list_post_orders_title), msg, tr(Tags.hint_cancel))
+        self._output_order_page(
+            src, page, page_size or self._config.list_page_size,
+            total=total,
+            fetch=lambda offset, limit: order_manager.get_orders_page_by_receiver(player, offset, limit),
+            row=lambda order: f"{order.id}  | {order.sender}  | {get_formatted_time(order.time)}  | {order.comment}",
+            title=tr(Tags.list_receive_orders_title),
+            hint=tr(Tags.hint_order_receive),
+            command=f'{self._prefixes[0]} receive_list',
         )
 
-    def output_receive_list(self, src: InfoCommandSource) -> None:
-        """辅助函数：输出玩家待接收的邮件列表"""
-        receive_list = self._post_manager.order_manager.get_orders_by_receiver(
-            src.get_info().player
+    def output_all_orders(self, src: CommandSource, page: int = 1, page_size: int | None = None) -> None:
+        """辅助函数：分页输出所有订单列表"""
+        order_manager = self._post_manager.order_manager
+        total = order_manager.count_orders()
+        if not total:
+            src.reply(tr(Tags.no_orders))
+            return
+
+        self._output_order_page(
+            src, page, page_size or self._config.list_page_size,
+            total=total,
+            fetch=order_manager.get_orders_page,
+            row=lambda order: (
+                f"{order.id}  | {order.sender}  | {order.receiver}  | {get_formatted_time(order.time)}  | {order.comment}"
+            ),
+            title=tr(Tags.list_orders_title),
+            hint=None,
+            command=f'{self._prefixes[0]} list orders',
         )
 
-        if not receive_list:
-            src.reply(tr(Tags.no_receive_orders))
+    def output_expiring_orders(self, src: CommandSource, page: int = 1, page_size: int | None = None) -> None:
+        """辅助函数：按到期时间分页输出即将过期的订单"""
+        order_manager = self._post_manager.order_manager
+        if self._config.order_expire_days <= 0:
+            src.reply(tr(Tags.expiry.disabled))
+            return
+        total = order_manager.count_orders()
+        if not total:
+            src.reply(tr(Tags.no_orders))
             return
 
-        msg = ""
-
-        for order in receive_list:
-            msg += f"{order.id}  | {order.sender}  | {order.time}  | {order.comment}\n"
+        self._output_order_page(
+            src, page, page_size or self._config.list_page_size,
+            total=total,
+            fetch=order_manager.get_orders_page_by_expiry,
+            row=lambda order: (
+                f"{order.id}  | {order.sender}  | {order.receiver}  | "
+                f"{get_formatted_time(order_manager.get_order_deadline(order))}"
+            ),
+            title=tr(Tags.expiry.list_title),
+            hint=None,
+            command=f'{self._prefixes[0]} expiry',
+        )
 
-        src.reply(
-            '===========================================\n'
-            '{0}\n'
-            '{1}\n'
-            '-------------------------------------------\n'
-            '{2}'
-            '===========================================\n'
-            .format(tr(Tags.list_receive_orders_title), msg, tr(Tags.hint_order_receive))
+    def _with_page_args(
+            self,
+            node: Literal,
+            command: str,
+            output: Callable[[CommandSource, int, int | None], None],
+    ) -> Literal:
+        """辅助函数：给列表节点加上可选的 ``[<页码>] [<每页数量>]`` 参数
+
+        Args:
+            node (Literal): 列表节点
+            command (str): 命令名，见 :meth:`_timed`
+            output (Callable[[CommandSource, int, int | None], None]): 按 (src, 页码, 每页数量) 输出列表
+        """
+        return (
+            node.
+            runs(self._timed(command, lambda src: output(src, 1, None))).
+            then(
+                Integer('page').at_min(1).
+                runs(self._timed(command, lambda src, ctx: output(src, ctx['page'], None))).
+                then(
+                    Integer('page_size').in_range(1, constants.MAX_LIST_PAGE_SIZE).
+                    runs(self._timed(command, lambda src, ctx: output(src, ctx['page'], ctx['page_size'])))
+                )
+            )
         )
 
-    def output_all_orders(self, src: InfoCommandSource) -> None:
-        """辅助函数：输出所有订单列表"""
-        all_orders = self._post_manager.order_manager.get_orders()
+    def _suggest_receivers(self, ctx: CommandContext) -> list[str]:
+        """辅助函数：补全收件人，在线玩家排在前面
 
-        if not all_orders:
-            src.reply(tr(Tags.no_orders))
+        逗号分隔的多个收件人只补全最后一个
+        """
+        head, comma, prefix = ctx.command_remaining.rpartition(',')
+        players = self._post_manager.order_manager.complete_players(
+            prefix, constants.MAX_SUGGESTIONS, self._post_manager.online_players.snapshot()
+        )
+        return [head + comma + player for player in players]
 
-        msg = ""
+    def _suggest_order_ids(self, src: InfoCommandSource, ctx: CommandContext, as_sender: bool) -> list[str]:
+        """辅助函数：补全玩家待接收或者寄出的订单 ID"""
+        return self._post_manager.order_manager.complete_order_ids(
+            src.get_info().player, ctx.command_remaining, constants.MAX_SUGGESTIONS, as_sender=as_sender
+        )
 
-        for order in all_orders:
-            msg += f"{order.id}  | {order.sender}  | {order.receiver}  | {order.time}  | {order.comment}\n"
+    def _dispatch_post(self, src: InfoCommandSource, receiver: str, comment: str = None) -> None:
+        """辅助函数：``@all`` 或者逗号分隔的多个收件人是群发，否则是普通的发送"""
+        if receiver != constants.BROADCAST_ALL and ',' not in receiver:
+            self._post_manager.post(src, receiver, comment)
+            return
 
-        src.reply(
-            '===========================================\n'
-            '{0}\n'
-            '{1}\n'
-            '===========================================\n'
-            .format(tr(Tags.list_orders_title), msg)
-        )
+        if not src.has_permission(self._perm.broadcast):
+            src.reply(tr(Tags.no_permission))
+            return
+
+        order_manager = self._post_manager.order_manager
+        if receiver == constants.BROADCAST_ALL:
+            receivers = order_manager.get_players()
+        else:
+            receivers = [name for name in receiver.split(',') if name]
+            unknown = [name for name in receivers if not order_manager.is_player_registered(name)]
+            if unknown:
+                src.reply(tr(Tags.broadcast.unknown_receivers, ', '.join(unknown)))
+                return
+        self._post_manager.broadcast(src, receivers, comment)
 
     def gen_post_node(self, node_name: str) -> Literal:
         return (
@@ -177,23 +390,24 @@ class CommandManager:
             runs(lambda src: src.reply(tr(Tags.no_input_receiver))).
             then(
                 Text('receiver').
-                suggests(self._post_manager.order_manager.get_players).
-                runs(lambda src, ctx: self._post_manager.post(src, ctx['receiver'])).
+                suggests(lambda src, ctx: self._suggest_receivers(ctx)).
+                runs(lambda src, ctx: self._dispatch_post(src, ctx['receiver'])).
                 then(
                     GreedyText('comment').
-                    runs(lambda src, ctx: self._post_manager.post(src, ctx['receiver'], ctx['comment']))
+                    runs(lambda src, ctx: self._dispatch_post(src, ctx['receiver'], ctx['comment']))
                 )
             )
         )
 
     def gen_post_list_node(self, node_name: str) -> Literal:
-        return (
+        return self._with_page_args(
             Literal(node_name).
             requires(lambda src: src.is_player and src.has_permission(self._perm.post)).
             on_error(RequirementNotMet, lambda src: src.reply(
-                tr(Tags.no_permission if not src.is_player else Tags.only_for_player)
-            ), handled=True).
-            runs(lambda src: self.output_post_list(src))
+                tr(Tags.no_permission if src.is_player else Tags.only_for_player)
+            ), handled=True),
+            'post_list',
+            self.output_post_list
         )
 
     def gen_receive_node(self, node_name: str) -> Literal:
@@ -204,31 +418,26 @@ class CommandManager:
                 tr(Tags.no_permission if src.is_player else Tags.only_for_player)
             ), handled=True).
             runs(lambda src: src.reply(tr(Tags.no_input_receive_orderid))).
+            then(
+                Literal('all').
+                runs(self._post_manager.receive_all)
+            ).
             then(
                 Integer('orderid').
-                suggests(
-                    lambda src: [
-                        str(i) for i in
-                        self._post_manager.order_manager.get_orderid_by_receiver(src.get_info().player)
-                    ]
-                ).
-                runs(
-                    lambda src, ctx: (
-                        self._post_manager.receive(src, ctx['orderid']),
-                        src.reply(tr(Tags.receive_success, ctx['orderid']))
-                    )
-                )
+                suggests(lambda src, ctx: self._suggest_order_ids(src, ctx, as_sender=False)).
+                runs(lambda src, ctx: self._post_manager.receive(src, ctx['orderid']))
             )
         )
 
     def gen_receive_list_node(self, node_name: str) -> Literal:
-        return (
+        return self._with_page_args(
             Literal(node_name).
             requires(lambda src: src.is_player and src.has_permission(self._perm.receive)).
             on_error(RequirementNotMet, lambda src: src.reply(
                 tr(Tags.no_permission if src.is_player else Tags.only_for_player)
-            ), handled=True).
-            runs(lambda src: self.output_receive_list(src))
+            ), handled=True),
+            'receive_list',
+            self.output_receive_list
         )
 
     def gen_cancel_node(self, node_name: str) -> Literal:
@@ -241,18 +450,8 @@ class CommandManager:
             runs(lambda src: src.reply(tr(Tags.no_input_cancel_orderid))).
             then(
                 Integer('orderid').
-                suggests(
-                    lambda src: [
-                        str(i) for i in
-                        self._post_manager.order_manager.get_orderid_by_sender(src.get_info().player)
-                    ]
-                ).
-                runs(
-                    lambda src, ctx: (
-                        self._post_manager.receive(src, ctx['orderid']),
-                        src.reply(tr(Tags.cancel_success, ctx['orderid']))
-                    )
-                )
+                suggests(lambda src, ctx: self._suggest_order_ids(src, ctx, as_sender=True)).
+                runs(lambda src, ctx: self._post_manager.cancel(src, ctx['orderid']))
             )
         )
 
@@ -263,31 +462,19 @@ class CommandManager:
             then(
                 Literal('players').
                 requires(lambda src: src.has_permission(self._perm.list_player)).
-                runs(lambda src: src.reply(
+                runs(self._timed('list_players', lambda src: src.reply(
                     tr(Tags.list_player_title) + str(self._post_manager.order_manager.get_players())
-                ))
+                )))
             ).
-            then(
+            then(self._with_page_args(
                 Literal('orders').
                 requires(lambda src: src.has_permission(self._perm.list_orders)).
-                on_error(RequirementNotMet, lambda src: src.reply(tr(Tags.no_permission)), handled=True).
-                runs(lambda src: self.output_all_orders(src))
-            ).
-            then(
-                Literal('receive').
-                requires(lambda src: src.is_player and src.has_permission(self._perm.receive)).
-                on_error(RequirementNotMet, lambda src: src.reply(
-                    tr(Tags.no_permission if src.is_player else Tags.only_for_player)
-                ), handled=True).
-                runs(lambda src: self.output_receive_list(src))
-            ).then(
-                Literal('post').
-                requires(lambda src: src.is_player and src.has_permission(self._perm.post)).
-                on_error(RequirementNotMet, lambda src: src.reply(
-                    tr(Tags.no_permission if src.is_player else Tags.only_for_player)
-                ), handled=True).
-                runs(lambda src: self.output_post_list(src))
-            )
+                on_error(RequirementNotMet, lambda src: src.reply(tr(Tags.no_permission)), handled=True),
+                'list_orders',
+                self.output_all_orders
+            )).
+            then(self.gen_receive_list_node('receive')).
+            then(self.gen_post_list_node('post'))
         )
 
     def gen_player_node(self, node_name: str) -> Literal:
@@ -301,7 +488,9 @@ class CommandManager:
                 runs(lambda src: src.reply(tr(Tags.command_incomplete))).
                 then(
                     Text('player_id').
-                    runs(lambda src, ctx: self._post_manager.order_manager.add_player(ctx['player_id']))
+                    runs(self._timed(
+                        'player_add', lambda src, ctx: self._post_manager.order_manager.add_player(ctx['player_id'])
+                    ))
                 )
             ).
             then(
@@ -309,33 +498,125 @@ class CommandManager:
                 runs(lambda src: src.reply(tr(Tags.command_incomplete))).
                 then(
                     Text('player_id').
-                    suggests(self._post_manager.order_manager.get_players).
-                    runs(lambda src, ctx: self._post_manager.order_manager.remove_player(ctx['player_id']))
+                    suggests(lambda src, ctx: self._post_manager.order_manager.complete_players(
+                        ctx.command_remaining, constants.MAX_SUGGESTIONS
+                    )).
+                    runs(self._timed(
+                        'player_remove',
+                        lambda src, ctx: self._post_manager.order_manager.remove_player(ctx['player_id']),
+                    ))
                 )
             )
         )
 
+    def _latency_lines(self) -> list[str]:
+        """辅助函数：每个有记录的直方图一行，依次是命令、查询和存储"""
+        prefix = self._prefixes[0]
+        named: list[tuple[str, Histogram]] = []
+        for labels, histogram in self._metrics.histograms('mcdrpost_command_seconds').items():
+            named.append((f'{prefix} {dict(labels)["command"]}', histogram))
+        for labels, histogram in self._metrics.histograms('mcdrpost_query_seconds').items():
+            named.append((f'rcon {dict(labels)["target"]}', histogram))
+        for name in ('flush', 'save', 'reload'):
+            for histogram in self._metrics.histograms(f'mcdrpost_{name}_seconds').values():
+                named.append((name, histogram))
+        return [
+            tr(
+                Tags.stats.latency, name, histogram.count,
+                histogram.quantile(0.5) * 1000, histogram.quantile(0.99) * 1000,
+            )
+            for name, histogram in named if histogram.count
+        ]
+
+    def output_stats(self, src: CommandSource) -> None:
+        """辅助函数：输出插件的运行状态
+
+        包括收寄计数、各命令和 RCON 查询的延迟分布以及保存情况，延迟的分位数由直方图估算
+        """
+        pipeline = self._post_manager.command_pipeline
+        order_manager = self._post_manager.order_manager
+        metrics = self._metrics
+
+        def total(name: str) -> int:
+            return sum(counter.value for counter in metrics.counters(name).values())
+
+        failures = ', '.join(
+            f'{dict(labels)["reason"]} {counter.value}'
+            for labels, counter in metrics.counters('mcdrpost_failures_total').items()
+        )
+        lines = [
+            tr(Tags.stats.title),
+            tr(
+                Tags.stats.orders,
+                total('mcdrpost_posts_total'), total('mcdrpost_receives_total'),
+                total('mcdrpost_cancels_total'), total('mcdrpost_failures_total'),
+            ),
+        ]
+        if failures:
+            lines.append(tr(Tags.stats.failures, failures))
+        lines.append(tr(
+            Tags.stats.storage,
+            order_manager.count_orders(), len(order_manager.get_players()), order_manager.last_save_changes,
+        ))
+        lines.append(tr(
+            Tags.stats.command_pipeline,
+            pipeline.submitted, pipeline.sent, pipeline.batches, pipeline.throughput,
+            pipeline.depth, pipeline.max_depth,
+        ))
+        lines.append(tr(Tags.stats.translation, translation_cache.hits, translation_cache.misses))
+        latency_lines = self._latency_lines()
+        if latency_lines:
+            lines.append(tr(Tags.stats.latency_title))
+            lines.extend(latency_lines)
+        src.reply(END_LINE.join(lines))
+
+    def gen_expiry_node(self, node_name: str) -> Literal:
+        return self._with_page_args(
+            Literal(node_name).
+            requires(lambda src: src.has_permission(self._perm.expiry)).
+            on_error(RequirementNotMet, lambda src: src.reply(tr(Tags.no_permission)), handled=True),
+            'expiry',
+            self.output_expiring_orders
+        )
+
+    def gen_stats_node(self, node_name: str) -> Literal:
+        return (
+            Literal(node_name).
+            requires(lambda src: src.has_permission(self._perm.stats)).
+            on_error(RequirementNotMet, lambda src: src.reply(tr(Tags.no_permission)), handled=True).
+            runs(self._timed('stats', self.output_stats))
+        )
+
     def _gen_save_load_node(self, node_name: str, t: LiteralType["save", "reload"]) -> Literal:
         """生成 save/load 节点
 
         这两个节点很相似，提取公共部分到这里
         """
+        def runner(target: object):
+            def run(src: CommandSource) -> None:
+                result = getattr(target, t)()
+                if t == 'save':
+                    # 保存时报告写入了多少条未保存的订单改动
+                    src.reply(tr(Tags.save_success, result or 0))
+
+            return self._timed(t, run)
+
         return (
             Literal(node_name).
             requires(lambda src: src.has_permission(getattr(self._perm, t))).
             on_error(RequirementNotMet, lambda src: src.reply(tr(Tags.no_permission)), handled=True).
-            runs(getattr(self._post_manager, t)).
+            runs(runner(self._post_manager)).
             then(
                 Literal('all').
-                runs(getattr(self._post_manager, t))
+                runs(runner(self._post_manager))
             ).
             then(
                 Literal('config').
-                runs(getattr(self._post_manager.config_manager, t))
+                runs(runner(self._post_manager.config_manager))
             ).
             then(
                 Literal('orders').
-                runs(getattr(self._post_manager.order_manager, t))
+                runs(runner(self._post_manager.order_manager))
             )
         )
 
@@ -345,13 +626,26 @@ class CommandManager:
     def gen_reload_node(self, node_name: str) -> Literal:
         return self._gen_save_load_node(node_name, 'reload')
 
+    def _is_available(self, ctx: CommandContext) -> bool:
+        """辅助函数：订单已经加载完成，或者执行的是 reload 命令"""
+        return self._post_manager.order_manager.ready or ctx.command_remaining.split(' ', 1)[0] == 'reload'
+
+    def _unavailable_reason(self) -> str:
+        """辅助函数：邮箱不可用时的回复，区分还在加载和加载失败"""
+        if self._post_manager.order_manager.loaded:
+            return tr(Tags.loading.failed)
+        return tr(Tags.loading.in_progress)
+
     def generate_command_node(self, prefix: str) -> Literal:
         """生成指令树"""
         return (
             Literal(prefix).
-            requires(lambda src: src.has_permission(self._perm.root)).
-            on_error(RequirementNotMet, lambda src: src.reply(tr(Tags.no_permission)), handled=True).
-            runs(lambda src: self.output_help_message(src, prefix)).
+            requires(lambda src: src.has_permission(self._perm.root), lambda: tr(Tags.no_permission)).
+            # 订单加载完成之前除了 reload 之外的命令都只回复“邮箱加载中”或“加载失败”，不会读到空的订单数据，
+            # reload 不受限制，加载失败之后可以用它重试
+            requires(lambda src, ctx: self._is_available(ctx), self._unavailable_reason).
+            on_error(RequirementNotMet, lambda src, error: src.reply(error.get_reason()), handled=True).
+            runs(self._timed('help', lambda src: self.output_help_message(src, prefix))).
             then(self.gen_post_node('p')).
             then(self.gen_post_node('post')).
             then(self.gen_post_list_node('pl')).
@@ -366,7 +660,9 @@ class CommandManager:
             then(self.gen_list_node('list')).
             then(self.gen_player_node('player')).
             then(self.gen_save_node('save')).
-            then(self.gen_reload_node('reload'))
+            then(self.gen_reload_node('reload')).
+            then(self.gen_stats_node('stats')).
+            then(self.gen_expiry_node('expiry'))
         )
 
 
@@ -1,4 +1,4 @@
-from typing import TYPE_CHECKING
+from typing import Callable, TYPE_CHECKING
 
 from mcdreforged.api.types import PluginServerInterface
 
@@ -23,14 +23,21 @@ class ConfigurationManager:
         self._server: PluginServerInterface = post_manager.server
         self.environment: Environment = Environment(self._server)
         self.configuration: Configuration | None = None
+        self._reload_callbacks: list[Callable[[], None]] = []
         self.reload()
 
+    def add_reload_callback(self, callback: Callable[[], None]) -> None:
+        """注册一个回调，在每次重载配置之后调用，用于清理依赖配置的缓存"""
+        self._reload_callbacks.append(callback)
+
     def reload(self) -> None:
         self.configuration = self._server.load_config_simple(
             constants.CONFIG_FILE_NAME,
             target_class=Configuration,
             file_format=constants.CONFIG_FILE_TYPE,
         )
+        for callback in self._reload_callbacks:
+            callback()
 
     def save(self) -> None:
         self._server.save_config_simple(
@@ -1,10 +1,22 @@
+import heapq
+import threading
+import time
 from collections import defaultdict
-from typing import DefaultDict, TYPE_CHECKING
+from itertools import islice
+from typing import Any, Callable, DefaultDict, Iterable, TYPE_CHECKING
+
+from mcdreforged.api.decorator import new_thread
 
 from mcdrpost import constants
-from mcdrpost.order_data import Order, OrderData, OrderInfo, OrderInfoDict
+from mcdrpost.config.configuration import Configuration
+from mcdrpost.order_data import Order, OrderInfo, OrderInfoDict, PlayerInfo, to_timestamp
+from mcdrpost.order_record import OrderRecord, StringPool
+from mcdrpost.player_registry import PlayerRegistry
+from mcdrpost.storage import OrderStorage, create_storage
+from mcdrpost.storage.save_scheduler import SaveScheduler
 from mcdrpost.utils import tr
 from mcdrpost.utils.exception import InvalidOrder
+from mcdrpost.utils.id_allocator import IdAllocator
 from mcdrpost.utils.translation_tags import Tags
 
 if TYPE_CHECKING:
@@ -12,7 +24,14 @@ if TYPE_CHECKING:
 
 
 class OrderManager:
-    """订单管理器"""
+    """订单管理器
+
+    订单和索引都维护在内存中，每次改动都会交给存储后端（由配置中的 ``storage`` 选择）持久化，
+    再由 ``SaveScheduler`` 在后台合并写入
+
+    物品只保存在存储后端中，只有取出订单（:meth:`get_order`、:meth:`pop_order` 等）时才会读取，
+    列出订单的方法返回的订单 ``item`` 为空字符串
+    """
 
     def __init__(self, post_manager: "PostManager") -> None:
         """初始化
@@ -23,25 +42,73 @@ class OrderManager:
         # initialize
         self._post_manager: "PostManager" = post_manager
         self._logger = post_manager.server.logger
-        self._config = post_manager.config_manager.configuration
+        self._lock = threading.RLock()
+
+        # storage
+        self._storage: OrderStorage = create_storage(post_manager.server, self._config, self._snapshot)
+        self._save_scheduler: SaveScheduler = SaveScheduler(
+            self._flush,
+            self._logger,
+            max_delay=self._config.save_delay,
+            max_pending=self._config.save_max_pending,
+        )
+
+        # metrics
+        metrics = post_manager.metrics
+        self._flush_seconds = metrics.histogram('mcdrpost_flush_seconds', 'Time spent writing order changes')
+        self._save_seconds = metrics.histogram('mcdrpost_save_seconds', 'Time spent on a full save')
+        self._reload_seconds = metrics.histogram('mcdrpost_reload_seconds', 'Time spent reloading orders')
+        self._last_save_changes: int = 0
+        metrics.gauge('mcdrpost_orders', 'Orders in the mailbox', self.count_orders)
+        metrics.gauge('mcdrpost_players', 'Registered players', lambda: len(self._players))
+        metrics.gauge(
+            'mcdrpost_last_save_changes', 'Order changes written by the last full save',
+            lambda: self.last_save_changes,
+        )
 
         # index
-        self._sender_orders: DefaultDict[str, list[int]] = defaultdict(list)
-        self._receiver_orders: DefaultDict[str, list[int]] = defaultdict(list)
+        # 用 dict 的键作为有序集合，值都为 None，既能 O(1) 判断和删除，又能保持订单的添加顺序
+        self._sender_orders: DefaultDict[str, dict[int, None]] = defaultdict(dict)
+        self._receiver_orders: DefaultDict[str, dict[int, None]] = defaultdict(dict)
+        self._id_allocator: IdAllocator = IdAllocator()
+        self._players: PlayerRegistry = PlayerRegistry()
+        # (是否为寄件人, 玩家) -> 订单 ID 的字符串，与索引中的顺序相同
+        # 只为补全过订单 ID 的玩家创建，之后随订单增删更新，不用每次补全都重新转换
+        self._id_strings: dict[tuple[bool, str], list[str]] = {}
+
+        # expiry
+        # (到期时间, 订单 ID) 的小根堆，由 PostManager 的延迟任务在最早的到期时间处理，不需要定期扫描所有订单
+        # 堆中的条目不会随订单删除，出堆时再判断是否还有效
+        self._expiry: list[tuple[float, int]] = []
+        # 堆中已经失效（订单已被取走）的条目数，太多时重新建堆
+        self._expiry_stale: int = 0
+        post_manager.config_manager.add_reload_callback(self._rebuild_expiry)
+
+        # 订单以紧凑的 OrderRecord 保存，玩家名、物品和备注都从字符串池中获取
+        self._orders: dict[int, OrderRecord] = {}
+        self._strings: StringPool = StringPool()
 
         # load data
-        self._order_data: OrderData | None = None
-        self.reload()
-
-    def _build_index(self) -> None:
-        """构建索引"""
-        self._sender_orders.clear()
-        self._receiver_orders.clear()
-        for order in self._order_data.orders.values():
-            self._sender_orders[order.sender].append(order.id)
-            self._receiver_orders[order.receiver].append(order.id)
-
-    def _check_orders(self) -> None:
+        # _loaded 表示加载已经结束（无论成功与否），_ready 表示加载成功
+        self._loaded = threading.Event()
+        self._ready = threading.Event()
+        self._ready_lock = threading.Lock()
+        self._ready_callbacks: list[Callable[[], None]] = []
+        self.load_async()
+
+    @property
+    def _config(self) -> Configuration:
+        return self._post_manager.config_manager.configuration
+
+    @staticmethod
+    def _discard_index(index: dict[str, dict[int, None]], player: str, order_id: int) -> None:
+        """从索引中删除订单，玩家没有订单之后连同玩家一起删除"""
+        orders = index[player]
+        del orders[order_id]
+        if not orders:
+            del index[player]
+
+    def _check_order(self, order_id: str, order: Order) -> None:
         """检查订单
 
         主要是订单的 ID 能不能对上索引
@@ -49,30 +116,267 @@ class OrderManager:
         .. versionchanged:: v3.1.1
             改用索引作为订单 ID
         """
-        for order_id, order in self._order_data.orders.items():
-            if str(order.id) == order_id:
-                continue
-            if not self._config.auto_fix:
-                raise InvalidOrder(tr(Tags.error.invalid_order, order_id, order.id))
-            self._logger.error(tr(Tags.error.invalid_order, order_id, order.id))
-            self._logger.error(tr(Tags.auto_fix.invalid_order, order_id))
-            self._order_data.orders[order_id].id = int(order_id)
+        if str(order.id) == order_id:
+            return
+        if not self._config.auto_fix:
+            raise InvalidOrder(tr(Tags.error.invalid_order, order_id, order.id))
+        self._logger.error(tr(Tags.error.invalid_order, order_id, order.id))
+        self._logger.error(tr(Tags.auto_fix.invalid_order, order_id))
+        order.id = int(order_id)
+
+    @staticmethod
+    def _migrate_order_time(order: Order) -> bool:
+        """把旧版本格式化字符串的发送时间转换为时间戳，只修改内存中的订单，写回存储后端由调用方负责
+
+        .. versionchanged:: v3.2.0
+            订单的发送时间改为时间戳
+
+        Returns:
+            bool: 是否进行了转换
+        """
+        if not isinstance(order.time, str):
+            return False
+        order.time = to_timestamp(order.time)
+        return True
+
+    @property
+    def _ttl(self) -> float:
+        """订单的有效期，单位为秒，不大于 0 表示不会过期"""
+        return self._config.order_expire_days * 86400
+
+    def _rebuild_expiry(self) -> None:
+        """根据当前的订单和有效期重新建立到期堆"""
+        with self._lock:
+            ttl = self._ttl
+            self._expiry_stale = 0
+            if ttl <= 0:
+                self._expiry = []
+            else:
+                self._expiry = [(order.time + ttl, order.id) for order in self._orders.values()]
+                heapq.heapify(self._expiry)
+            self._schedule_expiry()
+
+    def _schedule_expiry(self) -> None:
+        """在最早的到期时间处理到期的订单，调用时需要持有锁
+
+        同一时间只有一个到期任务，堆顶变化时才需要重新安排
+        """
+        scheduler = self._post_manager.scheduler
+        scheduler.cancel(constants.EXPIRY_TASK_KEY)
+        if self._expiry:
+            scheduler.schedule(
+                max(0.0, self._expiry[0][0] - time.time()), self._expire_due, key=constants.EXPIRY_TASK_KEY
+            )
+
+    def _expire_due(self) -> None:
+        """延迟任务：依次处理已经到期的订单，再安排下一次"""
+        while True:
+            with self._lock:
+                if not self._expiry or self._expiry[0][0] > time.time():
+                    self._schedule_expiry()
+                    return
+                deadline, order_id = heapq.heappop(self._expiry)
+            try:
+                self._on_order_expired(order_id, deadline)
+            except Exception:
+                self._logger.exception(f'Error occurred while expiring order {order_id}')
+
+    def _on_order_expired(self, order_id: int, deadline: float) -> None:
+        """订单到期：退回给寄件人，已经退回过的订单或者配置为 ``purge`` 时直接删除"""
+        with self._lock:
+            order = self._orders.get(order_id)
+            # 订单已经被取走，或者 id 已被新的订单复用
+            if order is None or order.time + self._ttl != deadline:
+                self._expiry_stale = max(0, self._expiry_stale - 1)
+                return
+            returned_id = None
+            if self._config.expire_action == 'return' and not order.returned:
+                item = self._storage.load_item(order_id)
+                self._remove_order(order_id)
+                returned_id = self._add_order(OrderInfo(
+                    time=time.time(),
+                    sender=order.sender,
+                    receiver=order.sender,
+                    item=item,
+                    comment=tr(Tags.expiry.returned_comment, order.receiver, order.comment),
+                    returned=True,
+                ))
+            else:
+                self._remove_order(order_id)
+            self._save_scheduler.mark_dirty()
+
+        if returned_id is None:
+            self._logger.info(tr(Tags.expiry.purged, order_id, order.sender, order.receiver))
+        else:
+            self._logger.info(tr(Tags.expiry.returned, order_id, order.sender, returned_id))
+            # 退回的订单计入寄件人的待接收订单，离线时等登录时一起提示
+            if self._post_manager.online_players.maybe_online(order.sender):
+                self._post_manager.server.tell(order.sender, tr(Tags.expiry.hint_returned, order_id, returned_id))
+
+    def _snapshot(self) -> dict[str, Any]:
+        """完整的订单数据，订单中没有 ``item``，由存储后端补上"""
+        with self._lock:
+            return {
+                'orders': {str(order_id): order.serialize() for order_id, order in self._orders.items()},
+                **self._players.serialize(),
+            }
+
+    @property
+    def ready(self) -> bool:
+        """订单是否已经加载完成"""
+        return self._ready.is_set()
+
+    @property
+    def loaded(self) -> bool:
+        """加载是否已经结束（无论成功与否）"""
+        return self._loaded.is_set()
+
+    def wait_until_ready(self, timeout: float | None = None) -> bool:
+        """等待加载结束
+
+        Args:
+            timeout (float | None): 最长等待时间，单位为秒，None 表示一直等待
+
+        Returns:
+            bool: 订单是否加载成功
+        """
+        self._loaded.wait(timeout)
+        return self.ready
+
+    def when_ready(self, callback: Callable[[], None]) -> None:
+        """订单加载完成后调用 ``callback``，已经加载完成时立即调用，加载失败时不会调用"""
+        with self._ready_lock:
+            if not self._loaded.is_set():
+                self._ready_callbacks.append(callback)
+                return
+        if self.ready:
+            callback()
+
+    def load_async(self) -> None:
+        """在后台线程中加载订单
+
+        后台线程会一直持有锁直到加载完成，加载期间其他线程加锁的读写（大部分公开方法）都会等待加载完成，
+        不会读到一半的数据，也不会在加载完成后被覆盖
+        """
+        locked = threading.Event()
+
+        @new_thread('MCDRpost-load orders')
+        def load() -> None:
+            started_at = time.perf_counter()
+            try:
+                with self._lock:
+                    locked.set()
+                    timings = self._load()
+                self._ready.set()
+            except Exception:
+                self._logger.exception(tr(Tags.loading.failed))
+            else:
+                self._logger.info(tr(
+                    Tags.loading.finished, len(self._orders), len(self._players),
+                    (time.perf_counter() - started_at) * 1000, *timings,
+                ))
+            finally:
+                locked.set()
+                with self._ready_lock:
+                    self._loaded.set()
+                    callbacks, self._ready_callbacks = self._ready_callbacks, []
+                for callback in callbacks if self.ready else ():
+                    try:
+                        callback()
+                    except Exception:
+                        self._logger.exception(f'Error occurred in {callback} after orders were loaded')
+
+        load()
+        locked.wait()
+
+    def _load(self) -> tuple[float, float]:
+        """读取订单并建立索引，调用时需要持有锁
+
+        检查订单、转换发送时间、创建记录和建立索引都在同一次遍历中完成，
+        结果先放在局部变量中，整次遍历成功后才替换当前的订单和索引，
+        因此检查失败（抛出 :class:`InvalidOrder`）时内存中仍是重载前的完整数据
+
+        Returns:
+            tuple[float, float]: 读取存储后端和建立索引分别花费的时间，单位为毫秒
+        """
+        started_at = time.perf_counter()
+        # 先把还没写入的改动写进去，否则重载之后它们就丢失了
+        self._save_scheduler.flush()
+        order_data = self._storage.load()
+        loaded_at = time.perf_counter()
+
+        strings = StringPool()
+        orders: dict[int, OrderRecord] = {}
+        sender_orders: DefaultDict[str, dict[int, None]] = defaultdict(dict)
+        receiver_orders: DefaultDict[str, dict[int, None]] = defaultdict(dict)
+        migrated: list[Order] = []
+        for order_id, order in order_data.orders.items():
+            self._check_order(order_id, order)
+            if self._migrate_order_time(order):
+                migrated.append(order)
+            record = orders[order.id] = OrderRecord.create(order.id, order, strings)
+            sender_orders[record.sender][record.id] = None
+            receiver_orders[record.receiver][record.id] = None
+
+        # 全部检查通过，替换当前数据
+        self._orders = orders
+        self._strings = strings
+        self._sender_orders = sender_orders
+        self._receiver_orders = receiver_orders
+        self._id_strings.clear()
+        # 玩家名单之后由 PlayerRegistry 维护
+        self._players.load(order_data.players, order_data.player_info)
+        self._players.reset_inbox()
+        for receiver, ids in receiver_orders.items():
+            self._players.adjust_inbox(receiver, len(ids))
+        self._id_allocator.rebuild(self._orders)
+        self._rebuild_expiry()
+        if migrated:
+            for order in migrated:
+                order.item = self._storage.load_item(order.id)
+                self._storage.add_order(order)
+                order.item = ''
+            self._logger.info(tr(Tags.storage.time_migrated, len(migrated)))
+            self._save_scheduler.mark_dirty()
+        return (loaded_at - started_at) * 1000, (time.perf_counter() - loaded_at) * 1000
+
+    @property
+    def last_save_changes(self) -> int:
+        """上一次完整保存写入的改动数"""
+        return self._last_save_changes
+
+    def _flush(self) -> int:
+        """写入未保存的改动，并记录耗时"""
+        with self._flush_seconds.time():
+            return self._storage.flush()
 
     def reload(self) -> None:
-        self._order_data = self._post_manager.server.load_config_simple(
-            constants.ORDERS_DATA_FILE_NAME,
-            target_class=OrderData,
-            file_format=constants.ORDERS_DATA_FILE_TYPE
-        )
-        self._check_orders()
-        self._build_index()
-
-    def save(self) -> None:
-        self._post_manager.server.save_config_simple(
-            self._order_data,
-            constants.ORDERS_DATA_FILE_NAME,
-            file_format=constants.ORDERS_DATA_FILE_TYPE,
-        )
+        """同步重新加载订单，加载失败后重载成功也会让邮箱恢复可用"""
+        with self._reload_seconds.time(), self._lock:
+            self._load()
+        self._ready.set()
+
+    def save(self) -> int:
+        """立即写入所有改动并保存完整数据
+
+        会先等待订单加载结束，加载失败时不会保存，以免用空的数据覆盖原来的文件
+
+        Returns:
+            int: 本次写入的未保存改动数
+        """
+        if not self.wait_until_ready():
+            return 0
+        with self._save_seconds.time():
+            flushed = self._save_scheduler.flush()
+            self._storage.save()
+        self._last_save_changes = flushed
+        return flushed
+
+    def close(self) -> None:
+        """写入剩余的改动并关闭存储后端，在插件卸载时调用"""
+        self._loaded.wait()
+        self._save_scheduler.shutdown()
+        self._storage.close()
 
     def is_player_registered(self, player: str) -> bool:
         """检查玩家是否已经注册
@@ -83,33 +387,97 @@ class OrderManager:
         Returns:
             bool: 是否已经注册
         """
-        return player in self._order_data.players
-
-    def add_player(self, player: str) -> bool:
-        if player in self._order_data.players:
-            return False
-        self._order_data.players.append(player)
+        return player in self._players
+
+    def add_player(self, player: str, last_seen: float = 0) -> bool:
+        with self._lock:
+            info = self._players.add(player, PlayerInfo(
+                last_seen=last_seen,
+                inbox=len(self._receiver_orders.get(player, ())),
+            ))
+            if info is None:
+                return False
+            self._storage.add_player(player, info)
+            self._save_scheduler.mark_dirty()
         return True
 
     def remove_player(self, player: str) -> bool:
-        if player not in self._order_data.players:
-            return False
-        self._order_data.players.remove(player)
+        with self._lock:
+            if not self._players.remove(player):
+                return False
+            self._storage.remove_player(player)
+            self._save_scheduler.mark_dirty()
         return True
 
+    def touch_player(self, player: str, last_seen: float) -> None:
+        """更新已注册玩家的上次登录时间"""
+        with self._lock:
+            info = self._players.get(player)
+            if info is None:
+                return
+            info.last_seen = last_seen
+            self._storage.update_player(player, info)
+            self._save_scheduler.mark_dirty()
+
+    def get_player_info(self, player: str) -> PlayerInfo | None:
+        return self._players.get(player)
+
     def get_players(self) -> list[str]:
-        return self._order_data.players
+        return self._players.names()
+
+    def complete_players(self, prefix: str, limit: int, preferred: Iterable[str] = ()) -> list[str]:
+        """补全已注册的玩家名，见 :meth:`PlayerRegistry.complete`"""
+        with self._lock:
+            return self._players.complete(prefix, limit, preferred)
+
+    def complete_order_ids(self, player: str, prefix: str, limit: int, *, as_sender: bool = False) -> list[str]:
+        """补全玩家的订单 ID
+
+        Args:
+            player (str): 玩家名
+            prefix (str): 已经输入的部分
+            limit (int): 最多返回的订单数
+            as_sender (bool): 补全玩家寄出的订单而不是待接收的订单
+
+        Returns:
+            list[str]: 以 ``prefix`` 开头的订单 ID，按添加顺序排列
+        """
+        key = (as_sender, player)
+        with self._lock:
+            id_strings = self._id_strings.get(key)
+            if id_strings is None:
+                index = self._sender_orders if as_sender else self._receiver_orders
+                id_strings = self._id_strings[key] = [str(order_id) for order_id in index.get(player, ())]
+            return list(islice((order_id for order_id in id_strings if order_id.startswith(prefix)), limit))
 
     def get_next_id(self) -> int:
         """获取最小的有效 ID"""
-        if not self._order_data.orders:
-            return 1
+        return self._id_allocator.peek()
 
-        order_id = 1
-        id_set = set(o.id for o in self._order_data.orders.values())
-        while order_id in id_set:
-            order_id += 1
+    @staticmethod
+    def _to_order_info(order: OrderInfo | OrderInfoDict) -> OrderInfo:
+        if isinstance(order, dict):
+            return OrderInfo.deserialize(order)
+        if not isinstance(order, OrderInfo):
+            raise TypeError("不支持非 OrderInfo 类型的订单信息")
+        return order
 
+    def _add_order(self, order: OrderInfo) -> int:
+        order_id = self._id_allocator.allocate()
+        record = self._orders[order_id] = OrderRecord.create(order_id, order, self._strings)
+        self._sender_orders[record.sender][order_id] = None
+        self._receiver_orders[record.receiver][order_id] = None
+        self._players.adjust_inbox(record.receiver, 1)
+        for key in ((True, record.sender), (False, record.receiver)):
+            if (id_strings := self._id_strings.get(key)) is not None:
+                id_strings.append(str(order_id))
+        self._storage.add_order(record.to_order(order.item))
+        if (ttl := self._ttl) > 0:
+            entry = (record.time + ttl, order_id)
+            heapq.heappush(self._expiry, entry)
+            # 只有新的订单最早到期时才需要重新安排到期任务
+            if self._expiry[0] == entry:
+                self._schedule_expiry()
         return order_id
 
     def add_order(self, order: OrderInfo | OrderInfoDict) -> int:
@@ -124,60 +492,195 @@ class OrderManager:
         Raises:
             TypeError: 订单信息类型错误（检查传入的数据类型是否为 ``dict`` 或者 ``OrderInfo``）
         """
-        if isinstance(order, dict):
-            order = OrderInfo.deserialize(order)
-        elif not isinstance(order, OrderInfo):
-            raise TypeError("不支持非 OrderInfo 类型的订单信息")
-
-        order_id = self.get_next_id()
-        self._order_data.orders[str(order_id)] = Order.deserialize(
-            order.serialize(),
-            id=order_id,
-        )
-        self._sender_orders[order.sender].append(order_id)
-        self._receiver_orders[order.receiver].append(order_id)
+        order = self._to_order_info(order)
+        with self._lock:
+            order_id = self._add_order(order)
+            self._save_scheduler.mark_dirty()
         return order_id
 
-    def remove_order(self, order_id: int) -> bool:
-        if order_id not in self._order_data.orders:
+    def add_orders(self, orders: Iterable[OrderInfo | OrderInfoDict]) -> list[int]:
+        """一次添加多个订单
+
+        所有订单在同一次加锁中添加，并作为一批改动写入存储后端
+
+        Args:
+            orders (Iterable[OrderInfo | OrderInfoDict]): 订单信息
+
+        Returns:
+            list[int]: 订单 ID，顺序与传入的订单一致
+
+        Raises:
+            TypeError: 订单信息类型错误
+        """
+        orders = [self._to_order_info(order) for order in orders]
+        with self._lock:
+            order_ids = [self._add_order(order) for order in orders]
+            if order_ids:
+                self._save_scheduler.mark_dirty()
+        return order_ids
+
+    def _remove_order(self, order_id: int) -> bool:
+        order = self._orders.pop(order_id, None)
+        if order is None:
             return False
-        order = self._order_data.orders[str(order_id)]
-        self._sender_orders[order.sender].remove(order_id)
-        self._receiver_orders[order.receiver].remove(order_id)
-        del self._order_data.orders[str(order_id)]
+        self._discard_index(self._sender_orders, order.sender, order_id)
+        self._discard_index(self._receiver_orders, order.receiver, order_id)
+        self._players.adjust_inbox(order.receiver, -1)
+        for key in ((True, order.sender), (False, order.receiver)):
+            if (id_strings := self._id_strings.get(key)) is not None:
+                id_strings.remove(str(order_id))
+        order.release(self._strings)
+        self._id_allocator.release(order_id)
+        self._storage.remove_order(order_id)
+        return True
+
+    def remove_order(self, order_id: int) -> bool:
+        with self._lock:
+            if not self._remove_order(order_id):
+                return False
+            self._save_scheduler.mark_dirty()
+            if self._ttl > 0:
+                # 到期堆中的条目要等到期时才会被丢弃，积攒太多时重新建堆
+                self._expiry_stale += 1
+                if self._expiry_stale > len(self._orders) + constants.EXPIRY_COMPACT_SLACK:
+                    self._rebuild_expiry()
         return True
 
     def get_order(self, order_id: int) -> Order:
-        return self._order_data.orders[str(order_id)]
+        """获取订单，包括物品"""
+        with self._lock:
+            return self._orders[order_id].to_order(self._storage.load_item(order_id))
 
     def get_orders(self) -> list[Order]:
-        return list(self._order_data.orders.values())
+        with self._lock:
+            return [order.to_order() for order in self._orders.values()]
+
+    def owns_order(self, player: str, order_id: int, *, as_sender: bool = False) -> bool:
+        """玩家是否为订单的收件人
+
+        Args:
+            player (str): 玩家名
+            order_id (int): 订单 ID
+            as_sender (bool): 改为检查玩家是否为订单的寄件人
+
+        Returns:
+            bool: 订单存在且属于该玩家
+        """
+        orders = (self._sender_orders if as_sender else self._receiver_orders).get(player)
+        return orders is not None and order_id in orders
 
     def get_orderid_by_sender(self, sender: str) -> list[int]:
-        return self._sender_orders[sender]
+        return list(self._sender_orders.get(sender, ()))
 
     def get_orderid_by_receiver(self, receiver: str) -> list[int]:
-        return self._receiver_orders[receiver]
+        return list(self._receiver_orders.get(receiver, ()))
 
     def get_orders_by_sender(self, sender: str) -> list[Order]:
-        return [
-            self._order_data.orders[str(order_id)]
-            for order_id in self._sender_orders[sender]
-        ]
+        with self._lock:
+            return [self._orders[order_id].to_order() for order_id in self._sender_orders.get(sender, ())]
 
     def get_orders_by_receiver(self, receiver: str) -> list[Order]:
-        return [
-            self._order_data.orders[str(order_id)]
-            for order_id in self._receiver_orders[receiver]
-        ]
+        with self._lock:
+            return [self._orders[order_id].to_order() for order_id in self._receiver_orders.get(receiver, ())]
+
+    def _page(self, order_ids: Iterable[int], offset: int, limit: int) -> list[Order]:
+        return [self._orders[order_id].to_order() for order_id in islice(order_ids, offset, offset + limit)]
+
+    def get_orders_page(self, offset: int, limit: int) -> list[Order]:
+        """按添加顺序获取一页订单
+
+        只会取出这一页的订单，不会复制整个订单列表
+
+        Args:
+            offset (int): 跳过的订单数
+            limit (int): 最多返回的订单数
+        """
+        with self._lock:
+            return [order.to_order() for order in islice(self._orders.values(), offset, offset + limit)]
+
+    def get_orders_page_by_sender(self, sender: str, offset: int, limit: int) -> list[Order]:
+        """按添加顺序获取寄件人的一页订单，参数同 :meth:`get_orders_page`"""
+        with self._lock:
+            return self._page(self._sender_orders.get(sender, ()), offset, limit)
+
+    def get_orders_page_by_receiver(self, receiver: str, offset: int, limit: int) -> list[Order]:
+        """按添加顺序获取收件人的一页订单，参数同 :meth:`get_orders_page`"""
+        with self._lock:
+            return self._page(self._receiver_orders.get(receiver, ()), offset, limit)
+
+    def get_orders_page_by_expiry(self, offset: int, limit: int) -> list[Order]:
+        """按到期时间获取一页订单，参数同 :meth:`get_orders_page`，订单不会过期时为空列表"""
+        with self._lock:
+            ttl = self._ttl
+            if ttl <= 0:
+                return []
+            wanted = offset + limit
+            window = wanted
+            while True:
+                entries = heapq.nsmallest(window, self._expiry)
+                orders = [
+                    order for deadline, order_id in entries
+                    if (order := self._orders.get(order_id)) is not None
+                    and order.time + ttl == deadline
+                ]
+                # 取到的条目中有失效的，扩大范围再取一次
+                if len(orders) >= wanted or len(entries) < window:
+                    return [order.to_order() for order in orders[offset:wanted]]
+                window *= 2
+
+    def get_order_deadline(self, order: Order) -> float | None:
+        """订单的到期时间，订单不会过期时为 None"""
+        ttl = self._ttl
+        return order.time + ttl if ttl > 0 else None
+
+    def count_orders(self) -> int:
+        return len(self._orders)
+
+    def count_orders_by_sender(self, sender: str) -> int:
+        return len(self._sender_orders.get(sender, ()))
+
+    def count_orders_by_receiver(self, receiver: str) -> int:
+        return len(self._receiver_orders.get(receiver, ()))
 
     def has_unreceived_order(self, player: str) -> bool:
-        return bool(self._receiver_orders[player])
+        return player in self._receiver_orders
+
+    def take_order(self, player: str, order_id: int, *, as_sender: bool = False) -> Order | None:
+        """订单属于该玩家时取出订单
+
+        检查和取出是原子的，同一个订单不会被取出两次
+
+        Args:
+            player (str): 玩家名
+            order_id (int): 订单 ID
+            as_sender (bool): 玩家是寄件人而不是收件人
+
+        Returns:
+            Order | None: 被取出的订单，订单不存在或者不属于该玩家时为 None
+        """
+        with self._lock:
+            if not self.owns_order(player, order_id, as_sender=as_sender):
+                return None
+            return self.pop_order(order_id)
+
+    def take_orders(self, receiver: str, limit: int) -> list[Order]:
+        """按添加顺序取出收件人最多 ``limit`` 个订单
+
+        Args:
+            receiver (str): 收件人
+            limit (int): 最多取出的订单数
+
+        Returns:
+            list[Order]: 被取出的订单
+        """
+        with self._lock:
+            order_ids = list(islice(self._receiver_orders.get(receiver, ()), limit))
+            return [self.pop_order(order_id) for order_id in order_ids]
 
     def pop_order(self, order_id: int) -> Order:
-        order = self.get_order(order_id)
-        self.remove_order(order_id)
-        self.save()
+        with self._lock:
+            order = self.get_order(order_id)
+            self.remove_order(order_id)
         return order
 
 
@@ -1,17 +1,26 @@
+import os
+import threading
 import time
+from concurrent.futures import Future
+from typing import Callable
 
-from mcdreforged.api.decorator import new_thread
 from mcdreforged.api.types import Info, InfoCommandSource, PluginServerInterface
 
 from mcdrpost import constants
 from mcdrpost.manager.command_manager import CommandManager
 from mcdrpost.manager.config_manager import ConfigurationManager
 from mcdrpost.manager.order_manager import OrderManager
+from mcdrpost.manager.query_manager import QueryManager
+from mcdrpost.config.environment import CommandTable
 from mcdrpost.order_data import OrderInfo
-from mcdrpost.utils import get_formatted_item, get_formatted_time, get_offhand_item, play_sound, tr
-from mcdrpost.utils.replace_offhand_item import replace_for_17, replace_for_lower_17
+from mcdrpost.utils import get_formatted_item, play_sound, snbt, tr, translation_cache
+from mcdrpost.utils.command_pipeline import CommandPipeline
+from mcdrpost.utils.metrics import Metrics, MetricsExporter
+from mcdrpost.utils.player_locks import PlayerLocks
+from mcdrpost.utils.presence import OnlinePlayers
+from mcdrpost.utils.replace_offhand_item import replace_item
+from mcdrpost.utils.task_scheduler import TaskScheduler
 from mcdrpost.utils.translation_tags import Tags
-from mcdrpost.utils.types import ReplaceFunction
 
 
 class PostManager:
@@ -19,76 +28,186 @@ class PostManager:
 
     Attributes:
         server (PluginServerInterface): MCDR插件接口
+        metrics (Metrics): 运行指标，其他管理器创建时会注册自己的指标，所以最先创建
         config_manager (ConfigurationManager): 配置管理
+        scheduler (TaskScheduler): 延迟任务，登录后的收件提示等延迟通知和订单到期都从这里处理
         order_manager (OrderManager): 订单管理
+        query_manager (QueryManager): 游戏数据查询
+        command_pipeline (CommandPipeline): 游戏命令队列，替换物品和播放音效的命令都从这里发送
         command_manager (CommandManager): 命令注册
+        player_locks (PlayerLocks): 按玩家分段的锁，收寄事务用它保证同一个玩家的操作依次进行
+        online_players (OnlinePlayers): 在线玩家，补全收件人时排在前面，离线的收件人不会收到消息和音效
     """
 
     def __init__(self, server: PluginServerInterface) -> None:
         self.server: PluginServerInterface = server
+        self.metrics: Metrics = Metrics()
         self.config_manager: ConfigurationManager = ConfigurationManager(self)
+        # 订单管理器用它处理到期的订单，要先于订单管理器创建
+        self.scheduler: TaskScheduler = TaskScheduler(server.logger)
         self.order_manager: OrderManager = OrderManager(self)
+        self.query_manager: QueryManager = QueryManager(self)
+        self.command_pipeline: CommandPipeline = CommandPipeline(
+            server,
+            self.query_manager.get_rcon_pool,
+            window=self.config_manager.configuration.command_batch_window,
+            rate_limit=self.config_manager.configuration.command_rate_limit,
+        )
         self.command_manager: CommandManager = CommandManager(self)
-        self._replace: ReplaceFunction = replace_for_lower_17
+        self.player_locks: PlayerLocks = PlayerLocks(constants.PLAYER_LOCK_STRIPES)
+        self.online_players: OnlinePlayers = OnlinePlayers()
+        self._exporter: MetricsExporter | None = None
+
+        self._posts = self.metrics.counter('mcdrpost_posts_total', 'Orders posted, including broadcast copies')
+        self._receives = self.metrics.counter('mcdrpost_receives_total', 'Orders received')
+        self._cancels = self.metrics.counter('mcdrpost_cancels_total', 'Orders cancelled by their senders')
+        self.metrics.counter_func(
+            'mcdrpost_translation_cache_hits_total', 'Translations served from the translation cache',
+            lambda: translation_cache.hits,
+        )
+        self.metrics.counter_func(
+            'mcdrpost_translation_cache_misses_total', 'Translations handed over to MCDR',
+            lambda: translation_cache.misses,
+        )
+        self.metrics.gauge(
+            'mcdrpost_scheduled_tasks', 'Delayed notifications waiting to be sent',
+            lambda: len(self.scheduler),
+        )
+        self.metrics.gauge(
+            'mcdrpost_command_queue', 'Game commands waiting in the command pipeline',
+            lambda: self.command_pipeline.depth,
+        )
 
-    def _refresh_replace(self) -> None:
-        if self.config_manager.environment.item_command():
-            self._replace: ReplaceFunction = replace_for_17
-        else:
-            self._replace: ReplaceFunction = replace_for_lower_17
+    @property
+    def commands(self) -> CommandTable:
+        """当前服务端版本的游戏命令模板"""
+        return self.config_manager.environment.commands
 
-    def replace(self, player: str, item: str) -> None:
+    def replace(self, player: str, item: str, slot: str = constants.OFFHAND_SLOT) -> Future[str | None]:
         """替换副手物品
 
         Args:
             player (str): 玩家名
             item (str): 要替换的物品 id
+            slot (str): 要替换的槽位，默认为副手
+
+        Returns:
+            Future[str | None]: 命令发出后完成，见 :meth:`CommandPipeline.execute`
         """
-        self._replace(self.server, player, item)
+        return replace_item(self.command_pipeline, self.commands, player, item, slot)
 
-    def on_load(self, _server: PluginServerInterface, _prev_module) -> None:
-        """事件: 插件加载--在这里会注册插件的命令
+    def on_load(self, server: PluginServerInterface, _prev_module) -> None:
+        """事件: 插件加载--在这里会注册插件的命令，预先读入翻译，配置了 ``metrics_file`` 时开始定期写出运行指标，
+        服务端已经启动时还会读取服务端版本，并查询已经在线的玩家
 
         .. note::
             PostManager在插件导入时通过 ``PluginServerInterface.psi()`` 获取到 PluginServerInterface 实例进行实例化，
                 而非一般的在 on_load() 内得到 PluginServerInterface 实例再实例化
         """
+        translation_cache.warm(server)
         self.command_manager.register()
+        # 服务端运行中重载插件时不会再收到 on_server_startup
+        if server.is_server_startup():
+            self.config_manager.environment.probe()
+            self.query_manager.submit(self._seed_online_players)
+        else:
+            self.online_players.clear()
+
+        config = self.config_manager.configuration
+        if config.metrics_file:
+            # 相对路径以插件的数据文件夹为准
+            path = os.path.join(server.get_data_folder(), config.metrics_file)
+            self._exporter = MetricsExporter(self.metrics, path, config.metrics_interval, server.logger)
+            self._exporter.start()
 
     def on_unload(self, _server: PluginServerInterface) -> None:
-        """事件: 插件卸载--保存配置文件和订单信息"""
-        self.config_manager.save()
-        self.order_manager.save()
+        """事件: 插件卸载--保存配置文件和订单信息
+
+        按依赖倒序关闭：先等正在进行的收寄事务结束，再发完它们的游戏命令，最后才保存并关闭订单存储，
+        不会有事务在存储关闭之后再写入
+        """
+        self.scheduler.shutdown()
+        self.query_manager.shutdown()
+        self.command_pipeline.shutdown()
+        self.query_manager.close_pool()
+        self.save()
+        self.order_manager.close()
+        if self._exporter is not None:
+            self._exporter.shutdown()
+            self._exporter = None
+        translation_cache.clear()
 
     def on_player_joined(self, server: PluginServerInterface, player: str, _info: Info) -> None:
         """事件: 玩家加入服务器
 
         由于 MCDRpost 不支持向未注册的玩家发送物品，要注册也不能让腐竹一个个加
         我们会在玩家加入的时候自动注册，对于老玩家，如果有未接收的订单我们会推送消息
+
+        订单还没加载完成时推迟到加载完成后再处理，否则已注册的玩家会被当成新玩家
+        """
+        self.online_players.join(player)
+        if not self.order_manager.ready:
+            self.order_manager.when_ready(lambda: self._greet_player(server, player))
+            return
+        self._greet_player(server, player)
+
+    def _greet_player(self, server: PluginServerInterface, player: str) -> None:
+        """辅助函数：订单加载完成后处理加入的玩家--注册新玩家，提示老玩家收件
+
+        推迟到加载完成后调用时玩家可能已经离开了，这时只注册不提示，也不会再把他记为在线
         """
         if not self.order_manager.is_player_registered(player):
             # 还未注册的玩家
-            self.order_manager.add_player(player)
+            self.order_manager.add_player(player, time.time())
             server.logger.info(tr(Tags.login_log, player))
-            self.order_manager.save()
             return
 
-        # 已注册的玩家，向他推送订单消息（如果有）
-        if self.order_manager.has_unreceived_order(player):
-            @new_thread('MCDRpost-send receive tip')
-            def send_receive_tip():
-                time.sleep(self.config_manager.configuration.receive_tip_delay)
-                server.tell(player, tr(Tags.wait_for_receive))
-                play_sound.has_something_to_receive(server, player)
+        self.order_manager.touch_player(player, time.time())
 
-            send_receive_tip()
+        # 已注册的玩家，向他推送订单消息（如果有）
+        # 离线期间收到的订单都不会单独通知，在这里一起提示
+        if player in self.online_players and self.order_manager.get_player_info(player).inbox:
+            def send_receive_tip() -> None:
+                inbox = self.order_manager.get_player_info(player).inbox
+                if inbox:
+                    server.tell(player, tr(Tags.wait_for_receive, inbox))
+                    play_sound.has_something_to_receive(self.command_pipeline, self.commands, player)
+
+            # 短时间内重复登录只提示一次
+            self.scheduler.cancel(player)
+            self.scheduler.schedule(self.config_manager.configuration.receive_tip_delay, send_receive_tip, key=player)
+
+    def on_player_left(self, _server: PluginServerInterface, player: str) -> None:
+        """事件: 玩家离开服务器--取消还没发出的收件提示"""
+        self.online_players.leave(player)
+        self.scheduler.cancel(player)
 
     def on_server_startup(self, _server: PluginServerInterface):
-        self._refresh_replace()
+        """事件: 服务端启动完成--按服务端版本生成游戏命令模板"""
+        self.config_manager.environment.probe()
+
+    def _seed_online_players(self) -> None:
+        """查询已经在线的玩家，查询失败时仍然当作所有玩家都可能在线"""
+        players = self.query_manager.get_online_players()
+        if players is not None:
+            self.online_players.seed(players)
+
+    def notify_receiver(self, receiver: str, order_id: int) -> bool:
+        """通知在线的收件人有新订单，离线的收件人等登录时一起提示
+
+        Returns:
+            bool: 是否发出了通知
+        """
+        if not self.online_players.maybe_online(receiver):
+            return False
+        self.server.tell(receiver, tr(Tags.hint_receive, order_id))
+        return True
 
     def on_server_stop(self, _server: PluginServerInterface, _server_return_code: int):
         """事件: 服务器关闭--保存配置信息和订单信息"""
         self.save()
+        self.online_players.clear()
+        self.query_manager.on_server_stop()
 
     def is_storage_full(self, player: str) -> bool:
         """玩家发送的订单是否抵达上限
@@ -98,7 +217,89 @@ class PostManager:
         """
         if self.config_manager.configuration.max_storage == -1:
             return False
-        return len(self.order_manager.get_orders_by_sender(player)) >= self.config_manager.configuration.max_storage
+        return self.order_manager.count_orders_by_sender(player) >= self.config_manager.configuration.max_storage
+
+    def _fail(self, src: InfoCommandSource, tag: str, *args) -> None:
+        """回复失败原因，并按原因计数"""
+        self.metrics.counter(
+            'mcdrpost_failures_total', 'Post operations rejected, by reason', reason=tag.rsplit('.', 1)[-1]
+        ).inc()
+        src.reply(tr(tag, *args))
+
+    def _transaction(
+            self,
+            command: str,
+            players: tuple[str, ...],
+            query: Callable[[str], str | None],
+            action: Callable[[str | None], list[Future[str | None]] | None],
+    ) -> None:
+        """在查询线程中以事务的方式完成一次收寄
+
+        事务会锁住涉及的玩家，在锁内查询第一个玩家的数据并交给 ``action`` 处理，
+        直到 ``action`` 返回的替换物品命令都已经发出才释放锁，命令队列出错迟迟没有发出时，
+        最多过 ``TRANSACTION_TIMEOUT`` 秒也会由延迟任务释放，不会一直锁住这些玩家。
+        同一个玩家的收寄依次进行，下一次查询一定能看到上一次替换后的物品，物品不会被重复寄出或者覆盖；
+        涉及的玩家不同的收寄互不影响，在多个查询线程中并行
+
+        命令处理线程只负责提交事务，不会被 RCON 查询或者锁阻塞。
+        从提交到释放锁的耗时按命令记录在 ``mcdrpost_command_seconds`` 中，包括排队、查询和发出替换物品命令
+
+        Args:
+            command (str): 命令名，作为指标的 ``command`` 标签
+            players (tuple[str, ...]): 涉及的玩家，第一个是要查询数据的玩家
+            query (Callable[[str], str | None]): 查询函数，如 :meth:`QueryManager.get_offhand_item`
+            action (Callable[[str | None], list[Future[str | None]] | None]): 处理查询结果，返回发出的替换物品命令，
+                异常只记录日志
+        """
+
+        histogram = self.metrics.histogram(
+            'mcdrpost_command_seconds', 'Time spent in command handlers', command=command
+        )
+        submitted_at = time.perf_counter()
+
+        def run() -> None:
+            release = self.player_locks.acquire(*players)
+            finished = threading.Lock()
+
+            def finish() -> None:
+                # 命令完成和超时都会调用，只有第一次生效
+                if not finished.acquire(blocking=False):
+                    return
+                self.scheduler.cancel(finish)
+                release()
+                histogram.observe(time.perf_counter() - submitted_at)
+
+            commands = None
+            try:
+                commands = action(query(players[0]))
+            except Exception:
+                self.server.logger.exception(f"Error occurred while handling {players[0]}'s query result")
+            finally:
+                if commands:
+                    self.scheduler.schedule(constants.TRANSACTION_TIMEOUT, finish, key=finish)
+                    # 命令队列按顺序发送，最后一条命令发出时前面的命令也都发出了
+                    commands[-1].add_done_callback(lambda _: finish())
+                else:
+                    finish()
+
+        self.query_manager.submit(run)
+
+    def _format_offhand_item(self, src: InfoCommandSource, offhand_item: str | None) -> str | None:
+        """把查询到的副手物品格式化为订单中的物品，副手为空或者无法解析时回复失败
+
+        Returns:
+            str | None: 格式化的物品，失败时为 None
+        """
+        if not offhand_item:
+            self._fail(src, Tags.check_offhand)
+            return None
+
+        try:
+            return get_formatted_item(offhand_item)
+        except snbt.SNBTDecodeError:
+            self.server.logger.exception(f"Unable to parse {src.get_info().player}'s offhand item")
+            self._fail(src, Tags.check_offhand)
+            return None
 
     def post(self, src: InfoCommandSource, receiver: str, comment: str = None) -> None:
         """发送订单
@@ -111,61 +312,185 @@ class PostManager:
         sender = src.get_info().player
 
         if self.is_storage_full(sender):
-            src.reply(tr(Tags.at_max_storage, self.config_manager.configuration.max_storage))
+            self._fail(src, Tags.at_max_storage, self.config_manager.configuration.max_storage)
             return
 
         if sender == receiver:
-            src.reply(tr(Tags.same_person))
+            self._fail(src, Tags.same_person)
             return
 
         if comment is None:
             comment = tr(Tags.no_comment)
 
-        item = get_formatted_item(
-            get_offhand_item(self.server, sender)
-        )
+        def on_offhand_item(offhand_item: str | None) -> list[Future[str | None]] | None:
+            item = self._format_offhand_item(src, offhand_item)
+            if item is None:
+                return None
 
-        # create order
-        order_id = self.order_manager.add_order(OrderInfo(
-            sender=sender,
-            receiver=receiver,
-            item=item,
-            comment=comment,
-            time=get_formatted_time(),
-        ))
-
-        self.replace(sender, constants.AIR)
-        src.reply(tr(Tags.reply_success_post))
-        self.server.tell(receiver, tr(Tags.hint_receive, order_id))
-        play_sound.successfully_post(self.server, sender, receiver)
-        self.order_manager.save()
+            # 事务开始之前检查过一次，这期间同一个玩家可能已经寄出了其他订单
+            if self.is_storage_full(sender):
+                self._fail(src, Tags.at_max_storage, self.config_manager.configuration.max_storage)
+                return None
+
+            # create order
+            order_id = self.order_manager.add_order(OrderInfo(
+                sender=sender,
+                receiver=receiver,
+                item=item,
+                comment=comment,
+                time=time.time(),
+            ))
+
+            self._posts.inc()
+            replaced = self.replace(sender, constants.AIR)
+            src.reply(tr(Tags.reply_success_post))
+            notified = self.notify_receiver(receiver, order_id)
+            play_sound.successfully_post(self.command_pipeline, self.commands, sender, receiver if notified else None)
+            return [replaced]
 
-    def receive(self, src: InfoCommandSource, order_id: int):
+        self._transaction('post', (sender, receiver), self.query_manager.get_offhand_item, on_offhand_item)
+
+    def broadcast(self, src: InfoCommandSource, receivers: list[str], comment: str = None) -> None:
+        """把副手物品作为多个订单发送给多个玩家，副手物品不会被清空
+
+        用于活动奖励之类的场景，所有订单在一次操作中创建，只会触发一次写入
+
+        Args:
+            src (InfoCommandSource): 寄件人的相关信息
+            receivers (list[str]): 收件人
+            comment (str): 备注信息
+        """
+        sender = src.get_info().player
+        receivers = [receiver for receiver in dict.fromkeys(receivers) if receiver != sender]
+        if not receivers:
+            self._fail(src, Tags.broadcast.no_receivers)
+            return
+
+        if comment is None:
+            comment = tr(Tags.no_comment)
+
+        def on_offhand_item(offhand_item: str | None) -> None:
+            item = self._format_offhand_item(src, offhand_item)
+            if item is None:
+                return
+
+            send_time = time.time()
+            order_ids = self.order_manager.add_orders(
+                OrderInfo(sender=sender, receiver=receiver, item=item, comment=comment, time=send_time)
+                for receiver in receivers
+            )
+
+            self._posts.inc(len(order_ids))
+            src.reply(tr(Tags.broadcast.success, len(order_ids)))
+            for receiver, order_id in zip(receivers, order_ids):
+                self.notify_receiver(receiver, order_id)
+
+        # 群发不会改动任何人的物品，只锁住寄件人，收件人很多时也不会阻塞他们的收寄
+        self._transaction('broadcast', (sender,), self.query_manager.get_offhand_item, on_offhand_item)
+
+    def _take_back(self, src: InfoCommandSource, order_id: int, as_sender: bool, success_tag: str) -> None:
+        """把订单中的物品放到玩家副手，接收和取消订单的公共部分"""
+        player = src.get_info().player
+
+        # 订单不属于 TA
+        if not self.order_manager.owns_order(player, order_id, as_sender=as_sender):
+            self._fail(src, Tags.unchecked_orderid)
+            return
+
+        def on_offhand_item(offhand_item: str | None) -> list[Future[str | None]] | None:
+            # 副手有东西 拒绝接收
+            if offhand_item:
+                self._fail(src, Tags.clear_offhand)
+                return None
+
+            # 查询期间订单可能已经被取走了
+            order = self.order_manager.take_order(player, order_id, as_sender=as_sender)
+            if order is None:
+                self._fail(src, Tags.unchecked_orderid)
+                return None
+
+            (self._cancels if as_sender else self._receives).inc()
+            replaced = self.replace(player, order.item)
+            src.reply(tr(success_tag, order_id))
+            play_sound.receive(self.command_pipeline, self.commands, player)
+            return [replaced]
+
+        self._transaction(
+            'cancel' if as_sender else 'receive', (player,), self.query_manager.get_offhand_item, on_offhand_item
+        )
+
+    def receive(self, src: InfoCommandSource, order_id: int) -> None:
         """接收订单
 
         Args:
             src (InfoCommandSource): 收件人的相关信息
             order_id (int): 被接收的订单的 ID
         """
-        player = src.get_info().player
+        self._take_back(src, order_id, as_sender=False, success_tag=Tags.receive_success)
 
-        # 订单接收者不是 TA
-        if order_id not in self.order_manager.get_orders_by_receiver(player):
-            src.reply(tr(Tags.unchecked_orderid))
-            return
+    def cancel(self, src: InfoCommandSource, order_id: int) -> None:
+        """取消订单，物品退回寄件人的副手
 
-        # 副手有东西 拒绝接收
-        if get_offhand_item(self.server, player):
-            src.reply(tr(Tags.clear_offhand))
-            return
+        Args:
+            src (InfoCommandSource): 寄件人的相关信息
+            order_id (int): 被取消的订单的 ID
+        """
+        self._take_back(src, order_id, as_sender=True, success_tag=Tags.cancel_success)
+
+    def receive_all(self, src: InfoCommandSource) -> None:
+        """接收所有订单，物品放进物品栏的空位，空位不够时剩下的订单留在中转站
 
-        order = self.order_manager.pop_order(order_id)
-        self.replace(player, order.item)
-        play_sound.receive(self.server, player)
+        只会查询一次物品栏
 
-    def save(self):
+        Args:
+            src (InfoCommandSource): 收件人的相关信息
+        """
+        player = src.get_info().player
+        if not self.order_manager.has_unreceived_order(player):
+            src.reply(tr(Tags.no_receive_orders))
+            return
+
+        def on_inventory(payload: str | None) -> list[Future[str | None]] | None:
+            try:
+                items = snbt.decode(payload) if payload is not None else None
+            except snbt.SNBTDecodeError:
+                self.server.logger.exception(f"Unable to parse {player}'s inventory")
+                items = None
+            if not isinstance(items, list):
+                self._fail(src, Tags.receive_all.inventory_unavailable)
+                return None
+
+            occupied = {int(item.get('Slot', -1)) for item in items if isinstance(item, dict)}
+            free_slots = [slot for slot in constants.INVENTORY_SLOTS if slot not in occupied]
+            if not free_slots:
+                self._fail(src, Tags.receive_all.inventory_full)
+                return None
+
+            orders = self.order_manager.take_orders(player, len(free_slots))
+            self._receives.inc(len(orders))
+            replaced = [
+                self.replace(player, order.item, f'container.{slot}')
+                for slot, order in zip(free_slots, orders)
+            ]
+
+            src.reply(tr(
+                Tags.receive_all.success,
+                len(orders),
+                self.order_manager.count_orders_by_receiver(player),
+            ))
+            play_sound.receive(self.command_pipeline, self.commands, player)
+            return replaced
+
+        self._transaction('receive_all', (player,), self.query_manager.get_inventory, on_inventory)
+
+    def save(self) -> int:
+        """保存配置和订单
+
+        Returns:
+            int: 本次写入的未保存订单改动数
+        """
         self.config_manager.save()
-        self.order_manager.save()
+        return self.order_manager.save()
 
     def reload(self):
         self.config_manager.reload()
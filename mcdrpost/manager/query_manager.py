@@ -0,0 +1,169 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, TYPE_CHECKING, TypeVar
+
+from mcdreforged.api.types import PluginServerInterface
+
+from mcdrpost import constants
+from mcdrpost.config.configuration import Configuration
+from mcdrpost.config.environment import Environment
+from mcdrpost.utils import snbt, tr
+from mcdrpost.utils.metrics import Metrics
+from mcdrpost.utils.presence import parse_player_list
+from mcdrpost.utils.rcon_pool import RconPool
+from mcdrpost.utils.translation_tags import Tags
+
+if TYPE_CHECKING:
+    from mcdrpost.manager.post_manager import PostManager  # noqa
+
+_T = TypeVar('_T')
+
+
+class QueryManager:
+    """查询管理器，负责向游戏查询玩家数据
+
+    查询在独立的线程池中进行，开启 RCON 时使用自己的 RCON 连接池，
+    多个玩家同时收寄时查询可以并行，不会被最慢的那一次拖住
+
+    每次查询的往返时间按查询的内容（``offhand``、``inventory``、``list``）记录在 ``mcdrpost_query_seconds`` 中
+    """
+
+    def __init__(self, post_manager: "PostManager") -> None:
+        self._server: PluginServerInterface = post_manager.server
+        self._config: Configuration = post_manager.config_manager.configuration
+        self._environment: Environment = post_manager.config_manager.environment
+        self._metrics: Metrics = post_manager.metrics
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, self._config.rcon_pool_size),
+            thread_name_prefix='MCDRpost-query',
+        )
+        self._pool: RconPool | None = None
+        self._data_api = None
+
+    @property
+    def data_api(self):
+        """``minecraft_data_api`` 插件，只在没有 RCON 时使用，第一次使用时才导入"""
+        if self._data_api is None:
+            import minecraft_data_api
+            self._data_api = minecraft_data_api
+        return self._data_api
+
+    def get_rcon_pool(self) -> RconPool | None:
+        """获取 RCON 连接池，服务端的 RCON 可用时才会创建"""
+        if self._pool is None and self._config.rcon_pool_size > 0 and self._server.is_rcon_running():
+            rcon = self._server.get_mcdr_config()['rcon']
+            self._pool = RconPool(
+                rcon['address'], rcon['port'], rcon['password'],
+                size=self._config.rcon_pool_size,
+                timeout=self._config.query_timeout,
+                logger=self._server.logger,
+            )
+        return self._pool
+
+    @staticmethod
+    def _parse_entity_data(response: str | None) -> str | None:
+        """从 ``data get entity`` 的结果中取出 SNBT，没有数据时为 None"""
+        if not response or constants.ENTITY_DATA_SEPARATOR not in response:
+            return None
+        return response.split(constants.ENTITY_DATA_SEPARATOR, 1)[1]
+
+    def _query_entity_data(self, player: str, path: str, target: str) -> str | None:
+        histogram = self._metrics.histogram(
+            'mcdrpost_query_seconds', 'Round-trip time of player data queries', target=target
+        )
+        with histogram.time():
+            return self._do_query_entity_data(player, path, target)
+
+    def _do_query_entity_data(self, player: str, path: str, target: str) -> str | None:
+        try:
+            command = self._environment.commands.data_get(player=player, path=path)
+            if (pool := self.get_rcon_pool()) is not None:
+                return self._parse_entity_data(pool.query(command))
+            if self._server.is_rcon_running():
+                return self._parse_entity_data(self._server.rcon_query(command))
+
+            self._server.logger.warning(tr(Tags.rcon.not_running))
+            # minecraft_data_api 返回的是已经转换为 JSON 的数据，数值类型只能尽量还原
+            data = self.data_api.get_player_info(player, path, timeout=self._config.query_timeout)
+            if data is not None:
+                return snbt.encode(data)
+
+        except Exception as e:
+            self._metrics.counter(
+                'mcdrpost_query_failures_total', 'Player data queries that raised an error', target=target
+            ).inc()
+            self._server.logger.error(f"Error occurred during getting {player}'s {path}")
+            self._server.logger.error(e)
+
+    def get_offhand_item(self, player: str) -> str | None:
+        """在当前线程中获取玩家副手物品
+
+        Args:
+            player (str): 玩家名
+
+        Returns:
+            str | None: 物品的 SNBT，副手为空、获取失败或超时为 None
+        """
+        return self._query_entity_data(player, constants.OFFHAND_CODE, 'offhand')
+
+    def get_inventory(self, player: str) -> str | None:
+        """在当前线程中获取玩家的整个物品栏
+
+        Args:
+            player (str): 玩家名
+
+        Returns:
+            str | None: 物品列表的 SNBT，获取失败或超时为 None
+        """
+        return self._query_entity_data(player, constants.INVENTORY_CODE, 'inventory')
+
+    def get_online_players(self) -> list[str] | None:
+        """在当前线程中用 ``list`` 命令获取在线玩家
+
+        Returns:
+            list[str] | None: 在线玩家，获取失败或超时为 None
+        """
+        histogram = self._metrics.histogram(
+            'mcdrpost_query_seconds', 'Round-trip time of player data queries', target='list'
+        )
+        with histogram.time():
+            try:
+                if (pool := self.get_rcon_pool()) is not None:
+                    return parse_player_list(pool.query('list'))
+                if self._server.is_rcon_running():
+                    return parse_player_list(self._server.rcon_query('list'))
+
+                result = self.data_api.get_server_player_list(timeout=self._config.query_timeout)
+                if result is not None:
+                    return list(result[2])
+
+            except Exception as e:
+                self._metrics.counter(
+                    'mcdrpost_query_failures_total', 'Player data queries that raised an error', target='list'
+                ).inc()
+                self._server.logger.error('Error occurred during getting online players')
+                self._server.logger.error(e)
+
+    def submit(self, task: Callable[[], _T]) -> Future[_T]:
+        """在查询线程中执行 ``task``，用于需要查询玩家数据的收寄操作"""
+        return self._executor.submit(task)
+
+    def close_pool(self) -> None:
+        """关闭 RCON 连接池，下次使用时再重新创建"""
+        if self._pool is not None:
+            self._pool.close()
+            self._pool = None
+
+    def on_server_stop(self) -> None:
+        """服务端关闭后 RCON 连接都会失效，等下次服务端启动后再重新创建"""
+        self.close_pool()
+
+    def shutdown(self) -> None:
+        """关闭线程池，在插件卸载时调用
+
+        等待已经提交的收寄事务全部完成，玩家发出的命令都会得到回复。
+        命令队列还要用连接池发出这些事务的命令，连接池在命令队列关闭之后再用 :meth:`close_pool` 关闭
+        """
+        self._executor.shutdown(wait=True)
+
+
+__all__ = ['QueryManager']
@@ -1,28 +1,75 @@
-from typing import TypedDict
+import time
+from typing import NotRequired, TypedDict, Union
 
 from mcdreforged.api.utils import Serializable
 
+from mcdrpost import constants
+
 
 class OrderInfo(Serializable):
-    time: str
+    """订单信息
+
+    Attributes:
+        time (float | str): 发送时间的时间戳，旧版本的数据为格式化的字符串，加载时会被转换为时间戳
+        sender (str): 寄件人
+        receiver (str): 收件人
+        item (str): 物品
+        comment (str): 备注
+        returned (bool): 是否为过期后退回给寄件人的订单，退回的订单再次过期会被直接删除
+    """
+    time: Union[float, str]
     sender: str
     receiver: str
     item: str
     comment: str
+    returned: bool = False
 
 
 class OrderInfoDict(TypedDict):
-    time: str
+    time: float
     sender: str
     receiver: str
     item: str
     comment: str
+    returned: NotRequired[bool]
 
 
 class Order(OrderInfo):
     id: int
 
 
+def to_timestamp(value: float | str) -> float:
+    """把订单的发送时间转换为时间戳
+
+    Args:
+        value (float | str): 时间戳，或者旧版本 ``get_formatted_time()`` 格式的字符串
+
+    Returns:
+        float: 时间戳，无法解析时为当前时间
+    """
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return time.mktime(time.strptime(value, constants.TIME_FORMAT))
+    except ValueError:
+        return time.time()
+
+
+class PlayerInfo(Serializable):
+    """已注册玩家的信息
+
+    Attributes:
+        last_seen (float): 上一次加入服务器的时间戳，0 表示未知
+        inbox (int): 待接收的订单数，加载时会根据订单重新统计
+    """
+    last_seen: float = 0
+    inbox: int = 0
+
+
 class OrderData(Serializable):
     """
     订单数据
@@ -31,8 +78,10 @@ class OrderData(Serializable):
         ``orders`` 使用 ``dict`` 而不是 ``list`` 是因为管理更加方便
 
     Attributes:
-        players (list[str]): 已注册的玩家名单
+        players (list[str]): 已注册的玩家名单，保持注册顺序
+        player_info (dict[str, PlayerInfo]): 已注册玩家的信息，旧的数据文件没有这一项也能正常加载
         orders (dict[str, Order]): 中转站内的所有订单
     """
     players: list[str] = []
+    player_info: dict[str, PlayerInfo] = {}
     orders: dict[str, Order] = {}
@@ -0,0 +1,113 @@
+"""订单在内存中的紧凑表示
+
+``Order`` 是 ``Serializable``，每个实例都带一个 ``__dict__``，而且从文件加载时每个订单的玩家名、物品、备注都是独立的字符串。
+``OrderManager`` 内部改用带 ``__slots__`` 的 ``OrderRecord``，字符串通过 ``StringPool`` 去重，
+只在需要对外返回订单时才转换为 ``Order``
+
+物品不在记录中，由存储后端保存，只在发送物品时通过 ``OrderStorage.load_item`` 读取
+"""
+from mcdrpost.order_data import Order, OrderInfo, to_timestamp
+
+
+class StringPool:
+    """带引用计数的字符串池
+
+    内容相同的字符串只保留一份，引用计数归零后从池中移除，长时间运行也不会积攒用不到的字符串
+    """
+    __slots__ = ('_strings',)
+
+    def __init__(self) -> None:
+        # 字符串 -> [池中的字符串, 引用计数]
+        self._strings: dict[str, list] = {}
+
+    def __len__(self) -> int:
+        return len(self._strings)
+
+    def acquire(self, value: str) -> str:
+        """获取池中与 ``value`` 相同的字符串，引用计数加一"""
+        entry = self._strings.get(value)
+        if entry is None:
+            self._strings[value] = [value, 1]
+            return value
+        entry[1] += 1
+        return entry[0]
+
+    def release(self, value: str) -> None:
+        """引用计数减一"""
+        entry = self._strings.get(value)
+        if entry is None:
+            return
+        entry[1] -= 1
+        if entry[1] <= 0:
+            del self._strings[value]
+
+    def clear(self) -> None:
+        self._strings.clear()
+
+
+class OrderRecord:
+    """订单记录，字段与 ``Order`` 相同，但是没有物品"""
+    __slots__ = ('id', 'time', 'sender', 'receiver', 'comment', 'returned')
+
+    def __init__(
+            self,
+            order_id: int,
+            time: float,
+            sender: str,
+            receiver: str,
+            comment: str,
+            returned: bool = False,
+    ) -> None:
+        self.id: int = order_id
+        self.time: float = time
+        self.sender: str = sender
+        self.receiver: str = receiver
+        self.comment: str = comment
+        self.returned: bool = returned
+
+    @classmethod
+    def create(cls, order_id: int, order: OrderInfo, pool: StringPool) -> 'OrderRecord':
+        """从订单信息创建记录，字符串从 ``pool`` 中获取"""
+        return cls(
+            order_id,
+            to_timestamp(order.time),
+            pool.acquire(order.sender),
+            pool.acquire(order.receiver),
+            pool.acquire(order.comment),
+            order.returned,
+        )
+
+    def release(self, pool: StringPool) -> None:
+        """记录被删除时归还字符串"""
+        for value in (self.sender, self.receiver, self.comment):
+            pool.release(value)
+
+    def serialize(self) -> dict:
+        """序列化，结果中没有 ``item``"""
+        return {
+            'time': self.time,
+            'sender': self.sender,
+            'receiver': self.receiver,
+            'comment': self.comment,
+            'returned': self.returned,
+            'id': self.id,
+        }
+
+    def to_order(self, item: str = '') -> Order:
+        """转换为 ``Order``
+
+        Args:
+            item (str): 订单的物品，只列出订单时不需要，为空字符串
+        """
+        return Order(
+            id=self.id,
+            time=self.time,
+            sender=self.sender,
+            receiver=self.receiver,
+            item=item,
+            comment=self.comment,
+            returned=self.returned,
+        )
+
+
+__all__ = ['OrderRecord', 'StringPool']
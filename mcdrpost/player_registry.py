@@ -0,0 +1,109 @@
+import bisect
+from typing import Any, Iterable, Iterator
+
+from mcdrpost.order_data import PlayerInfo
+
+
+class PlayerRegistry:
+    """已注册的玩家名单
+
+    用 ``dict`` 保存玩家和玩家信息，查询、注册、删除都是 O(1) 的，同时保留注册顺序，
+    序列化后仍然是 ``OrderData`` 中的 ``players`` 列表和 ``player_info``
+
+    另外按不区分大小写的玩家名维护一个有序数组，用于命令补全时的前缀查找
+    """
+
+    def __init__(self) -> None:
+        self._players: dict[str, PlayerInfo] = {}
+        # (小写的玩家名, 玩家名)，有序
+        self._sorted: list[tuple[str, str]] = []
+
+    def load(self, players: list[str], player_info: dict[str, PlayerInfo]) -> None:
+        """从 ``OrderData`` 中读取玩家名单
+
+        Args:
+            players (list[str]): 玩家名单
+            player_info (dict[str, PlayerInfo]): 玩家信息，缺失的玩家使用默认值
+        """
+        self._players = {player: player_info.get(player) or PlayerInfo() for player in players}
+        self._sorted = sorted((player.lower(), player) for player in self._players)
+
+    def serialize(self) -> dict[str, Any]:
+        return {
+            'players': list(self._players),
+            'player_info': {player: info.serialize() for player, info in self._players.items()},
+        }
+
+    def __contains__(self, player: str) -> bool:
+        return player in self._players
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._players)
+
+    def __len__(self) -> int:
+        return len(self._players)
+
+    def names(self) -> list[str]:
+        return list(self._players)
+
+    def get(self, player: str) -> PlayerInfo | None:
+        return self._players.get(player)
+
+    def add(self, player: str, info: PlayerInfo | None = None) -> PlayerInfo | None:
+        """注册玩家
+
+        Returns:
+            PlayerInfo | None: 新玩家的信息，玩家已经注册过则为 None
+        """
+        if player in self._players:
+            return None
+        info = self._players[player] = info or PlayerInfo()
+        bisect.insort(self._sorted, (player.lower(), player))
+        return info
+
+    def remove(self, player: str) -> bool:
+        if self._players.pop(player, None) is None:
+            return False
+        key = (player.lower(), player)
+        index = bisect.bisect_left(self._sorted, key)
+        if index < len(self._sorted) and self._sorted[index] == key:
+            del self._sorted[index]
+        return True
+
+    def complete(self, prefix: str, limit: int, preferred: Iterable[str] = ()) -> list[str]:
+        """补全玩家名
+
+        Args:
+            prefix (str): 已经输入的部分，不区分大小写
+            limit (int): 最多返回的玩家数
+            preferred (Iterable[str]): 优先返回的玩家，如在线玩家，未注册的会被忽略
+
+        Returns:
+            list[str]: 以 ``prefix`` 开头的已注册玩家，``preferred`` 中的排在前面，各自按名字排序
+        """
+        key = prefix.lower()
+        result = sorted(
+            player for player in preferred
+            if player in self._players and player.lower().startswith(key)
+        )[:limit]
+        seen = set(result)
+        index = bisect.bisect_left(self._sorted, (key,))
+        while len(result) < limit and index < len(self._sorted) and self._sorted[index][0].startswith(key):
+            player = self._sorted[index][1]
+            if player not in seen:
+                result.append(player)
+            index += 1
+        return result
+
+    def reset_inbox(self) -> None:
+        for info in self._players.values():
+            info.inbox = 0
+
+    def adjust_inbox(self, player: str, delta: int) -> None:
+        """修改玩家的待接收订单数，未注册的玩家会被忽略"""
+        info = self._players.get(player)
+        if info is not None:
+            info.inbox += delta
+
+
+__all__ = ['PlayerRegistry']
@@ -0,0 +1,26 @@
+"""订单数据的持久化"""
+from mcdreforged.api.types import PluginServerInterface
+
+from mcdrpost.config.configuration import Configuration
+from mcdrpost.storage.base import OrderStorage, Snapshot
+from mcdrpost.storage.journal import OrderJournal
+from mcdrpost.storage.json_storage import JsonOrderStorage
+from mcdrpost.storage.sharded_storage import ShardedOrderStorage
+from mcdrpost.storage.sqlite_storage import SqliteOrderStorage
+
+STORAGE_BACKENDS: dict[str, type[OrderStorage]] = {
+    'json': JsonOrderStorage,
+    'sqlite': SqliteOrderStorage,
+    'sharded': ShardedOrderStorage,
+}
+
+
+def create_storage(server: PluginServerInterface, config: Configuration, snapshot: Snapshot) -> OrderStorage:
+    """根据配置中的 ``storage`` 创建存储后端"""
+    return STORAGE_BACKENDS[config.storage](server, config, snapshot)
+
+
+__all__ = [
+    'OrderStorage', 'Snapshot', 'OrderJournal', 'JsonOrderStorage', 'SqliteOrderStorage', 'ShardedOrderStorage',
+    'STORAGE_BACKENDS', 'create_storage',
+]
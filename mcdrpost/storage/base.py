@@ -0,0 +1,116 @@
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Generic, TypeVar
+
+from mcdreforged.api.types import PluginServerInterface
+
+from mcdrpost.config.configuration import Configuration
+from mcdrpost.order_data import Order, OrderData, PlayerInfo
+
+Snapshot = Callable[[], dict[str, Any]]
+PendingOp = TypeVar('PendingOp')
+
+
+class OrderStorage(ABC, Generic[PendingOp]):
+    """订单存储后端
+
+    ``OrderManager`` 在内存中维护订单和索引，每次改动都会同步调用存储后端对应的方法，
+    存储后端只负责把这些改动持久化
+
+    改动会先放进待写入队列，调用 :meth:`flush` 时才按顺序一次性写入磁盘，何时写入由 ``SaveScheduler`` 决定
+
+    物品不会常驻内存：:meth:`load` 返回的订单中 ``item`` 都是空字符串，发送物品时再通过 :meth:`load_item` 读取
+
+    Args:
+        server (PluginServerInterface): MCDR插件接口
+        config (Configuration): 插件配置
+        snapshot (Snapshot): 获取当前完整订单数据（已序列化）的函数，需要写入完整数据时使用
+    """
+
+    def __init__(self, server: PluginServerInterface, config: Configuration, snapshot: Snapshot) -> None:
+        self._server: PluginServerInterface = server
+        self._logger = server.logger
+        self._config: Configuration = config
+        self._snapshot: Snapshot = snapshot
+        self._pending: list[PendingOp] = []
+        self._pending_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+    @property
+    def pending(self) -> int:
+        """还没有写入磁盘的改动数"""
+        return len(self._pending)
+
+    def _enqueue(self, op: PendingOp) -> None:
+        with self._pending_lock:
+            self._pending.append(op)
+
+    def flush(self) -> int:
+        """把待写入的改动按顺序写入磁盘
+
+        写入失败时改动会放回队列的最前面，等待下一次写入
+
+        Returns:
+            int: 写入的改动数
+        """
+        with self._flush_lock:
+            with self._pending_lock:
+                ops, self._pending = self._pending, []
+            if not ops:
+                return 0
+            try:
+                self._write(ops)
+            except Exception:
+                with self._pending_lock:
+                    self._pending[:0] = ops
+                raise
+            return len(ops)
+
+    @abstractmethod
+    def _write(self, ops: list[PendingOp]) -> None:
+        """把一批改动写入磁盘"""
+
+    @abstractmethod
+    def load(self) -> OrderData:
+        """读取全部订单数据，订单的 ``item`` 为空字符串"""
+
+    @abstractmethod
+    def load_item(self, order_id: int) -> str:
+        """读取订单的物品
+
+        Args:
+            order_id (int): 订单 ID
+
+        Raises:
+            KeyError: 订单不存在
+        """
+
+    @abstractmethod
+    def add_order(self, order: Order) -> None:
+        """持久化一个新订单"""
+
+    @abstractmethod
+    def remove_order(self, order_id: int) -> None:
+        """持久化订单的删除"""
+
+    @abstractmethod
+    def add_player(self, player: str, info: PlayerInfo) -> None:
+        """持久化玩家的注册"""
+
+    @abstractmethod
+    def update_player(self, player: str, info: PlayerInfo) -> None:
+        """持久化玩家信息的改动"""
+
+    @abstractmethod
+    def remove_player(self, player: str) -> None:
+        """持久化玩家的删除"""
+
+    @abstractmethod
+    def save(self) -> None:
+        """把当前的完整数据写入磁盘，调用前应该先 :meth:`flush`"""
+
+    def close(self) -> None:
+        """释放文件句柄、数据库连接等资源，在插件卸载时调用"""
+
+
+__all__ = ['OrderStorage', 'Snapshot', 'PendingOp']
@@ -0,0 +1,117 @@
+"""物品数据文件"""
+import mmap
+import os
+import threading
+from array import array
+
+# 没有物品的订单 ID 在偏移表中的值
+_MISSING = -1
+
+
+class ItemBlobStore:
+    """只追加的物品数据文件
+
+    物品的 SNBT 往往是订单中最大的部分，但只有在发送物品时才会用到，
+    这里把它们写进一个单独的文件，内存中只保留一张以订单 ID 为下标的偏移表，
+    每项是 (偏移, 长度) 打包成的 64 位整数，读取时通过 mmap 直接取出
+
+    订单 ID 总是从最小的空闲 ID 开始分配，偏移表基本是连续的，每个订单只占 8 字节
+
+    连续写入相同的物品（比如群发）时只会写入一次。文件只是物品数据的缓存，每次加载订单时都会重新生成
+
+    Args:
+        path (str): 文件路径
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path: str = path
+        self._lock = threading.Lock()
+        self._file = None
+        self._mmap: mmap.mmap | None = None
+        self._size: int = 0
+        self._offsets: array = array('q')
+        # 上一次写入的物品和它的偏移
+        self._last: tuple[str, int] | None = None
+
+    def __contains__(self, order_id: int) -> bool:
+        return 0 <= order_id < len(self._offsets) and self._offsets[order_id] != _MISSING
+
+    def _open(self):
+        if self._file is None:
+            self._file = open(self.path, 'w+b')
+            self._size = 0
+        return self._file
+
+    def _unmap(self) -> None:
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+    def reset(self) -> None:
+        """清空文件和偏移表"""
+        with self._lock:
+            self._unmap()
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            self._offsets = array('q')
+            self._last = None
+            self._open()
+
+    def put(self, order_id: int, item: str) -> None:
+        """写入订单的物品"""
+        with self._lock:
+            if self._last is not None and self._last[0] == item:
+                ref = self._last[1]
+            else:
+                data = item.encode('utf8')
+                file = self._open()
+                file.seek(self._size)
+                file.write(data)
+                file.flush()
+                ref = self._size << 32 | len(data)
+                self._size += len(data)
+                self._last = (item, ref)
+            if order_id >= len(self._offsets):
+                self._offsets.extend([_MISSING] * (order_id + 1 - len(self._offsets)))
+            self._offsets[order_id] = ref
+
+    def get(self, order_id: int) -> str:
+        """读取订单的物品
+
+        Raises:
+            KeyError: 没有这个订单的物品
+        """
+        with self._lock:
+            if order_id not in self:
+                raise KeyError(order_id)
+            ref = self._offsets[order_id]
+            offset, length = ref >> 32, ref & 0xFFFFFFFF
+            if length == 0:
+                return ''
+            if self._mmap is None or offset + length > len(self._mmap):
+                # 文件变大了，重新映射
+                self._unmap()
+                self._mmap = mmap.mmap(self._open().fileno(), 0, access=mmap.ACCESS_READ)
+            return self._mmap[offset:offset + length].decode('utf8')
+
+    def discard(self, order_id: int) -> None:
+        """删除订单的物品，文件中的数据要等下次重新生成时才会清除"""
+        with self._lock:
+            if order_id in self:
+                self._offsets[order_id] = _MISSING
+
+    def close(self) -> None:
+        """关闭并删除文件"""
+        with self._lock:
+            self._unmap()
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            self._offsets = array('q')
+            self._last = None
+            if os.path.isfile(self.path):
+                os.remove(self.path)
+
+
+__all__ = ['ItemBlobStore']
@@ -0,0 +1,133 @@
+"""订单日志
+
+以追加写入的方式记录订单数据的每一次改动，避免每次收寄都重写整个 ``orders.json``
+
+每条记录占一行，是一个 JSON 对象，``op`` 字段表示操作类型:
+
+- ``add``: 添加订单，``order`` 为订单数据
+- ``remove``: 删除订单，``id`` 为订单 ID
+- ``register``: 注册玩家，``player`` 为玩家名，``info`` 为玩家信息
+- ``update``: 更新玩家信息，``player`` 为玩家名，``info`` 为玩家信息
+- ``unregister``: 删除玩家，``player`` 为玩家名
+
+重放时同一个键以最后一次写入为准，因此把日志重放到已经包含这些改动的快照上也不会出错
+"""
+import json
+import os
+import threading
+from typing import Any, Iterator, Literal, TextIO
+
+JournalOperation = Literal["add", "remove", "register", "update", "unregister"]
+
+
+class OrderJournal:
+    """追加写入的订单日志
+
+    Attributes:
+        path (str): 日志文件路径
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path: str = path
+        self._rotated_path: str = path + '.old'
+        self._lock = threading.Lock()
+        self._file: TextIO | None = None
+        self._size: int = 0
+
+    @property
+    def size(self) -> int:
+        """当前日志中的记录数"""
+        return self._size
+
+    def _open(self) -> TextIO:
+        if self._file is None:
+            self._file = open(self.path, 'a', encoding='utf8')
+        return self._file
+
+    def append(self, op: JournalOperation, **payload: Any) -> None:
+        """追加一条记录
+
+        Args:
+            op (JournalOperation): 操作类型
+            **payload: 记录内容
+        """
+        self.extend([{'op': op, **payload}])
+
+    def extend(self, records: list[dict[str, Any]]) -> None:
+        """一次性追加多条记录
+
+        Args:
+            records (list[dict]): 记录，每条都需要有 ``op`` 字段
+        """
+        data = ''.join(json.dumps(record, ensure_ascii=False) + '\n' for record in records)
+        with self._lock:
+            file = self._open()
+            file.write(data)
+            file.flush()
+            self._size += len(records)
+
+    def replay(self) -> Iterator[dict[str, Any] | None]:
+        """按写入顺序读出所有记录
+
+        先读取压缩时被轮转出去的旧日志（如果上次压缩中途中断），再读取当前日志
+
+        Yields:
+            dict | None: 记录，无法解析的记录（比如写入一半时崩溃）为 None
+        """
+        count = 0
+        for path in (self._rotated_path, self.path):
+            if not os.path.isfile(path):
+                continue
+            with open(path, 'r', encoding='utf8') as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        yield None
+                        continue
+                    count += 1
+                    yield record
+        self._size = count
+
+    def rotate(self) -> None:
+        """轮转日志，之后的记录会写入新的日志文件
+
+        在把内存中的数据写成快照之前调用，快照写入完成后再调用 :meth:`discard_rotated`
+        """
+        with self._lock:
+            self.close()
+            if not os.path.isfile(self.path):
+                return
+            if os.path.isfile(self._rotated_path):
+                # 上次压缩没有完成，把当前日志接在旧日志后面
+                with open(self._rotated_path, 'a', encoding='utf8') as dst, \
+                        open(self.path, 'r', encoding='utf8') as src:
+                    dst.write(src.read())
+                os.remove(self.path)
+            else:
+                os.replace(self.path, self._rotated_path)
+            self._size = 0
+
+    def discard_rotated(self) -> None:
+        """删除已经写入快照的旧日志"""
+        if os.path.isfile(self._rotated_path):
+            os.remove(self._rotated_path)
+
+    def delete(self) -> None:
+        """删除日志和没有写入快照的旧日志，数据迁移到其他后端之后调用"""
+        with self._lock:
+            self.close()
+            for path in (self.path, self._rotated_path):
+                if os.path.isfile(path):
+                    os.remove(path)
+            self._size = 0
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+__all__ = ['OrderJournal', 'JournalOperation']
@@ -0,0 +1,192 @@
+import os
+import shutil
+import threading
+from typing import Any
+
+from mcdreforged.api.decorator import new_thread
+
+from mcdrpost import constants
+from mcdrpost.order_data import Order, OrderData, PlayerInfo
+from mcdrpost.storage.base import OrderStorage
+from mcdrpost.storage.item_store import ItemBlobStore
+from mcdrpost.storage.journal import OrderJournal
+from mcdrpost.utils import tr
+from mcdrpost.utils.translation_tags import Tags
+
+
+class JsonOrderStorage(OrderStorage[dict[str, Any]]):
+    """``orders.json`` 存储后端
+
+    订单数据由 ``orders.json`` 快照和 ``orders.journal`` 追加日志两部分组成，
+    每次改动只会向日志追加一条记录，日志超过 ``journal_compact_threshold`` 条后会在后台压缩成新的快照
+
+    加载之后物品会被转存到 ``orders.items`` 中，内存里只保留每个订单在文件中的偏移，写快照时再读回来
+
+    如果 ``orders.json`` 不存在而 ``orders/`` 中有分片后端的数据（从 ``sharded`` 改回 ``json``），
+    会先把分片合并回 ``orders.json``，分片文件夹重命名为 ``orders.migrated``
+    """
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        # _save_lock 让保存（包括后台压缩）依次进行，获取快照时会持有它再去拿 OrderManager 的锁；
+        # _file_lock 只保护快照文件、日志和物品文件的读写，持有它时不会再拿 OrderManager 的锁，
+        # 加载在 OrderManager 的锁内进行，只拿 _file_lock，两个方向不会互相等待
+        self._save_lock = threading.Lock()
+        self._file_lock = threading.Lock()
+        self._compacting: bool = False
+        self._journal: OrderJournal = OrderJournal(
+            os.path.join(self._server.get_data_folder(), constants.ORDERS_JOURNAL_FILE_NAME)
+        )
+        self._items: ItemBlobStore = ItemBlobStore(
+            os.path.join(self._server.get_data_folder(), constants.ORDERS_ITEMS_FILE_NAME)
+        )
+
+    def _replay_journal(self, order_data: OrderData) -> None:
+        """把日志中的改动重放到刚加载的快照上"""
+        players = dict.fromkeys(order_data.players)
+        for record in self._journal.replay():
+            if record is None:
+                self._logger.warning(tr(Tags.journal.broken_record, self._journal.path))
+                continue
+            match record.get('op'):
+                case 'add':
+                    order = Order.deserialize(record['order'])
+                    order_data.orders[str(order.id)] = order
+                case 'remove':
+                    order_data.orders.pop(str(record['id']), None)
+                case 'register' | 'update':
+                    players.setdefault(record['player'])
+                    if 'info' in record:
+                        order_data.player_info[record['player']] = PlayerInfo.deserialize(record['info'])
+                case 'unregister':
+                    players.pop(record['player'], None)
+                    order_data.player_info.pop(record['player'], None)
+                case op:
+                    self._logger.warning(tr(Tags.journal.unknown_operation, op))
+        order_data.players = list(players)
+
+    def _restore_from_shards(self) -> None:
+        """把分片后端的数据合并回 ``orders.json``"""
+        data_folder = self._server.get_data_folder()
+        json_path = os.path.join(data_folder, constants.ORDERS_DATA_FILE_NAME)
+        shards_folder = os.path.join(data_folder, constants.ORDERS_SHARDS_FOLDER)
+        manifest_path = os.path.join(shards_folder, constants.SHARD_MANIFEST_FILE_NAME)
+        if os.path.isfile(json_path) or not os.path.isfile(manifest_path):
+            return
+
+        from mcdrpost.storage.sharded_storage import ShardedOrderStorage
+        sharded_storage = ShardedOrderStorage(self._server, self._config, self._snapshot)
+        order_data = sharded_storage.load()
+        for order in order_data.orders.values():
+            order.item = sharded_storage.load_item(order.id)
+        sharded_storage.close()
+
+        self._server.save_config_simple(
+            order_data,
+            constants.ORDERS_DATA_FILE_NAME,
+            file_format=constants.ORDERS_DATA_FILE_TYPE,
+        )
+        migrated_folder = shards_folder + '.migrated'
+        if os.path.isdir(migrated_folder):
+            shutil.rmtree(migrated_folder)
+        os.replace(shards_folder, migrated_folder)
+        self._logger.info(tr(Tags.storage.restored, len(order_data.orders), constants.ORDERS_SHARDS_FOLDER))
+
+    def load(self) -> OrderData:
+        with self._file_lock:
+            self._journal.close()
+            self._restore_from_shards()
+            order_data = self._server.load_config_simple(
+                constants.ORDERS_DATA_FILE_NAME,
+                target_class=OrderData,
+                file_format=constants.ORDERS_DATA_FILE_TYPE
+            )
+            self._replay_journal(order_data)
+            self._spill_items(order_data)
+        return order_data
+
+    def _spill_items(self, order_data: OrderData) -> None:
+        """把物品转存到物品文件中，订单中只留下空字符串"""
+        self._items.reset()
+        for order_id, order in order_data.orders.items():
+            # 以索引为准，与 OrderManager._check_orders 修复后的 ID 一致
+            self._items.put(int(order_id), order.item)
+            order.item = ''
+
+    def load_item(self, order_id: int) -> str:
+        return self._items.get(order_id)
+
+    def save(self) -> None:
+        """把订单数据写成快照并清空日志
+
+        先轮转日志再获取快照，轮转之后的改动即使也进了快照，重放时也只是再写一次相同的值。
+        快照中没有物品，写入前从物品文件中补上
+
+        获取快照时不持有 ``_file_lock``，这时重新加载也只会读到旧快照加上轮转出去的日志，和内存中的数据一致
+        """
+        with self._save_lock:
+            with self._file_lock:
+                self._journal.rotate()
+            snapshot = self._snapshot()
+            with self._file_lock:
+                orders = snapshot['orders']
+                for order_id in list(orders):
+                    try:
+                        orders[order_id]['item'] = self._items.get(int(order_id))
+                    except KeyError:
+                        # 获取快照之后订单被取走了，删除记录在新的日志中，重放时也会删掉它
+                        del orders[order_id]
+                self._server.save_config_simple(
+                    snapshot,
+                    constants.ORDERS_DATA_FILE_NAME,
+                    file_format=constants.ORDERS_DATA_FILE_TYPE,
+                )
+                self._journal.discard_rotated()
+
+    def close(self) -> None:
+        self._journal.close()
+        self._items.close()
+
+    def retire(self) -> None:
+        """数据已经迁移到其他后端：``orders.json`` 重命名为 ``orders.json.migrated``，删除日志
+
+        由其他后端在迁移完成后调用，之后不能再使用这个存储后端
+        """
+        self.close()
+        json_path = os.path.join(self._server.get_data_folder(), constants.ORDERS_DATA_FILE_NAME)
+        os.replace(json_path, json_path + '.migrated')
+        self._journal.delete()
+
+    @new_thread('MCDRpost-compact orders')
+    def _compact(self) -> None:
+        try:
+            self.save()
+        finally:
+            self._compacting = False
+
+    def _write(self, ops: list[dict[str, Any]]) -> None:
+        """追加到日志，日志过长时在后台压缩"""
+        self._journal.extend(ops)
+        if self._journal.size >= self._config.journal_compact_threshold and not self._compacting:
+            self._compacting = True
+            self._compact()
+
+    def add_order(self, order: Order) -> None:
+        self._items.put(order.id, order.item)
+        self._enqueue({'op': 'add', 'order': order.serialize()})
+
+    def remove_order(self, order_id: int) -> None:
+        self._items.discard(order_id)
+        self._enqueue({'op': 'remove', 'id': order_id})
+
+    def add_player(self, player: str, info: PlayerInfo) -> None:
+        self._enqueue({'op': 'register', 'player': player, 'info': info.serialize()})
+
+    def update_player(self, player: str, info: PlayerInfo) -> None:
+        self._enqueue({'op': 'update', 'player': player, 'info': info.serialize()})
+
+    def remove_player(self, player: str) -> None:
+        self._enqueue({'op': 'unregister', 'player': player})
+
+
+__all__ = ['JsonOrderStorage']
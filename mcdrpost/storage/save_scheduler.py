@@ -0,0 +1,93 @@
+import threading
+import time
+from typing import Callable
+
+from mcdrpost.utils import tr
+from mcdrpost.utils.translation_tags import Tags
+
+
+class SaveScheduler:
+    """合并写入的保存调度器
+
+    每次改动只会标记一下，由一个后台线程在第一次改动的 ``max_delay`` 秒后统一写入，
+    待写入的改动达到 ``max_pending`` 个时会立即写入
+
+    ``max_delay`` 不大于 0 时不做合并，每次改动都会同步写入
+
+    Args:
+        flush (Callable[[], int]): 写入函数，返回写入的改动数
+        logger: 日志
+        max_delay (float): 最长的写入延迟，单位为秒
+        max_pending (int): 最多积攒的改动数
+    """
+
+    def __init__(self, flush: Callable[[], int], logger, max_delay: float, max_pending: int) -> None:
+        self._flush: Callable[[], int] = flush
+        self._logger = logger
+        self._max_delay: float = max_delay
+        self._max_pending: int = max_pending
+        self._cond = threading.Condition()
+        self._pending: int = 0
+        self._deadline: float | None = None
+        self._thread: threading.Thread | None = None
+        self._stopped: bool = False
+
+    def mark_dirty(self) -> None:
+        """记录一次改动"""
+        if self._max_delay <= 0:
+            self.flush()
+            return
+        with self._cond:
+            self._pending += 1
+            now = time.monotonic()
+            if self._deadline is None:
+                self._deadline = now + self._max_delay
+            if self._pending >= self._max_pending:
+                self._deadline = now
+            if self._thread is None:
+                self._stopped = False
+                self._thread = threading.Thread(target=self._run, name='MCDRpost-save', daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._stopped and (self._deadline is None or time.monotonic() < self._deadline):
+                    self._cond.wait(None if self._deadline is None else self._deadline - time.monotonic())
+                if self._stopped:
+                    return
+                self._pending = 0
+                self._deadline = None
+            try:
+                self._flush()
+            except Exception:
+                self._logger.exception(tr(Tags.storage.flush_failed))
+
+    def flush(self) -> int:
+        """立即在当前线程写入所有改动
+
+        Returns:
+            int: 写入的改动数
+        """
+        with self._cond:
+            self._pending = 0
+            self._deadline = None
+        return self._flush()
+
+    def shutdown(self) -> int:
+        """写入所有改动并停止后台线程，在插件卸载时调用
+
+        Returns:
+            int: 写入的改动数
+        """
+        with self._cond:
+            self._stopped = True
+            thread, self._thread = self._thread, None
+            self._cond.notify()
+        if thread is not None:
+            thread.join()
+        return self.flush()
+
+
+__all__ = ['SaveScheduler']
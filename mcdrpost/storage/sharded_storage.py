@@ -0,0 +1,239 @@
+import json
+import os
+import shutil
+import threading
+import zlib
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+from mcdrpost import constants
+from mcdrpost.order_data import Order, OrderData, PlayerInfo
+from mcdrpost.storage.base import OrderStorage
+from mcdrpost.storage.item_store import ItemBlobStore
+from mcdrpost.utils import tr
+from mcdrpost.utils.translation_tags import Tags
+
+MANIFEST_VERSION = 1
+
+
+def get_shard(receiver: str, shards: int) -> int:
+    """收件人所在的分片，不能用 ``hash``，它每次启动都不一样"""
+    return zlib.crc32(receiver.encode('utf8')) % shards
+
+
+def _write_json(path: str, data: Any) -> None:
+    """先写临时文件再替换，写入中途崩溃也不会留下半个文件"""
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w', encoding='utf8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(temp_path, path)
+
+
+def _read_json(path: str) -> Any:
+    with open(path, 'r', encoding='utf8') as f:
+        return json.load(f)
+
+
+class ShardedOrderStorage(OrderStorage[tuple]):
+    """分片存储后端
+
+    订单按收件人的哈希分到 ``orders/`` 下的 ``shard_count`` 个分片文件中，玩家名单和分片数记录在 ``manifest.json`` 里。
+    每次写入只会重写这一批改动涉及的分片，寄出或取出一个订单只会改动收件人所在的分片，
+    加载时用线程池并行读取所有分片
+
+    分片数只在创建分片时使用，之后以清单中的为准
+
+    第一次使用时如果没有清单而 ``orders.json`` 存在，会把其中的数据迁移过来，
+    迁移完成后 ``orders.json`` 会被重命名为 ``orders.json.migrated``。
+    改回 ``json`` 后端时会自动把分片合并回 ``orders.json``
+    """
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._lock = threading.Lock()
+        self._folder: str = os.path.join(self._server.get_data_folder(), constants.ORDERS_SHARDS_FOLDER)
+        self._shards: int = max(1, self._config.shard_count)
+        self._players: dict[str, dict[str, Any]] = {}
+        self._players_lock = threading.Lock()
+        # 以订单 ID 为下标的分片号，-1 表示没有这个订单，删除订单时用来找到分片
+        self._order_shards: array = array('h')
+        self._items: ItemBlobStore = ItemBlobStore(
+            os.path.join(self._server.get_data_folder(), constants.ORDERS_ITEMS_FILE_NAME)
+        )
+
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self._folder, constants.SHARD_MANIFEST_FILE_NAME)
+
+    def _shard_path(self, shard: int) -> str:
+        return os.path.join(self._folder, f'shard-{shard:03d}.json')
+
+    def _read_shard(self, shard: int) -> dict[str, dict[str, Any]]:
+        path = self._shard_path(shard)
+        if not os.path.isfile(path):
+            return {}
+        return _read_json(path)['orders']
+
+    def _write_shard(self, shard: int, orders: dict[str, dict[str, Any]]) -> None:
+        path = self._shard_path(shard)
+        if orders:
+            _write_json(path, {'orders': orders})
+        elif os.path.isfile(path):
+            os.remove(path)
+
+    def _write_manifest(self) -> None:
+        with self._players_lock:
+            players = dict(self._players)
+        _write_json(self.manifest_path, {
+            'version': MANIFEST_VERSION,
+            'shards': self._shards,
+            'players': list(players),
+            'player_info': players,
+        })
+
+    def _migrate_from_json(self) -> None:
+        """把 ``orders.json`` 中的数据拆分成分片"""
+        json_path = os.path.join(self._server.get_data_folder(), constants.ORDERS_DATA_FILE_NAME)
+        if not os.path.isfile(json_path) or os.path.isfile(self.manifest_path):
+            return
+
+        # 通过 json 后端读取，这样没有压缩的订单日志也会被导入
+        from mcdrpost.storage.json_storage import JsonOrderStorage
+        json_storage = JsonOrderStorage(self._server, self._config, self._snapshot)
+        order_data = json_storage.load()
+
+        shards: list[dict[str, dict[str, Any]]] = [{} for _ in range(self._shards)]
+        for order_id, order in order_data.orders.items():
+            order.id = int(order_id)
+            order.item = json_storage.load_item(order.id)
+            shards[get_shard(order.receiver, self._shards)][order_id] = order.serialize()
+
+        # 上次迁移中途中断时可能留下了分片，清单是最后写的，没有清单的分片都不算数
+        if os.path.isdir(self._folder):
+            shutil.rmtree(self._folder)
+        os.makedirs(self._folder)
+        for shard, orders in enumerate(shards):
+            self._write_shard(shard, orders)
+        self._players = {
+            player: (order_data.player_info.get(player) or PlayerInfo()).serialize()
+            for player in order_data.players
+        }
+        self._write_manifest()
+
+        json_storage.retire()
+        self._logger.info(tr(Tags.storage.migrated, len(order_data.orders), constants.ORDERS_SHARDS_FOLDER))
+
+    def load(self) -> OrderData:
+        with self._lock:
+            self._migrate_from_json()
+            order_data = OrderData.get_default()
+            if os.path.isfile(self.manifest_path):
+                manifest = _read_json(self.manifest_path)
+                self._shards = manifest['shards']
+                with self._players_lock:
+                    self._players = {
+                        player: manifest['player_info'].get(player) or PlayerInfo().serialize()
+                        for player in manifest['players']
+                    }
+            else:
+                os.makedirs(self._folder, exist_ok=True)
+                self._players = {}
+                self._write_manifest()
+
+            with ThreadPoolExecutor(
+                    max_workers=min(self._shards, constants.SHARD_LOAD_WORKERS),
+                    thread_name_prefix='MCDRpost-shard',
+            ) as pool:
+                shards = list(pool.map(self._read_shard, range(self._shards)))
+
+            self._items.reset()
+            self._order_shards = array('h')
+            orders: list[Order] = []
+            for shard, raw_orders in enumerate(shards):
+                for order_id, raw in raw_orders.items():
+                    self._items.put(int(order_id), raw['item'])
+                    raw['item'] = ''
+                    orders.append(Order(**raw))
+                    self._set_shard(int(order_id), shard)
+            # 与 sqlite 后端一样按订单 ID 排列
+            orders.sort(key=lambda o: o.id)
+            order_data.orders = {str(order.id): order for order in orders}
+
+            for player, info in self._players.items():
+                order_data.players.append(player)
+                order_data.player_info[player] = PlayerInfo.deserialize(info)
+        return order_data
+
+    def _set_shard(self, order_id: int, shard: int) -> None:
+        if order_id >= len(self._order_shards):
+            self._order_shards.extend([-1] * (order_id + 1 - len(self._order_shards)))
+        self._order_shards[order_id] = shard
+
+    def load_item(self, order_id: int) -> str:
+        return self._items.get(order_id)
+
+    def _write(self, ops: list[tuple]) -> None:
+        """按分片分组，每个涉及的分片读出来、按顺序应用改动、再整个写回去"""
+        shard_ops: dict[int, list[tuple]] = {}
+        players_changed = False
+        for op in ops:
+            if op[0] == 'players':
+                players_changed = True
+            else:
+                shard_ops.setdefault(op[1], []).append(op)
+        with self._lock:
+            for shard, changes in shard_ops.items():
+                orders = self._read_shard(shard)
+                for kind, _, payload in changes:
+                    if kind == 'add':
+                        orders[str(payload['id'])] = payload
+                    else:
+                        orders.pop(str(payload), None)
+                self._write_shard(shard, orders)
+            if players_changed:
+                self._write_manifest()
+
+    def add_order(self, order: Order) -> None:
+        shard = get_shard(order.receiver, self._shards)
+        self._set_shard(order.id, shard)
+        self._items.put(order.id, order.item)
+        self._enqueue(('add', shard, order.serialize()))
+
+    def remove_order(self, order_id: int) -> None:
+        if order_id >= len(self._order_shards) or self._order_shards[order_id] == -1:
+            return
+        shard, self._order_shards[order_id] = self._order_shards[order_id], -1
+        self._items.discard(order_id)
+        self._enqueue(('remove', shard, order_id))
+
+    def _update_players(self, player: str, info: PlayerInfo | None) -> None:
+        with self._players_lock:
+            if info is None:
+                self._players.pop(player, None)
+            else:
+                self._players[player] = info.serialize()
+        self._enqueue(('players',))
+
+    def add_player(self, player: str, info: PlayerInfo) -> None:
+        with self._players_lock:
+            if player in self._players:
+                return
+        self._update_players(player, info)
+
+    def update_player(self, player: str, info: PlayerInfo) -> None:
+        self._update_players(player, info)
+
+    def remove_player(self, player: str) -> None:
+        self._update_players(player, None)
+
+    def save(self) -> None:
+        """改动在 :meth:`flush` 时就已经写入分片，这里只重写清单"""
+        with self._lock:
+            self._write_manifest()
+
+    def close(self) -> None:
+        self._items.close()
+
+
+__all__ = ['ShardedOrderStorage', 'get_shard']
@@ -0,0 +1,216 @@
+import os
+import sqlite3
+import threading
+from typing import Any
+
+from mcdrpost import constants
+from mcdrpost.order_data import Order, OrderData, PlayerInfo
+from mcdrpost.storage.base import OrderStorage
+from mcdrpost.utils import tr
+from mcdrpost.utils.translation_tags import Tags
+
+# 寄件人、收件人、时间和物品 id 都建立索引，直接查询数据库（比如用 sqlite3 命令行统计某个玩家的订单）时不用扫描全表
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS orders (
+    id INTEGER PRIMARY KEY,
+    time REAL NOT NULL,
+    sender TEXT NOT NULL,
+    receiver TEXT NOT NULL,
+    item TEXT NOT NULL,
+    item_id TEXT NOT NULL,
+    comment TEXT NOT NULL,
+    returned INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_orders_sender ON orders (sender);
+CREATE INDEX IF NOT EXISTS idx_orders_receiver ON orders (receiver);
+CREATE INDEX IF NOT EXISTS idx_orders_time ON orders (time);
+CREATE INDEX IF NOT EXISTS idx_orders_item_id ON orders (item_id);
+CREATE TABLE IF NOT EXISTS players (
+    name TEXT NOT NULL UNIQUE,
+    last_seen REAL NOT NULL DEFAULT 0
+);
+'''
+
+# 加载时不读取 item 列，物品在发送时才通过 load_item 读取
+_ORDER_COLUMNS = ('id', 'time', 'sender', 'receiver', 'comment', 'returned')
+_INSERT_ORDER = (
+    'INSERT OR REPLACE INTO orders (id, time, sender, receiver, item, item_id, comment, returned) '
+    'VALUES (?, ?, ?, ?, ?, ?, ?, ?)'
+)
+
+
+def _order_row(order: Order) -> tuple[Any, ...]:
+    return (
+        order.id, order.time, order.sender, order.receiver, order.item, get_item_id(order.item), order.comment,
+        int(order.returned),
+    )
+
+
+def _order_from_row(row: tuple[Any, ...]) -> Order:
+    data = dict(zip(_ORDER_COLUMNS, row))
+    data['returned'] = bool(data['returned'])
+    # 旧的数据库中 time 列是 TEXT，时间戳读出来是字符串
+    if isinstance(data['time'], str):
+        try:
+            data['time'] = float(data['time'])
+        except ValueError:
+            pass
+    return Order(item='', **data)
+
+
+def get_item_id(item: str) -> str:
+    """从格式化的物品字符串中取出物品 id，如 ``minecraft:stone{...} 64`` -> ``minecraft:stone``"""
+    end = len(item)
+    for sep in ('{', '[', ' '):
+        index = item.find(sep)
+        if index != -1:
+            end = min(end, index)
+    return item[:end]
+
+
+class SqliteOrderStorage(OrderStorage[tuple[str, tuple[Any, ...]]]):
+    """SQLite 存储后端
+
+    订单保存在 ``orders.db`` 中，寄件人、收件人、时间和物品 id 都建立了索引，每一批改动在同一个事务中写入
+
+    和其他后端一样，加载时仍然把所有订单（不含物品）读进 ``OrderManager``：
+    检查订单归属、统计寄件数、分配订单 ID、订单到期、补全和翻页都依赖内存中的索引，
+    改成逐条查询数据库会让每次收寄都在命令线程里等待数据库的锁。
+    物品留在数据库中，订单本身以 ``OrderRecord`` 保存，每个订单只占一两百字节内存（见 ``benchmark.bench_order_memory``）
+
+    第一次使用时如果数据库为空而 ``orders.json`` 存在，会把其中的数据一次性迁移过来，
+    迁移完成后 ``orders.json`` 会被重命名为 ``orders.json.migrated``
+
+    加载时不读取物品，还没有写入数据库的新订单的物品暂存在内存中，写入后丢弃
+    """
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._lock = threading.Lock()
+        self._db_path: str = os.path.join(self._server.get_data_folder(), constants.ORDERS_DATABASE_FILE_NAME)
+        self._conn: sqlite3.Connection | None = None
+        # 还没有写入数据库的订单 ID -> 物品
+        self._unflushed_items: dict[int, str] = {}
+        self._items_lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self._db_path, check_same_thread=False, isolation_level=None)
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.executescript(_SCHEMA)
+            columns = {row[1] for row in self._conn.execute('PRAGMA table_info(players)')}
+            if 'last_seen' not in columns:
+                self._conn.execute('ALTER TABLE players ADD COLUMN last_seen REAL NOT NULL DEFAULT 0')
+            columns = {row[1] for row in self._conn.execute('PRAGMA table_info(orders)')}
+            if 'returned' not in columns:
+                self._conn.execute('ALTER TABLE orders ADD COLUMN returned INTEGER NOT NULL DEFAULT 0')
+        return self._conn
+
+    def _is_empty(self) -> bool:
+        conn = self._connect()
+        return (
+            conn.execute('SELECT 1 FROM orders LIMIT 1').fetchone() is None
+            and conn.execute('SELECT 1 FROM players LIMIT 1').fetchone() is None
+        )
+
+    def _migrate_from_json(self) -> None:
+        """把 ``orders.json`` 中的数据导入数据库"""
+        json_path = os.path.join(self._server.get_data_folder(), constants.ORDERS_DATA_FILE_NAME)
+        manifest_path = os.path.join(
+            self._server.get_data_folder(), constants.ORDERS_SHARDS_FOLDER, constants.SHARD_MANIFEST_FILE_NAME
+        )
+        if not (os.path.isfile(json_path) or os.path.isfile(manifest_path)) or not self._is_empty():
+            return
+
+        # 通过 json 后端读取，这样没有压缩的订单日志和分片后端的数据也会被导入
+        from mcdrpost.storage.json_storage import JsonOrderStorage
+        json_storage = JsonOrderStorage(self._server, self._config, self._snapshot)
+        order_data = json_storage.load()
+        for order_id, order in order_data.orders.items():
+            order.id = int(order_id)
+            order.item = json_storage.load_item(order.id)
+
+        conn = self._connect()
+        with conn:
+            conn.execute('BEGIN')
+            conn.executemany(_INSERT_ORDER, (_order_row(o) for o in order_data.orders.values()))
+            conn.executemany(
+                'INSERT OR IGNORE INTO players (name, last_seen) VALUES (?, ?)',
+                ((p, (order_data.player_info.get(p) or PlayerInfo()).last_seen) for p in order_data.players)
+            )
+        json_storage.retire()
+        self._logger.info(tr(Tags.storage.migrated, len(order_data.orders), constants.ORDERS_DATABASE_FILE_NAME))
+
+    def load(self) -> OrderData:
+        with self._lock:
+            self._migrate_from_json()
+            conn = self._connect()
+            order_data = OrderData.get_default()
+            for row in conn.execute(f'SELECT {", ".join(_ORDER_COLUMNS)} FROM orders ORDER BY id'):
+                order = _order_from_row(row)
+                order_data.orders[str(order.id)] = order
+            for name, last_seen in conn.execute('SELECT name, last_seen FROM players ORDER BY rowid'):
+                order_data.players.append(name)
+                order_data.player_info[name] = PlayerInfo(last_seen=last_seen)
+        return order_data
+
+    def load_item(self, order_id: int) -> str:
+        with self._items_lock:
+            item = self._unflushed_items.get(order_id)
+        if item is not None:
+            return item
+        with self._lock:
+            row = self._connect().execute('SELECT item FROM orders WHERE id = ?', (order_id,)).fetchone()
+        if row is None:
+            raise KeyError(order_id)
+        return row[0]
+
+    def _write(self, ops: list[tuple[str, tuple[Any, ...]]]) -> None:
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute('BEGIN')
+                for sql, params in ops:
+                    conn.execute(sql, params)
+        with self._items_lock:
+            for sql, params in ops:
+                # 写入之后同一个 ID 可能又被新的订单使用了，只丢弃写入的这一个
+                if sql is _INSERT_ORDER and self._unflushed_items.get(params[0]) is params[4]:
+                    del self._unflushed_items[params[0]]
+
+    def _enqueue_sql(self, sql: str, *params) -> None:
+        self._enqueue((sql, params))
+
+    def add_order(self, order: Order) -> None:
+        with self._items_lock:
+            self._unflushed_items[order.id] = order.item
+        self._enqueue_sql(_INSERT_ORDER, *_order_row(order))
+
+    def remove_order(self, order_id: int) -> None:
+        with self._items_lock:
+            self._unflushed_items.pop(order_id, None)
+        self._enqueue_sql('DELETE FROM orders WHERE id = ?', order_id)
+
+    def add_player(self, player: str, info: PlayerInfo) -> None:
+        self._enqueue_sql('INSERT OR IGNORE INTO players (name, last_seen) VALUES (?, ?)', player, info.last_seen)
+
+    def update_player(self, player: str, info: PlayerInfo) -> None:
+        self._enqueue_sql('UPDATE players SET last_seen = ? WHERE name = ?', info.last_seen, player)
+
+    def remove_player(self, player: str) -> None:
+        self._enqueue_sql('DELETE FROM players WHERE name = ?', player)
+
+    def save(self) -> None:
+        """改动在 :meth:`flush` 时就已经提交，这里只把 WAL 合并回数据库文件"""
+        with self._lock:
+            self._connect().execute('PRAGMA wal_checkpoint(PASSIVE)')
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+__all__ = ['SqliteOrderStorage']
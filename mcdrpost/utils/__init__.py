@@ -1,55 +1,39 @@
-import json
 import time
 
 from mcdreforged.api.types import PluginServerInterface
 
 from mcdrpost import constants
-from mcdrpost.utils.translation_tags import Tags
+from mcdrpost.utils.snbt import ItemFormatter
+from mcdrpost.utils.translation import TranslationCache
 
+_item_formatter = ItemFormatter(constants.ITEM_FORMAT_CACHE_SIZE)
+translation_cache = TranslationCache()
 
-def get_formatted_time() -> str:
-    """获取当前时间的格式化的字符串"""
-    return time.strftime('%Y-%m-%d %H:%M:%S', time.localtime())
 
-
-def get_offhand_item(server: PluginServerInterface, player: str) -> dict | None:
-    """获取玩家副手物品，建议开启 Rcon
+def get_formatted_time(timestamp: float | None = None) -> str:
+    """获取时间的格式化的字符串
 
     Args:
-        server (PluginServerInterface): MCDR插件接口
-        player (str): 玩家名
-
-    Returns:
-        dict | None: 物品信息，若获取失败或返回 None
+        timestamp (float | None): 时间戳，默认为当前时间
     """
-    # api = server.get_plugin_instance('minecraft_data_api')
-    import minecraft_data_api as api
-
-    try:
-        if server.is_rcon_running():
-            offhand_item = api.convert_minecraft_json(
-                server.rcon_query(f'data get entity {player} {constants.OFFHAND_CODE}')
-            )
-        else:
-            server.logger.warning(tr(Tags.rcon.not_running))
-            offhand_item = api.get_player_info(player, constants.OFFHAND_CODE)
-
-        if isinstance(offhand_item, dict):
-            return offhand_item
+    return time.strftime(constants.TIME_FORMAT, time.localtime(timestamp))
 
-    except Exception as e:
-        server.logger.error(f"Error occurred during getting {player}'s offhand item")
-        server.logger.error(e)
 
+def get_formatted_item(payload: str) -> str:
+    """把物品的 SNBT 转换为替换副手物品的命令中使用的物品参数，结果会被缓存
 
-def get_formatted_item(item_json: dict) -> str:
-    item_tag = item_json.get("tag", "")
-    return f"{item_json['id']}" + json.dumps(item_tag, ensure_ascii=False) + f"{item_json.get('Count', '')}"
+    Args:
+        payload (str): 物品的 SNBT，即 ``data get entity`` 的结果
+    """
+    return _item_formatter.format(payload)
 
 
 def tr(tag: str, *args):
-    """translation"""
-    return PluginServerInterface.get_instance().tr(f'mcdrpost.{tag}', *args)
+    """translation
+
+    优先使用 ``translation_cache`` 中缓存的翻译
+    """
+    return translation_cache.translate(PluginServerInterface.get_instance(), tag, *args)
 
 
-__all__ = ['get_formatted_time', 'get_offhand_item', 'get_formatted_item', 'tr']
+__all__ = ['get_formatted_time', 'get_formatted_item', 'translation_cache', 'tr']
@@ -0,0 +1,175 @@
+"""游戏命令队列"""
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Callable
+
+from mcdreforged.api.types import PluginServerInterface
+
+from mcdrpost.utils.rcon_pool import RconBatchError, RconPool
+
+
+class CommandPipeline:
+    """合并发送、限速的游戏命令队列
+
+    命令先放进队列，由后台线程每 ``window`` 秒（默认一个游戏刻）取出一批发送：
+    RCON 连接池可用时一批命令共用一个连接发送，能拿到返回结果；
+    否则把一批命令合并为一次写入服务端的标准输入，返回结果为 None
+
+    一批命令通过 RCON 发送到一半出错时，只有还没执行的命令改为写入标准输入，已经执行的不会再执行一次。
+    发送失败时命令的 Future 以异常结束，无论成败每个 Future 都会结束，后台线程也会继续处理之后的命令
+
+    ``rate_limit`` 为每秒最多发送的命令数（令牌桶，允许一秒的突发），
+    大量收寄或者很多玩家同时登录时不会刷屏控制台，不大于 0 时不限速
+
+    Args:
+        server (PluginServerInterface): MCDR插件接口
+        rcon (Callable[[], RconPool | None]): 获取 RCON 连接池，不可用时返回 None
+        window (float): 合并命令的时间窗口，单位为秒
+        rate_limit (int): 每秒最多发送的命令数
+    """
+
+    def __init__(
+            self,
+            server: PluginServerInterface,
+            rcon: Callable[[], RconPool | None],
+            window: float,
+            rate_limit: int,
+    ) -> None:
+        self._server: PluginServerInterface = server
+        self._rcon: Callable[[], RconPool | None] = rcon
+        self._window: float = window
+        self._rate_limit: int = rate_limit
+        self._queue: deque[tuple[str, Future[str | None]]] = deque()
+        self._cond = threading.Condition()
+        self._thread: threading.Thread | None = None
+        self._stopped: bool = False
+
+        # 令牌桶
+        self._tokens: float = float(rate_limit)
+        self._refilled_at: float = time.monotonic()
+
+        # 统计
+        self._started_at: float = time.monotonic()
+        self.submitted: int = 0
+        self.sent: int = 0
+        self.batches: int = 0
+        self.max_depth: int = 0
+
+    @property
+    def depth(self) -> int:
+        """当前排队的命令数"""
+        return len(self._queue)
+
+    @property
+    def throughput(self) -> float:
+        """平均每秒发送的命令数"""
+        return self.sent / max(time.monotonic() - self._started_at, 1e-6)
+
+    def execute(self, command: str) -> Future[str | None]:
+        """把命令放进队列
+
+        Args:
+            command (str): 要执行的命令
+
+        Returns:
+            Future[str | None]: 命令的返回结果，不是通过 RCON 发送时为 None
+        """
+        future: Future[str | None] = Future()
+        with self._cond:
+            if self._stopped:
+                # 插件已经卸载，直接执行
+                self._send([(command, future)])
+                return future
+            self._queue.append((command, future))
+            self.submitted += 1
+            self.max_depth = max(self.max_depth, len(self._queue))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='MCDRpost-command', daemon=True)
+                self._thread.start()
+            self._cond.notify()
+        return future
+
+    def _take_tokens(self, wanted: int) -> int:
+        """从令牌桶中取出最多 ``wanted`` 个令牌，没有令牌时等待"""
+        if self._rate_limit <= 0:
+            return wanted
+        while True:
+            now = time.monotonic()
+            self._tokens = min(float(self._rate_limit), self._tokens + (now - self._refilled_at) * self._rate_limit)
+            self._refilled_at = now
+            if self._tokens >= 1:
+                count = min(wanted, int(self._tokens))
+                self._tokens -= count
+                return count
+            time.sleep((1 - self._tokens) / self._rate_limit)
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._queue and not self._stopped:
+                    self._cond.wait()
+                if self._stopped:
+                    return
+            # 等一个时间窗口，让同一时间提交的命令合并成一批
+            if self._window > 0:
+                time.sleep(self._window)
+            with self._cond:
+                wanted = len(self._queue)
+            count = self._take_tokens(wanted)
+            with self._cond:
+                batch = [self._queue.popleft() for _ in range(min(count, len(self._queue)))]
+            if batch:
+                self._send(batch)
+
+    def _send(self, batch: list[tuple[str, Future[str | None]]]) -> None:
+        """发送一批命令，不会抛出异常"""
+        commands = [command for command, _ in batch]
+        # 通过 RCON 执行过的命令的结果，之后的命令写入标准输入
+        results: list[str | None] = []
+        error: Exception | None = None
+        try:
+            try:
+                pool = self._rcon()
+                if pool is not None:
+                    results = pool.query_many(commands)
+            except RconBatchError as e:
+                results = e.results
+                self._server.logger.exception(
+                    f'Failed to send {len(commands) - len(results)} command(s) over RCON, fall back to stdin'
+                )
+            except Exception:
+                self._server.logger.exception('Failed to get an RCON connection, fall back to stdin')
+            if len(results) < len(commands):
+                self._server.execute('\n'.join(commands[len(results):]))
+        except Exception as e:
+            error = e
+            self._server.logger.exception(f'Failed to send {len(commands) - len(results)} command(s)')
+        finally:
+            self.sent += len(batch) if error is None else len(results)
+            self.batches += 1
+            for index, (_, future) in enumerate(batch):
+                if index < len(results):
+                    future.set_result(results[index])
+                elif error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(None)
+
+    def shutdown(self) -> None:
+        """停止后台线程并发送所有排队的命令（不再限速），在插件卸载时调用"""
+        with self._cond:
+            self._stopped = True
+            thread, self._thread = self._thread, None
+            self._cond.notify()
+        if thread is not None:
+            thread.join()
+        with self._cond:
+            batch = list(self._queue)
+            self._queue.clear()
+        if batch:
+            self._send(batch)
+
+
+__all__ = ['CommandPipeline']
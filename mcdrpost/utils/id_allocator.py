@@ -0,0 +1,44 @@
+"""订单 ID 分配器"""
+import heapq
+from typing import Iterable
+
+
+class IdAllocator:
+    """总是分配当前最小的空闲 ID（从 1 开始）
+
+    用最小堆记录被释放的 ID，再加上一个已分配过的最大 ID（高水位），
+    分配和释放都是 O(log k)，k 为空闲 ID 的数量
+    """
+
+    def __init__(self) -> None:
+        self._free: list[int] = []
+        self._high: int = 0
+
+    def rebuild(self, used_ids: Iterable[int]) -> None:
+        """根据已经被占用的 ID 重建分配器
+
+        Args:
+            used_ids (Iterable[int]): 所有被占用的 ID
+        """
+        used = set(used_ids)
+        self._high = max(used, default=0)
+        # 升序列表本身就是一个合法的最小堆
+        self._free = [i for i in range(1, self._high) if i not in used]
+
+    def peek(self) -> int:
+        """下一个会被分配的 ID"""
+        return self._free[0] if self._free else self._high + 1
+
+    def allocate(self) -> int:
+        """分配一个 ID"""
+        if self._free:
+            return heapq.heappop(self._free)
+        self._high += 1
+        return self._high
+
+    def release(self, order_id: int) -> None:
+        """释放一个已经分配的 ID"""
+        heapq.heappush(self._free, order_id)
+
+
+__all__ = ['IdAllocator']
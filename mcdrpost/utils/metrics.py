@@ -0,0 +1,242 @@
+"""运行指标
+
+记录计数器和延迟直方图，可以在 ``!!po stats`` 中查看，也可以定期写成 Prometheus 的文本格式，
+交给 node_exporter 的 textfile collector 采集
+"""
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager
+from logging import Logger
+from typing import Callable, Iterator
+
+# 直方图的桶上限，单位为秒，从 1 毫秒到 10 秒
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+Labels = tuple[tuple[str, str], ...]
+
+
+class Counter:
+    """只增不减的计数器"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.value: int = 0
+
+    def inc(self, amount: int = 1) -> None:
+        with self._lock:
+            self.value += amount
+
+
+class Histogram:
+    """固定分桶的直方图
+
+    Args:
+        buckets (tuple[float, ...]): 各个桶的上限，从小到大
+    """
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        self.buckets: tuple[float, ...] = buckets
+        self._lock = threading.Lock()
+        # 最后一个是 +Inf 桶
+        self._counts: list[int] = [0] * (len(buckets) + 1)
+        self.count: int = 0
+        self.sum: float = 0
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self.count += 1
+            self.sum += value
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        """记录代码块的耗时"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def cumulative(self) -> list[int]:
+        """每个桶（包括 +Inf）的累计计数"""
+        with self._lock:
+            counts = list(self._counts)
+        for i in range(1, len(counts)):
+            counts[i] += counts[i - 1]
+        return counts
+
+    def quantile(self, q: float) -> float:
+        """估算分位数，与 Prometheus 的 ``histogram_quantile`` 一样在桶内线性插值
+
+        Args:
+            q (float): 0 到 1 之间的分位
+
+        Returns:
+            float: 估算值，没有数据时为 0，落在 +Inf 桶时为最大的桶上限
+        """
+        counts = self.cumulative()
+        total = counts[-1]
+        if total == 0:
+            return 0
+        rank = q * total
+        index = bisect.bisect_left(counts, rank)
+        if index >= len(self.buckets):
+            return self.buckets[-1]
+        lower = self.buckets[index - 1] if index > 0 else 0
+        below = counts[index - 1] if index > 0 else 0
+        in_bucket = counts[index] - below
+        return lower + (self.buckets[index] - lower) * ((rank - below) / in_bucket if in_bucket else 1)
+
+
+def _format_labels(labels: Labels, extra: tuple[str, str] | None = None) -> str:
+    pairs = labels + ((extra,) if extra else ())
+    if not pairs:
+        return ''
+    escaped = (
+        (key, value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for key, value in pairs
+    )
+    return '{' + ','.join(f'{key}="{value}"' for key, value in escaped) + '}'
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metrics:
+    """指标注册表
+
+    同名同标签的指标只会创建一次，可以在每次使用时直接获取
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        # 名称 -> (类型, 说明)
+        self._families: dict[str, tuple[str, str]] = {}
+        self._counters: dict[str, dict[Labels, Counter]] = {}
+        self._histograms: dict[str, dict[Labels, Histogram]] = {}
+        self._gauges: dict[str, Callable[[], float]] = {}
+
+    def _register(self, name: str, kind: str, documentation: str) -> None:
+        registered = self._families.setdefault(name, (kind, documentation))
+        if registered[0] != kind:
+            raise ValueError(f'Metric {name} is already registered as a {registered[0]}')
+
+    def counter(self, name: str, documentation: str, **labels: str) -> Counter:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._register(name, 'counter', documentation)
+            family = self._counters.setdefault(name, {})
+            if key not in family:
+                family[key] = Counter()
+            return family[key]
+
+    def histogram(self, name: str, documentation: str, **labels: str) -> Histogram:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._register(name, 'histogram', documentation)
+            family = self._histograms.setdefault(name, {})
+            if key not in family:
+                family[key] = Histogram()
+            return family[key]
+
+    def gauge(self, name: str, documentation: str, getter: Callable[[], float]) -> None:
+        """注册一个在输出时才取值的仪表"""
+        with self._lock:
+            self._register(name, 'gauge', documentation)
+            self._gauges[name] = getter
+
+    def counter_func(self, name: str, documentation: str, getter: Callable[[], int]) -> None:
+        """注册一个在输出时才取值的计数器，用于在别处已经计数的值"""
+        with self._lock:
+            self._register(name, 'counter', documentation)
+            self._gauges[name] = getter
+
+    def counters(self, name: str) -> dict[Labels, Counter]:
+        with self._lock:
+            return dict(self._counters.get(name, {}))
+
+    def histograms(self, name: str) -> dict[Labels, Histogram]:
+        with self._lock:
+            return dict(self._histograms.get(name, {}))
+
+    def render(self) -> str:
+        """输出 Prometheus 文本格式"""
+        with self._lock:
+            families = dict(self._families)
+            counters = {name: dict(family) for name, family in self._counters.items()}
+            histograms = {name: dict(family) for name, family in self._histograms.items()}
+            gauges = dict(self._gauges)
+
+        lines = []
+        for name, (kind, documentation) in families.items():
+            lines.append(f'# HELP {name} {documentation}')
+            lines.append(f'# TYPE {name} {kind}')
+            if name in gauges:
+                lines.append(f'{name} {_format_value(gauges[name]())}')
+            elif kind == 'counter':
+                for labels, counter in counters[name].items():
+                    lines.append(f'{name}{_format_labels(labels)} {counter.value}')
+            else:
+                for labels, histogram in histograms[name].items():
+                    counts = histogram.cumulative()
+                    bounds = [_format_value(float(bound)) for bound in histogram.buckets] + ['+Inf']
+                    for bound, count in zip(bounds, counts):
+                        lines.append(f'{name}_bucket{_format_labels(labels, ("le", bound))} {count}')
+                    lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(histogram.sum)}')
+                    lines.append(f'{name}_count{_format_labels(labels)} {counts[-1]}')
+        return '\n'.join(lines) + '\n'
+
+
+class MetricsExporter:
+    """定期把指标写入文件
+
+    先写临时文件再替换，采集时不会读到写了一半的文件
+
+    Args:
+        metrics (Metrics): 指标
+        path (str): 文件路径
+        interval (float): 写入间隔，单位为秒
+        logger (Logger): 日志
+    """
+
+    def __init__(self, metrics: Metrics, path: str, interval: float, logger: Logger) -> None:
+        self._metrics: Metrics = metrics
+        self.path: str = path
+        self._interval: float = interval
+        self._logger: Logger = logger
+        self._stopped = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def write(self) -> None:
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w', encoding='utf8') as f:
+            f.write(self._metrics.render())
+        os.replace(temp_path, self.path)
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self._interval):
+            try:
+                self.write()
+            except Exception:
+                self._logger.exception(f'Failed to write metrics to {self.path}')
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name='MCDRpost-metrics', daemon=True)
+            self._thread.start()
+
+    def shutdown(self) -> None:
+        """停止后台线程并最后写入一次"""
+        self._stopped.set()
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.join()
+            self.write()
+
+
+__all__ = ['Counter', 'Histogram', 'Metrics', 'MetricsExporter', 'DEFAULT_BUCKETS']
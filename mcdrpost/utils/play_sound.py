@@ -1,17 +1,24 @@
 """
 播放提示音
 """
-from mcdreforged.api.types import PluginServerInterface
+from typing import TYPE_CHECKING
 
+from mcdrpost.utils.types import CommandExecutor
 
-def receive(server: PluginServerInterface, player: str):
-    server.execute(f'execute at {player} run playsound minecraft:entity.bat.takeoff player {player}')
+if TYPE_CHECKING:
+    from mcdrpost.config.environment import CommandTable  # noqa
 
 
-def successfully_post(server: PluginServerInterface, sender: str, receiver: str):
-    server.execute(f'execute at {sender} run playsound minecraft:entity.arrow.hit_player player {sender}')
-    server.execute(f'execute at {receiver} run playsound minecraft:entity.arrow.shoot player {receiver}')
+def receive(server: CommandExecutor, commands: "CommandTable", player: str):
+    server.execute(commands.playsound(player=player, sound='minecraft:entity.bat.takeoff'))
 
 
-def has_something_to_receive(server: PluginServerInterface, player: str):
-    server.execute(f'execute at {player} run playsound minecraft:entity.arrow.hit_player player {player}')
+def successfully_post(server: CommandExecutor, commands: "CommandTable", sender: str, receiver: str | None):
+    """收件人不在线时 ``receiver`` 为 None，只给寄件人播放"""
+    server.execute(commands.playsound(player=sender, sound='minecraft:entity.arrow.hit_player'))
+    if receiver is not None:
+        server.execute(commands.playsound(player=receiver, sound='minecraft:entity.arrow.shoot'))
+
+
+def has_something_to_receive(server: CommandExecutor, commands: "CommandTable", player: str):
+    server.execute(commands.playsound(player=player, sound='minecraft:entity.arrow.hit_player'))
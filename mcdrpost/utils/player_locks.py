@@ -0,0 +1,44 @@
+import threading
+import zlib
+from typing import Callable
+
+
+class PlayerLocks:
+    """按玩家分段的锁
+
+    玩家名按哈希分到固定数量的锁上，同一个玩家总是用同一把锁，不同的玩家大概率用不同的锁，
+    不需要为每个玩家创建和回收锁
+
+    一次锁住多个玩家时按锁的编号从小到大加锁，不会互相死锁
+
+    锁可以在另一个线程中释放，事务的最后一步（比如替换物品的命令）完成时再释放
+
+    Args:
+        stripes (int): 锁的数量
+    """
+
+    def __init__(self, stripes: int) -> None:
+        self._locks: list[threading.Lock] = [threading.Lock() for _ in range(max(1, stripes))]
+
+    def stripe(self, player: str) -> int:
+        """玩家所在的锁的编号，用 crc32 只是为了把玩家名均匀地分到各个锁上"""
+        return zlib.crc32(player.encode('utf8')) % len(self._locks)
+
+    def acquire(self, *players: str) -> Callable[[], None]:
+        """锁住这些玩家
+
+        Returns:
+            Callable[[], None]: 释放函数，只能调用一次
+        """
+        locks = [self._locks[i] for i in sorted({self.stripe(player) for player in players})]
+        for lock in locks:
+            lock.acquire()
+
+        def release() -> None:
+            for held in reversed(locks):
+                held.release()
+
+        return release
+
+
+__all__ = ['PlayerLocks']
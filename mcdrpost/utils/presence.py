@@ -0,0 +1,74 @@
+import threading
+from typing import Iterable
+
+
+def parse_player_list(response: str | None) -> list[str] | None:
+    """从 ``list`` 命令的结果中取出在线玩家
+
+    新版本为 ``There are 2 of a max of 20 players online: Alex, Steve``，
+    旧版本为 ``There are 2/20 players online:Alex, Steve``，玩家名中不会有冒号和逗号
+
+    Args:
+        response (str | None): ``list`` 命令的结果
+
+    Returns:
+        list[str] | None: 在线玩家，结果无法识别时为 None
+    """
+    if not response or ':' not in response:
+        return None
+    names = response.split(':', 1)[1]
+    return [name.strip() for name in names.split(',') if name.strip()]
+
+
+class OnlinePlayers:
+    """在线玩家集合，由玩家加入、离开服务器的事件维护
+
+    插件在服务端运行中加载时，已经在线的玩家不会再触发加入事件，要先用 ``list`` 的结果 :meth:`seed` 一次，
+    在这之前不知道谁在线，:meth:`maybe_online` 对所有玩家都返回 True，和没有这个集合时的行为一样
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._players: set[str] = set()
+        self._known: bool = False
+
+    def __contains__(self, player: str) -> bool:
+        return player in self._players
+
+    def __len__(self) -> int:
+        return len(self._players)
+
+    def maybe_online(self, player: str) -> bool:
+        """玩家可能在线，用来跳过发给离线玩家的消息和音效"""
+        return not self._known or player in self._players
+
+    def seed(self, players: Iterable[str]) -> None:
+        """加入已经在线的玩家
+
+        查询 ``list`` 的同时加入的玩家已经在集合中，所以是合并而不是替换
+        """
+        with self._lock:
+            self._players.update(players)
+            self._known = True
+
+    def join(self, player: str) -> None:
+        with self._lock:
+            self._players.add(player)
+
+    def leave(self, player: str) -> None:
+        with self._lock:
+            self._players.discard(player)
+
+    def clear(self) -> None:
+        """服务端关闭时所有玩家都离线了"""
+        with self._lock:
+            self._players.clear()
+            self._known = True
+
+    def snapshot(self) -> list[str]:
+        """当前在线的玩家"""
+        with self._lock:
+            return list(self._players)
+
+
+__all__ = ['OnlinePlayers', 'parse_player_list']
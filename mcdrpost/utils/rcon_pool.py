@@ -0,0 +1,105 @@
+"""RCON 连接池"""
+import contextlib
+import queue
+from logging import Logger
+from typing import Iterator
+
+from mcdreforged.api.rcon import RconConnection
+
+
+class RconBatchError(Exception):
+    """:meth:`RconPool.query_many` 中途出错
+
+    Attributes:
+        results (list[str | None]): 出错之前已经执行的命令的结果，出错的命令和之后的命令都不在其中
+    """
+
+    def __init__(self, results: list[str | None]) -> None:
+        super().__init__(f'RCON batch failed after {len(results)} command(s)')
+        self.results: list[str | None] = results
+
+
+class RconPool:
+    """固定大小的 RCON 连接池
+
+    MCDR 自带的 ``rcon_query`` 只有一个连接，所有查询都要排队，
+    连接池让多个查询可以同时进行，连接在第一次使用时才建立，出错后会断开并在下次使用时重连
+
+    Args:
+        address (str): RCON 地址
+        port (int): RCON 端口
+        password (str): RCON 密码
+        size (int): 连接数
+        timeout (float): 单次查询的超时时间，单位为秒
+        logger (Logger): 日志
+    """
+
+    def __init__(self, address: str, port: int, password: str, size: int, timeout: float, logger: Logger) -> None:
+        self._timeout: float = timeout
+        self._logger: Logger = logger
+        self._idle: queue.LifoQueue[RconConnection] = queue.LifoQueue()
+        for _ in range(size):
+            connection = RconConnection(address, port, password, logger=logger)
+            # 实例属性会覆盖类属性，只影响这个连接
+            connection.CONNECT_TIMEOUT_SEC = timeout
+            connection.READ_WRITE_TIMEOUT_SEC = timeout
+            self._idle.put(connection)
+        self._connections: list[RconConnection] = list(self._idle.queue)
+
+    @contextlib.contextmanager
+    def _acquire(self) -> Iterator[RconConnection]:
+        try:
+            connection = self._idle.get(timeout=self._timeout)
+        except queue.Empty:
+            raise TimeoutError('No idle RCON connection') from None
+        try:
+            if connection.socket is None and not connection.connect():
+                raise ConnectionError('RCON authentication failed')
+            yield connection
+        except Exception:
+            connection.disconnect()
+            raise
+        finally:
+            self._idle.put(connection)
+
+    def query(self, command: str) -> str | None:
+        """通过连接池中的一个空闲连接执行命令
+
+        Args:
+            command (str): 要执行的命令
+
+        Returns:
+            str | None: 命令的返回结果，查询失败为 None
+        """
+        with self._acquire() as connection:
+            return connection.send_command(command, max_retry_time=1)
+
+    def query_many(self, commands: list[str]) -> list[str | None]:
+        """通过同一个空闲连接依次执行多条命令
+
+        Args:
+            commands (list[str]): 要执行的命令
+
+        Returns:
+            list[str | None]: 每条命令的返回结果
+
+        Raises:
+            RconBatchError: 中途出错，其中带有已经执行的命令的结果
+        """
+        results: list[str | None] = []
+        try:
+            with self._acquire() as connection:
+                for command in commands:
+                    results.append(connection.send_command(command, max_retry_time=1))
+        except Exception as e:
+            raise RconBatchError(results) from e
+        return results
+
+    def close(self) -> None:
+        """断开所有连接"""
+        for connection in self._connections:
+            with contextlib.suppress(Exception):
+                connection.disconnect()
+
+
+__all__ = ['RconBatchError', 'RconPool']
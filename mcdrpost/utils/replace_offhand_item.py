@@ -1,28 +1,33 @@
 """替换副手物品"""
+from typing import Any, TYPE_CHECKING
 
-from mcdreforged.api.types import PluginServerInterface
+from mcdrpost import constants
+from mcdrpost.utils.types import CommandExecutor
 
+if TYPE_CHECKING:
+    from mcdrpost.config.environment import CommandTable  # noqa
 
-def replace_for_17(server: PluginServerInterface, player: str, item: str) -> None:
-    """使用 Minecraft 1.17+ 的 ``item`` 命令替换玩家副手物品
 
-    Args:
-        server (PluginServerInterface): MCDR插件接口
-        player (str): 玩家名
-        item (str): 要替换的物品 id
-    """
-    server.execute(f'item replace entity {player} weapon.offhand with {item}')
-
-
-def replace_for_lower_17(server: PluginServerInterface, player: str, item: str) -> None:
-    """使用 Minecraft 1.17 以下的 ``replaceitem`` 命令替换玩家副手物品
+def replace_item(
+        server: CommandExecutor,
+        commands: "CommandTable",
+        player: str,
+        item: str,
+        slot: str = constants.OFFHAND_SLOT,
+) -> Any:
+    """替换玩家副手物品，Minecraft 1.17 之后使用 ``item`` 命令，之前使用 ``replaceitem`` 命令
 
     Args:
-        server (PluginServerInterface): MCDR插件接口
+        server (CommandExecutor): 用于执行命令，一般为命令队列
+        commands (CommandTable): 当前服务端版本的命令模板
         player (str): 玩家名
         item (str): 要替换的物品 id
+        slot (str): 要替换的槽位，默认为副手
+
+    Returns:
+        Any: ``server.execute`` 的返回值，使用命令队列时为命令的 Future
     """
-    server.execute(f'replaceitem entity {player} weapon.offhand {item}')
+    return server.execute(commands.replace_item(player=player, slot=slot, item=item))
 
 
-__all__ = ['replace_for_17', 'replace_for_lower_17']
+__all__ = ['replace_item']
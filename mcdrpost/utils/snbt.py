@@ -0,0 +1,315 @@
+"""SNBT（字符串形式的 NBT）编解码
+
+解码时保留数值的类型，编码时会带上对应的后缀，这样物品数据可以原样写回游戏命令中
+
+=========  ==================  ========
+NBT 类型   Python 类型          后缀
+=========  ==================  ========
+Byte       :class:`Byte`       ``b``
+Short      :class:`Short`      ``s``
+Int        ``int``             无
+Long       :class:`Long`       ``L``
+Float      :class:`Float`      ``f``
+Double     ``float``           ``d``
+String     ``str``
+List       ``list``
+Compound   ``dict``
+ByteArray  :class:`ByteArray`  ``[B;]``
+IntArray   :class:`IntArray`   ``[I;]``
+LongArray  :class:`LongArray`  ``[L;]``
+=========  ==================  ========
+"""
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from typing import Any
+
+
+class Byte(int):
+    __slots__ = ()
+
+
+class Short(int):
+    __slots__ = ()
+
+
+class Long(int):
+    __slots__ = ()
+
+
+class Float(float):
+    __slots__ = ()
+
+
+class ByteArray(list):
+    pass
+
+
+class IntArray(list):
+    pass
+
+
+class LongArray(list):
+    pass
+
+
+class SNBTDecodeError(ValueError):
+    pass
+
+
+_UNQUOTED_KEY = re.compile(r'[0-9A-Za-z_\-.+]+')
+# 一次性切分出所有的词法单元：引号字符串、标点、不带引号的值
+_TOKEN = re.compile(r"""\s*(?:("(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')|([{}\[\]:,;])|([0-9A-Za-z_\-.+]+))""", re.S)
+_ESCAPE = re.compile(r'\\(.)', re.S)
+_INT = re.compile(r'[-+]?(?:0|[1-9][0-9]*)')
+_TYPED_INT = re.compile(r'([-+]?(?:0|[1-9][0-9]*))([bBsSlL])')
+_DOUBLE = re.compile(r'[-+]?(?:[0-9]+[.]|[0-9]*[.][0-9]+)(?:[eE][-+]?[0-9]+)?|[-+]?[0-9]+[eE][-+]?[0-9]+')
+_TYPED_FLOAT = re.compile(r'([-+]?(?:[0-9]+[.]?|[0-9]*[.][0-9]+)(?:[eE][-+]?[0-9]+)?)([fFdD])')
+_INT_TYPES = {'b': Byte, 's': Short, 'l': Long}
+_ARRAY_TYPES = {'B': ByteArray, 'I': IntArray, 'L': LongArray}
+_ARRAY_ELEMENT_TYPES = {ByteArray: Byte, IntArray: int, LongArray: Long}
+
+# 词法单元的种类
+_STRING, _PUNCT, _WORD = 0, 1, 2
+
+
+def _parse_word(token: str) -> Any:
+    """解析不带引号的值"""
+    if _INT.fullmatch(token):
+        return int(token)
+    if token[-1] in 'bBsSlL' and (match := _TYPED_INT.fullmatch(token)):
+        return _INT_TYPES[match.group(2).lower()](int(match.group(1)))
+    if _DOUBLE.fullmatch(token):
+        return float(token)
+    if token[-1] in 'fFdD' and (match := _TYPED_FLOAT.fullmatch(token)):
+        return (Float if match.group(2) in 'fF' else float)(match.group(1))
+    if token == 'true':
+        return Byte(1)
+    if token == 'false':
+        return Byte(0)
+    return token
+
+
+class _Decoder:
+    def __init__(self, text: str) -> None:
+        self.text: str = text
+        self.tokens: list[tuple[int, str]] = []
+        pos = 0
+        for match in _TOKEN.finditer(text):
+            if match.start() != pos:
+                break
+            pos = match.end()
+            string, punct, word = match.groups()
+            if string is not None:
+                body = string[1:-1]
+                self.tokens.append((_STRING, _ESCAPE.sub(r'\1', body) if '\\' in body else body))
+            elif punct is not None:
+                self.tokens.append((_PUNCT, punct))
+            else:
+                self.tokens.append((_WORD, word))
+        if text[pos:].strip():
+            raise SNBTDecodeError(f'Unexpected character at position {pos}: {text[pos:pos + 20]!r}')
+        self.index: int = 0
+
+    def error(self, message: str) -> SNBTDecodeError:
+        near = ' '.join(t for _, t in self.tokens[self.index:self.index + 5])
+        return SNBTDecodeError(f'{message} at token {self.index}: {near!r}')
+
+    def next(self) -> tuple[int, str]:
+        try:
+            token = self.tokens[self.index]
+        except IndexError:
+            raise self.error('Unexpected end of data') from None
+        self.index += 1
+        return token
+
+    def read_value(self) -> Any:
+        kind, token = self.next()
+        if kind == _STRING:
+            return token
+        if kind == _WORD:
+            return _parse_word(token)
+        if token == '{':
+            return self.read_compound()
+        if token == '[':
+            return self.read_list()
+        raise self.error('Expected a value')
+
+    def read_compound(self) -> dict[str, Any]:
+        result: dict[str, Any] = {}
+        tokens = self.tokens
+        if self.index < len(tokens) and tokens[self.index] == (_PUNCT, '}'):
+            self.index += 1
+            return result
+        while True:
+            kind, key = self.next()
+            if kind == _PUNCT:
+                raise self.error('Expected a key')
+            if self.next() != (_PUNCT, ':'):
+                raise self.error("Expected ':'")
+            result[key] = self.read_value()
+            kind, token = self.next()
+            if token == '}' and kind == _PUNCT:
+                return result
+            if token != ',' or kind != _PUNCT:
+                raise self.error("Expected ',' or '}'")
+
+    def read_list(self) -> list:
+        result: list = []
+        tokens = self.tokens
+        if (
+                self.index + 1 < len(tokens)
+                and tokens[self.index][0] == _WORD and tokens[self.index][1] in _ARRAY_TYPES
+                and tokens[self.index + 1] == (_PUNCT, ';')
+        ):
+            result = _ARRAY_TYPES[tokens[self.index][1]]()
+            self.index += 2
+        element_type = _ARRAY_ELEMENT_TYPES.get(type(result))
+        if self.index < len(tokens) and tokens[self.index] == (_PUNCT, ']'):
+            self.index += 1
+            return result
+        while True:
+            value = self.read_value()
+            result.append(value if element_type is None else element_type(value))
+            kind, token = self.next()
+            if token == ']' and kind == _PUNCT:
+                return result
+            if token != ',' or kind != _PUNCT:
+                raise self.error("Expected ',' or ']'")
+
+
+def decode(text: str) -> Any:
+    """把 SNBT 解码为 Python 对象
+
+    Raises:
+        SNBTDecodeError: 不是合法的 SNBT
+    """
+    decoder = _Decoder(text)
+    value = decoder.read_value()
+    if decoder.index != len(decoder.tokens):
+        raise decoder.error('Unexpected trailing data')
+    return value
+
+
+def _quote(text: str) -> str:
+    if '"' in text and "'" not in text:
+        return "'" + text.replace('\\', '\\\\') + "'"
+    return '"' + text.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+def _encode_key(key: str) -> str:
+    return key if _UNQUOTED_KEY.fullmatch(key) else _quote(key)
+
+
+def _encode(value: Any, out: list[str]) -> None:
+    # 先判断子类，再判断 int / float
+    match value:
+        case str():
+            out.append(_quote(value))
+        case dict():
+            out.append('{')
+            for i, (k, v) in enumerate(value.items()):
+                if i:
+                    out.append(',')
+                out.append(_encode_key(k))
+                out.append(':')
+                _encode(v, out)
+            out.append('}')
+        case ByteArray() | IntArray() | LongArray():
+            out.append({ByteArray: '[B;', IntArray: '[I;', LongArray: '[L;'}[type(value)])
+            out.append(','.join(encode(_ARRAY_ELEMENT_TYPES[type(value)](v)) for v in value))
+            out.append(']')
+        case list() | tuple():
+            out.append('[')
+            for i, v in enumerate(value):
+                if i:
+                    out.append(',')
+                _encode(v, out)
+            out.append(']')
+        case bool():
+            out.append('1b' if value else '0b')
+        case Byte():
+            out.append(f'{int(value)}b')
+        case Short():
+            out.append(f'{int(value)}s')
+        case Long():
+            out.append(f'{int(value)}L')
+        case int():
+            out.append(str(int(value)))
+        case Float():
+            out.append(f'{float(value)!r}f')
+        case float():
+            out.append(f'{value!r}d')
+        case _:
+            raise TypeError(f'Cannot encode {type(value).__name__} as SNBT')
+
+
+def encode(value: Any) -> str:
+    """把 Python 对象编码为 SNBT，数值会带上类型后缀"""
+    out: list[str] = []
+    _encode(value, out)
+    return ''.join(out)
+
+
+def format_item(item: dict[str, Any]) -> str:
+    """把物品数据转换为 ``item replace`` / ``replaceitem`` 命令中使用的物品参数
+
+    - 1.20.5+ 的物品组件格式: ``minecraft:diamond_sword[minecraft:damage=3] 1``
+    - 旧版的 ``tag`` 格式: ``minecraft:diamond_sword{Damage:3} 1``
+
+    Args:
+        item (dict): 物品数据，即 ``data get entity`` 得到的 ``Inventory`` 中的一项
+    """
+    if 'components' in item or 'count' in item:
+        components = item.get('components') or {}
+        result = item['id']
+        if components:
+            result += '[' + ','.join(f'{k}={encode(v)}' for k, v in components.items()) + ']'
+        return f"{result} {int(item.get('count', 1))}"
+    tag = item.get('tag')
+    return f"{item['id']}{encode(tag) if tag else ''} {int(item.get('Count', 1))}"
+
+
+class ItemFormatter:
+    """带缓存的物品格式化
+
+    以物品 SNBT 的哈希值作为键缓存 :func:`format_item` 的结果，
+    同样的物品（比如装满同样东西的潜影盒）只需要解码和编码一次
+
+    Args:
+        max_size (int): 最多缓存多少个物品
+    """
+
+    def __init__(self, max_size: int = 256) -> None:
+        self._max_size: int = max_size
+        self._cache: OrderedDict[bytes, str] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def format(self, payload: str) -> str:
+        """把物品的 SNBT 转换为命令中的物品参数
+
+        Args:
+            payload (str): 物品的 SNBT
+        """
+        key = hashlib.blake2b(payload.encode('utf8'), digest_size=16).digest()
+        with self._lock:
+            if (result := self._cache.get(key)) is not None:
+                self._cache.move_to_end(key)
+                return result
+        result = format_item(decode(payload))
+        with self._lock:
+            self._cache[key] = result
+            if len(self._cache) > self._max_size:
+                self._cache.popitem(last=False)
+        return result
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+
+__all__ = [
+    'Byte', 'Short', 'Long', 'Float', 'ByteArray', 'IntArray', 'LongArray', 'SNBTDecodeError',
+    'decode', 'encode', 'format_item', 'ItemFormatter',
+]
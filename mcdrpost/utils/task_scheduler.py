@@ -0,0 +1,126 @@
+import heapq
+import itertools
+import threading
+import time
+from logging import Logger
+from typing import Callable, Hashable
+
+
+class _Task:
+    __slots__ = ('due', 'seq', 'key', 'callback', 'cancelled')
+
+    def __init__(self, due: float, seq: int, key: Hashable | None, callback: Callable[[], None]) -> None:
+        self.due: float = due
+        self.seq: int = seq
+        self.key: Hashable | None = key
+        self.callback: Callable[[], None] = callback
+        self.cancelled: bool = False
+
+    def __lt__(self, other: '_Task') -> bool:
+        return (self.due, self.seq) < (other.due, other.seq)
+
+
+class TaskScheduler:
+    """延迟任务调度器
+
+    所有延迟任务都放在同一个小根堆里，由一个后台线程睡到最早的任务到期再执行，
+    不需要为每个任务开一个只会睡眠的线程
+
+    任务可以带一个键（比如玩家名），按键取消时只做标记，出堆时跳过
+
+    Args:
+        logger (Logger): 日志
+        name (str): 后台线程名
+    """
+
+    def __init__(self, logger: Logger, name: str = 'MCDRpost-scheduler') -> None:
+        self._logger: Logger = logger
+        self._name: str = name
+        self._heap: list[_Task] = []
+        # 键 -> 还没执行的任务
+        self._keyed: dict[Hashable, list[_Task]] = {}
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._thread: threading.Thread | None = None
+        self._stopped: bool = False
+
+    def __len__(self) -> int:
+        """还没执行的任务数，包括已取消但还没出堆的任务"""
+        return len(self._heap)
+
+    def schedule(self, delay: float, callback: Callable[[], None], key: Hashable | None = None) -> None:
+        """在 ``delay`` 秒后于后台线程中调用 ``callback``
+
+        Args:
+            delay (float): 延迟，单位为秒
+            callback (Callable[[], None]): 任务
+            key (Hashable | None): 任务的键，用于 :meth:`cancel`
+        """
+        with self._cond:
+            if self._stopped:
+                return
+            task = _Task(time.monotonic() + delay, next(self._seq), key, callback)
+            heapq.heappush(self._heap, task)
+            if key is not None:
+                self._keyed.setdefault(key, []).append(task)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self._name, daemon=True)
+                self._thread.start()
+            # 只有新的任务最早到期时才需要唤醒后台线程
+            if self._heap[0] is task:
+                self._cond.notify()
+
+    def cancel(self, key: Hashable) -> int:
+        """取消键为 ``key`` 的所有任务
+
+        Returns:
+            int: 取消的任务数
+        """
+        with self._cond:
+            tasks = self._keyed.pop(key, ())
+            for task in tasks:
+                task.cancelled = True
+            return len(tasks)
+
+    def _pop_due(self) -> _Task | None:
+        """等到有任务到期后取出，停止时返回 None，调用时需要持有锁"""
+        while not self._stopped:
+            if self._heap and self._heap[0].cancelled:
+                heapq.heappop(self._heap)
+                continue
+            now = time.monotonic()
+            if self._heap and self._heap[0].due <= now:
+                task = heapq.heappop(self._heap)
+                if task.key is not None:
+                    tasks = self._keyed[task.key]
+                    tasks.remove(task)
+                    if not tasks:
+                        del self._keyed[task.key]
+                return task
+            self._cond.wait(self._heap[0].due - now if self._heap else None)
+        return None
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                task = self._pop_due()
+            if task is None:
+                return
+            try:
+                task.callback()
+            except Exception:
+                self._logger.exception(f'Error occurred in scheduled task {task.callback}')
+
+    def shutdown(self) -> None:
+        """丢弃所有没执行的任务并停止后台线程，在插件卸载时调用"""
+        with self._cond:
+            self._stopped = True
+            self._heap.clear()
+            self._keyed.clear()
+            thread, self._thread = self._thread, None
+            self._cond.notify()
+        if thread is not None:
+            thread.join()
+
+
+__all__ = ['TaskScheduler']
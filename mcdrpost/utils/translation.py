@@ -0,0 +1,138 @@
+"""带缓存的翻译
+
+MCDR 的 ``tr()`` 每次都要拼接翻译键并走完整的翻译查找流程，一次列表回复就会调用上百次。
+这里在插件加载时把 ``lang/*.yml`` 读入内存，按 (语言, 翻译标签) 缓存预处理好的格式模板，
+之后的翻译只需要一次字典查找和一次格式化
+"""
+import os
+import threading
+import zipfile
+from typing import Any, Callable
+
+from mcdreforged.api.rtext import RTextBase
+from mcdreforged.api.types import PluginServerInterface
+from ruamel.yaml import YAML
+
+from mcdrpost import constants
+
+# 格式化函数，接收 tr() 的参数返回翻译结果
+Template = Callable[..., str]
+
+
+def _compile(text: str) -> Template:
+    """预处理格式模板：没有占位符的模板直接返回原文，不再调用 ``str.format``"""
+    if '{' not in text:
+        return lambda *_args: text
+    return text.format
+
+
+def bundled_languages(server: PluginServerInterface) -> list[str]:
+    """插件自带的语言，即 ``lang/`` 中的所有 ``.yml`` 文件，插件可能是文件夹也可能是打包好的 ``.mcdr`` 文件
+
+    Returns:
+        list[str]: 语言，如 ``['en_us', 'zh_cn']``，找不到插件文件时为空
+    """
+    path = server.get_plugin_file_path(constants.PLUGIN_ID)
+    if path is None:
+        return []
+    if os.path.isdir(path):
+        folder = os.path.join(path, constants.LANG_FOLDER)
+        names = os.listdir(folder) if os.path.isdir(folder) else []
+    else:
+        with zipfile.ZipFile(path) as package:
+            names = [
+                name[len(constants.LANG_FOLDER) + 1:] for name in package.namelist()
+                if os.path.dirname(name) == constants.LANG_FOLDER
+            ]
+    return sorted(name[:-len('.yml')] for name in names if name.endswith('.yml'))
+
+
+class TranslationCache:
+    """翻译缓存
+
+    缓存找不到的翻译（没有对应的语言文件、翻译键不存在、参数中有 RText）会交给 MCDR 处理
+
+    命中和未命中的次数可以在 ``!!po stats`` 中查看，也会作为运行指标导出
+
+    Attributes:
+        hits (int): 命中缓存的次数
+        misses (int): 交给 MCDR 翻译的次数
+    """
+
+    def __init__(self) -> None:
+        self._templates: dict[tuple[str, str], Template] = {}
+        self._warmed: bool = False
+        self._lock = threading.Lock()
+        self._hits: int = 0
+        self._misses: int = 0
+
+    @property
+    def hits(self) -> int:
+        """命中缓存的翻译次数"""
+        return self._hits
+
+    @property
+    def misses(self) -> int:
+        """没有命中、交给 MCDR 翻译的次数"""
+        return self._misses
+
+    def _load_language(self, server: PluginServerInterface, language: str) -> None:
+        with server.open_bundled_file(f'{constants.LANG_FOLDER}/{language}.yml') as f:
+            data = YAML(typ='safe').load(f)
+
+        def flatten(tag: str, value: Any) -> None:
+            if isinstance(value, dict):
+                for k, v in value.items():
+                    flatten(f'{tag}.{k}' if tag else str(k), v)
+            elif isinstance(value, str):
+                self._templates[(language, tag)] = _compile(value)
+
+        flatten('', data.get(constants.PLUGIN_ID, {}))
+
+    def warm(self, server: PluginServerInterface) -> None:
+        """从插件自带的语言文件中读取所有翻译"""
+        with self._lock:
+            if self._warmed:
+                return
+            try:
+                languages = bundled_languages(server)
+            except Exception:
+                server.logger.exception('Failed to list bundled translations')
+                languages = []
+            for language in languages:
+                try:
+                    self._load_language(server, language)
+                except Exception:
+                    server.logger.exception(f'Failed to load translations of {language}')
+            self._warmed = True
+
+    def clear(self) -> None:
+        """清空缓存和计数，插件重载时调用"""
+        with self._lock:
+            self._templates.clear()
+            self._warmed = False
+            self._hits = 0
+            self._misses = 0
+
+    def translate(self, server: PluginServerInterface, tag: str, *args) -> str:
+        """翻译
+
+        Args:
+            server (PluginServerInterface): 插件接口
+            tag (str): 翻译标签，不带 ``mcdrpost.`` 前缀
+            *args: 格式化参数
+        """
+        if not self._warmed:
+            self.warm(server)
+        template = self._templates.get((server.get_mcdr_language(), tag))
+        # 各个线程都会调用 tr，计数要在锁内修改，否则会丢失
+        if template is not None and not (args and any(isinstance(arg, RTextBase) for arg in args)):
+            with self._lock:
+                self._hits += 1
+            return template(*args)
+        with self._lock:
+            self._misses += 1
+        return server.tr(f'{constants.PLUGIN_ID}.{tag}', *args)
+
+
+__all__ = ['TranslationCache', 'bundled_languages']
@@ -18,6 +18,11 @@ class Tags:
         hint_ls_orders = 'help.hint_ls_orders'
         hint_player_add = 'help.hint_player_add'
         hint_player_remove = 'help.hint_player_remove'
+        hint_stats = 'help.hint_stats'
+        hint_expiry = 'help.hint_expiry'
+        hint_r_all = 'help.hint_r_all'
+        hint_broadcast = 'help.hint_broadcast'
+        broadcast = 'help.broadcast'
         p = 'help.p'
         r = 'help.r'
         c = 'help.c'
@@ -67,6 +72,7 @@ class Tags:
     command_incomplete = 'command_incomplete'
 
     wait_for_receive = 'wait_for_receive'
+    save_success = 'save_success'
 
     class config:
         max_storage_num = 'config.max_storage_num'
@@ -82,12 +88,60 @@ class Tags:
             auto_fix = 'config.set.auto_fix'
             receive_tip_delay = 'config.set.receive_tip_delay'
 
+    class page:
+        info = 'page.info'
+        prev = 'page.prev'
+        next = 'page.next'
+
+    class receive_all:
+        success = 'receive_all.success'
+        inventory_full = 'receive_all.inventory_full'
+        inventory_unavailable = 'receive_all.inventory_unavailable'
+
+    class broadcast:
+        success = 'broadcast.success'
+        no_receivers = 'broadcast.no_receivers'
+        unknown_receivers = 'broadcast.unknown_receivers'
+
+    class expiry:
+        returned = 'expiry.returned'
+        purged = 'expiry.purged'
+        returned_comment = 'expiry.returned_comment'
+        hint_returned = 'expiry.hint_returned'
+        list_title = 'expiry.list_title'
+        disabled = 'expiry.disabled'
+
+    class loading:
+        in_progress = 'loading.in_progress'
+        finished = 'loading.finished'
+        failed = 'loading.failed'
+
+    class stats:
+        title = 'stats.title'
+        command_pipeline = 'stats.command_pipeline'
+        orders = 'stats.orders'
+        failures = 'stats.failures'
+        storage = 'stats.storage'
+        translation = 'stats.translation'
+        latency_title = 'stats.latency_title'
+        latency = 'stats.latency'
+
     class error:
         invalid_order = 'error.invalid_order'
 
     class auto_fix:
         invalid_order = 'auto_fix.invalid_order'
 
+    class journal:
+        broken_record = 'journal.broken_record'
+        unknown_operation = 'journal.unknown_operation'
+
+    class storage:
+        migrated = 'storage.migrated'
+        flush_failed = 'storage.flush_failed'
+        time_migrated = 'storage.time_migrated'
+        restored = 'storage.restored'
+
     class rcon:
         not_running = 'rcon.not_running'
 
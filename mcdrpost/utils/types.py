@@ -1,7 +1,7 @@
-from typing import Protocol
+from typing import Any, Protocol
 
-from mcdreforged.api.types import PluginServerInterface
 
+class CommandExecutor(Protocol):
+    """能执行游戏命令的对象，如 ``PluginServerInterface`` 或 ``CommandPipeline``"""
 
-class ReplaceFunction(Protocol):
-    def __call__(self, server: PluginServerInterface, player: str, item: str) -> None: ...
+    def execute(self, text: str) -> Any: ...